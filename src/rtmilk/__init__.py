@@ -1,11 +1,82 @@
+from importlib import import_module
 from logging import getLogger, NullHandler
+from typing import TYPE_CHECKING
 
-from .api_async import *
-from .api_sync import *
-from .authorization import *
-from .client import *
-from .filter import *
-from .mirror import *
-from .models import *
+# Submodules are only imported when one of their names is first used, so that importing the package is cheap
+# e.g. a sync script never imports the async API
+_EXPORTS = {
+	'api_async': ('UnauthorizedAPIAsync', 'APIAsync'),
+	'api_sync': ('UnauthorizedAPI', 'API'),
+	'authorization': ('AuthorizationSession',),
+	'cassette': ('RecordingTransport', 'ReplayTransport'),
+	'client': ('FilterDate', 'TransactionRecord', 'UndoError', 'TransactionLog', 'CommitError', 'WriteBehindBuffer', 'CreateClient', 'CreateClientAsync', 'CreateSyncOnlyClient', 'CreateAsyncOnlyClient'),
+	'filter': (
+		'ConditionABC', 'Always', 'Never', 'ListIs', 'ListContains', 'Priority', 'Status', 'TagIs', 'TagContains', 'IsTagged', 'LocationIs',
+		'LocationContains', 'LocatedWithin', 'IsLocated', 'IsRepeating', 'NameIs', 'NoteContains', 'HasNotes', 'FilenameContains', 'HasAttachments', 'Due',
+		'DueBefore', 'DueAfter', 'DueWithin', 'Start', 'StartBefore', 'StartAfter', 'StartWithin', 'TimeEstimate', 'HasTimeEstimate', 'HasURL',
+		'HasSubtasks', 'IsSubtask', 'Completed', 'CompletedBefore', 'CompletedAfter', 'CompletedWithin', 'Added', 'AddedBefore', 'AddedAfter', 'AddedWithin',
+		'Updated', 'UpdatedBefore', 'UpdatedAfter', 'UpdatedWithin', 'Postponed', 'IsShared', 'SharedWith', 'GivenTo', 'GivenBy', 'IsGiven', 'Source',
+		'IncludeArchived', 'Keyword', 'And', 'Or', 'Not', 'FilterParseError', 'ParseFilter', 'Normalize', 'CanonicalText', 'CanonicalHash', 'CanEvaluate',
+		'Evaluate'),
+	'metrics': ('STAGES', 'CallMetrics', 'Hook', 'Histogram', 'MetricsCollector', 'MetricsExporter'),
+	'mirror': ('MirrorError', 'TaskData', 'MatchKey', 'MatchByName', 'MatchByExternalId', 'TaskUpdate', 'MirrorPlan', 'KeysToLoad', 'PlanMirror', 'MirrorJournal', 'MirrorProgress', 'ExecutePlan', 'ExecutePlanAsync', 'Mirror', 'MirrorAsync', 'IterMirrorPlan', 'IterMirrorPlanAsync', 'MirrorStream', 'MirrorStreamAsync'),
+	'models': (
+		'BaseError', 'AggregateError', 'APIError', 'ErrorData', 'OkStat', 'FailStat', 'EchoResponse', 'RTMList', 'RTMSmartList', 'ListPayload', 'SingleListResponse',
+		'ListsResponse', 'PermsEnum', 'User', 'AuthResponsePayload', 'AuthResponse', 'TimelineResponse', 'PriorityEnum', 'PriorityDirectionEnum', 'Task',
+		'Note', 'Transaction', 'NotesResponse', 'NotePayload', 'Tags', 'TaskSeries', 'TaskPayload', 'TaskResponse', 'TasksInListPayload',
+		'ListOfTasksInListPayload', 'TaskListPayload', 'TaskListResponse', 'TagObject', 'TagForList', 'TagListResponse', 'DateFormatEnum', 'TimeFormatEnum',
+		'SettingsPayload', 'SettingsResponse', 'Topic', 'TopicListResponse', 'SubscriptionPayload', 'SubscriptionResponse', 'SubscriptionList',
+		'SubscriptionListResponse'),
+	'payloads': ('Payload', 'PayloadRingBuffer'),
+	'profiling': ('StageStats', 'Profile', 'Stage'),
+	'push': ('PushEvent', 'PushNotification', 'TaskStore', 'PushReceiver', 'LeaseScheduler'),
+	'ratelimit': ('RateLimiter',),
+	'timeline': ('TimelineKey', 'TimelineProvider', 'MemoryTimelineProvider', 'FileTimelineProvider'),
+	# these were exported by the star imports that this file used to have, so they still are
+	'_sansio': (
+		'REST_URL', 'ApiSig', 'TestEcho', 'AuthGetFrob', 'AuthGetToken', 'AuthCheckToken', 'ListsAdd', 'ListsArchive', 'ListsDelete', 'ListsGetList', 'ListsSetDefaultList',
+		'ListsSetName', 'ListsUnarchive', 'PushGetSubscriptions', 'PushGetTopics', 'PushSubscribe', 'PushUnsubscribe', 'TimelinesCreate', 'TransactionsUndo', 'SettingsGetList',
+		'TagsGetList', 'TasksAdd', 'TasksAddTags', 'TasksComplete', 'TasksDelete', 'TasksGetList', 'TasksMovePriority', 'TasksNotesAdd', 'TasksRemoveTags', 'TasksSetDueDate',
+		'TasksSetName', 'TasksSetPriority', 'TasksSetStartDate', 'TasksSetTags', 'TasksUncomplete'),
+	'_properties': ('CompleteProperty', 'DueDateProperty', 'NameProperty', 'NotesProperty', 'StartDateProperty', 'TagsProperty'),
+	'_secrets': ('SecretsWithAuthorization',),
+	'_utils': ('EmptyStrToNone', 'HttpsUrl'),
+	'api_base': ('UnauthorizedAPIBase',),
+}
+
+_MODULES = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = list(_MODULES)
+
+def __getattr__(name):
+	if name in _EXPORTS:
+		# a submodule e.g. rtmilk.client, which is only an attribute once it's been imported
+		return import_module(f'.{name}', __name__)
+	module = _MODULES.get(name)
+	if module is None:
+		raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+	value = getattr(import_module(f'.{module}', __name__), name)
+	globals()[name] = value
+	return value
+
+def __dir__():
+	return sorted({*globals(), *_MODULES})
+
+if TYPE_CHECKING:
+	from .api_async import *
+	from .api_sync import *
+	from .authorization import *
+	from .cassette import *
+	from .client import *
+	from .filter import *
+	from .metrics import *
+	from .mirror import *
+	from .models import *
+	from .payloads import *
+	from .profiling import *
+	from .push import *
+	from .ratelimit import *
+	from .timeline import *
+	from ._sansio import *
 
 getLogger(__name__).addHandler(NullHandler())
@@ -1,16 +1,35 @@
 from __future__ import annotations
 
+from contextvars import ContextVar
 from datetime import date, datetime
 from logging import getLogger
 from typing import Generic, TypeVar
 
-from .api_sync import API
-from .api_async import APIAsync
-from .models import Note
+from .models import _RaiseIfError, Note, NotesResponse, TaskResponse
 
 _log = getLogger(__name__)
 _T = TypeVar('_T')
 
+# the write-behind buffer of the with block that's currently running, if any
+_WRITE_BEHIND: ContextVar = ContextVar('writeBehind', default=None)
+
+def _Buffer(task):
+	"""The write-behind buffer for the task's writes, or None if they should be sent straight away"""
+	buffer = _WRITE_BEHIND.get()
+	return buffer if buffer is not None and buffer.client is task._client else None
+
+def _Transaction(task, response):
+	"""Apply the write's response to the task and record its transaction in the client's transaction log"""
+	response = _RaiseIfError(response)
+	match response:
+		case TaskResponse():
+			task._Load(response.list.id, response.list.taskseries[0])
+		case NotesResponse():
+			task.notes._LoadValue([*(task.notes.value or []), response.note])
+	transaction = getattr(response, 'transaction', None)
+	task._client.transactions.Record(task._client.timeline, transaction, task.ids)
+	return transaction
+
 class _Property(Generic[_T]):
 	_value: _T | None
 
@@ -28,82 +47,113 @@ class _Property(Generic[_T]):
 	def value(self) -> _T:
 		return self._value # ty: ignore[invalid-return-type]
 
+class _SettableProperty(_Property[_T]):
+	def Set(self, value: _T):
+		"""Returns the Transaction, or None if the write was buffered by the client's WriteBehind"""
+		buffer = _Buffer(self._task)
+		if buffer is not None:
+			buffer.Set(self, value)
+			return None
+		return self._Send(value)
+
+	async def SetAsync(self, value: _T):
+		buffer = _Buffer(self._task)
+		if buffer is not None:
+			buffer.Set(self, value)
+			return None
+		return await self._SendAsync(value)
+
 class NotesProperty(_Property[list[Note]]):
 
 	def Add(self, title: str, text: str):
-		self._task._client.api.TasksNotesAdd(
-			timeline=self._task._client.timeline,
+		"""Returns the Transaction, or None if the write was buffered by the client's WriteBehind"""
+		buffer = _Buffer(self._task)
+		if buffer is not None:
+			buffer.AddNote(self, title, text)
+			return None
+		return self._Send(title, text)
+
+	async def AddAsync(self, title: str, text: str):
+		buffer = _Buffer(self._task)
+		if buffer is not None:
+			buffer.AddNote(self, title, text)
+			return None
+		return await self._SendAsync(title, text)
+
+	def _Send(self, title, text):
+		return _Transaction(self._task, self._task._client.api.TasksNotesAdd(
+			timeline=self._task._client._Timeline(),
 			list_id=self._task._listId,
 			taskseries_id=self._task._taskSeriesId,
 			task_id=self._task._taskId,
 			note_title=title,
-			note_text=text)
+			note_text=text))
 
-	async def AddAsync(self, title: str, text: str):
-		await self._task._client.apiAsync.TasksNotesAdd(
-			timeline=self._task._client.timeline,
+	async def _SendAsync(self, title, text):
+		return _Transaction(self._task, await self._task._client.apiAsync.TasksNotesAdd(
+			timeline=await self._task._client._TimelineAsync(),
 			list_id=self._task._listId,
 			taskseries_id=self._task._taskSeriesId,
 			task_id=self._task._taskId,
 			note_title=title,
-			note_text=text)
+			note_text=text))
 
-class TagsProperty(_Property[set[str]]):
-	def Set(self, value: set[str]):
+class TagsProperty(_SettableProperty[set[str]]):
+	def _Send(self, value: set[str]):
 		task = self._task
 		client = task._client
-		client.api.TasksSetTags(timeline=self._task._client.timeline,
+		return _Transaction(self._task, client.api.TasksSetTags(timeline=self._task._client._Timeline(),
 								list_id=self._task._listId,
 								taskseries_id=self._task._taskSeriesId,
 								task_id=self._task._taskId,
-								tags=list(value))
+								tags=list(value)))
 
-	async def SetAsync(self, value: set[str]):
+	async def _SendAsync(self, value: set[str]):
 		task = self._task
 		client = task._client
-		await client.apiAsync.TasksSetTags(timeline=self._task._client.timeline,
+		return _Transaction(self._task, await client.apiAsync.TasksSetTags(timeline=await self._task._client._TimelineAsync(),
 								list_id=self._task._listId,
 								taskseries_id=self._task._taskSeriesId,
 								task_id=self._task._taskId,
-								tags=list(value))
+								tags=list(value)))
 
-class CompleteProperty(_Property[bool]):
-	def Set(self, value: bool):
+class CompleteProperty(_SettableProperty[bool]):
+	def _Send(self, value: bool):
 		if value is True:
-			self._task._client.api.TasksComplete(
-				timeline=self._task._client.timeline,
-				list_id=self._task._listId,
-				taskseries_id=self._task._taskSeriesId,
-				task_id=self._task._taskId)
-		else:
-			self._task._client.api.TasksUncomplete(
-				timeline=self._task._client.timeline,
+			return _Transaction(self._task, self._task._client.api.TasksComplete(
+				timeline=self._task._client._Timeline(),
 				list_id=self._task._listId,
 				taskseries_id=self._task._taskSeriesId,
-				task_id=self._task._taskId)
+				task_id=self._task._taskId))
+		return _Transaction(self._task, self._task._client.api.TasksUncomplete(
+			timeline=self._task._client._Timeline(),
+			list_id=self._task._listId,
+			taskseries_id=self._task._taskSeriesId,
+			task_id=self._task._taskId))
 
-	async def SetAsync(self, value: bool):
+	async def _SendAsync(self, value: bool):
 		if value is True:
-			await self._task._client.apiAsync.TasksComplete(
-				timeline=self._task._client.timeline,
-				list_id=self._task._listId,
-				taskseries_id=self._task._taskSeriesId,
-				task_id=self._task._taskId)
-		else:
-			await self._task._client.apiAsync.TasksUncomplete(
-				timeline=self._task._client.timeline,
+			return _Transaction(self._task, await self._task._client.apiAsync.TasksComplete(
+				timeline=await self._task._client._TimelineAsync(),
 				list_id=self._task._listId,
 				taskseries_id=self._task._taskSeriesId,
-				task_id=self._task._taskId)
+				task_id=self._task._taskId))
+		return _Transaction(self._task, await self._task._client.apiAsync.TasksUncomplete(
+			timeline=await self._task._client._TimelineAsync(),
+			list_id=self._task._listId,
+			taskseries_id=self._task._taskSeriesId,
+			task_id=self._task._taskId))
 
-class DateProperty(_Property[date | datetime | None]):
-	def __init__(self, task, dateType):
+class DateProperty(_SettableProperty[date | datetime | None]):
+	def __init__(self, task, dateType, method):
 		super().__init__(task)
 		self._dateType = dateType
+		# name of the API/APIAsync function that sets it
+		self._method = method
 
-	def _Parameters(self, value):
+	def _Parameters(self, timeline, value):
 		parameters = {
-			'timeline': self._task._client.timeline,
+			'timeline': timeline,
 			'list_id': self._task._listId,
 			'taskseries_id': self._task._taskSeriesId,
 			'task_id': self._task._taskId,
@@ -113,39 +163,35 @@ class DateProperty(_Property[date | datetime | None]):
 			parameters[f'has_{self._dateType}_time'] = isinstance(value, datetime)
 		return parameters
 
-	def Set(self, value: date | datetime | None):
-		parameters = self._Parameters(value)
-		(self.__class__.F)(self._task._client.api, **parameters) # ty: ignore[unresolved-attribute]
+	def _Send(self, value: date | datetime | None):
+		parameters = self._Parameters(self._task._client._Timeline(), value)
+		return _Transaction(self._task, getattr(self._task._client.api, self._method)(**parameters))
 
-	async def SetAsync(self, value: date | datetime | None):
-		parameters = self._Parameters(value)
-		await (self.__class__.FA)(self._task._client.apiAsync, **parameters) # ty: ignore[unresolved-attribute]
+	async def _SendAsync(self, value: date | datetime | None):
+		parameters = self._Parameters(await self._task._client._TimelineAsync(), value)
+		return _Transaction(self._task, await getattr(self._task._client.apiAsync, self._method)(**parameters))
 
 class StartDateProperty(DateProperty):
 	"""None means no start date"""
 	def __init__(self, task):
-		super().__init__(task, 'start')
-		self.__class__.F = staticmethod(API.TasksSetStartDate) # ty: ignore[unresolved-attribute]
-		self.__class__.FA = staticmethod(APIAsync.TasksSetStartDate) # ty: ignore[unresolved-attribute]
+		super().__init__(task, 'start', 'TasksSetStartDate')
 
 class DueDateProperty(DateProperty):
 	"""None means no due date"""
 	def __init__(self, task):
-		super().__init__(task, 'due')
-		self.__class__.F = staticmethod(API.TasksSetDueDate) # ty: ignore[unresolved-attribute]
-		self.__class__.FA = staticmethod(APIAsync.TasksSetDueDate) # ty: ignore[unresolved-attribute]
+		super().__init__(task, 'due', 'TasksSetDueDate')
 
-class NameProperty(_Property[str]):
-	def Set(self, value: str):
-		self._task._client.api.TasksSetName(timeline=self._task._client.timeline,
+class NameProperty(_SettableProperty[str]):
+	def _Send(self, value: str):
+		return _Transaction(self._task, self._task._client.api.TasksSetName(timeline=self._task._client._Timeline(),
 								list_id=self._task._listId,
 								taskseries_id=self._task._taskSeriesId,
 								task_id=self._task._taskId,
-								name=value)
+								name=value))
 
-	async def SetAsync(self, value: str):
-		await self._task._client.apiAsync.TasksSetName(timeline=self._task._client.timeline,
+	async def _SendAsync(self, value: str):
+		return _Transaction(self._task, await self._task._client.apiAsync.TasksSetName(timeline=await self._task._client._TimelineAsync(),
 								list_id=self._task._listId,
 								taskseries_id=self._task._taskSeriesId,
 								task_id=self._task._taskId,
-								name=value)
+								name=value))
@@ -2,12 +2,13 @@ from __future__ import annotations
 
 from datetime import date, datetime, timezone
 from hashlib import md5
-from logging import getLogger
+from logging import DEBUG, getLogger
 from pprint import pformat
 
 from pydantic import validate_call, ValidationError
 
-from .models import APIError, AuthResponse, EchoResponse, FailStat, ListsResponse, NotesResponse, PriorityDirectionEnum, PriorityEnum, SettingsResponse, SingleListResponse, SubscriptionListResponse, SubscriptionResponse, TagListResponse, TaskListResponse, TaskPayload, TaskResponse, TimelineResponse, TopicListResponse
+from .models import APIError, AuthResponse, EchoResponse, FailStat, ListsResponse, NotesResponse, OkStat, PriorityDirectionEnum, PriorityEnum, SettingsResponse, SingleListResponse, SubscriptionListResponse, SubscriptionResponse
+from .models import TagListResponse, TaskListResponse, TaskPayload, TaskResponse, TimelineResponse, TopicListResponse
 from ._utils import HttpsUrl
 
 REST_URL = 'https://api.rememberthemilk.com/services/rest/'
@@ -27,7 +28,8 @@ def _RebuildArgs(**kwargs):
 	return {key: value for key, value in kwargs.items() if value is not None}
 
 def _ValidateReturn(type_, rsp):
-	_log.debug(f'Parsing {type_}:\n{pformat(rsp)}')
+	if _log.isEnabledFor(DEBUG):
+		_log.debug(f'Parsing {type_}:\n{pformat(rsp)}')
 	try:
 		return type_(**rsp)
 	except ValidationError as e:
@@ -204,6 +206,14 @@ class TimelinesCreate(AuthorizedCall):
 	def Out(cls, **rsp):
 		return _ValidateReturn(TimelineResponse, rsp)
 
+class TransactionsUndo(AuthorizedCall):
+	def In(self, timeline: str, transaction_id: str):
+		return self.CommonParams('rtm.transactions.undo', timeline=timeline, transaction_id=transaction_id)
+
+	@classmethod
+	def Out(cls, **rsp):
+		return _ValidateReturn(OkStat, rsp)
+
 class SettingsGetList(AuthorizedCall):
 	def In(self):
 		return self.CommonParams('rtm.settings.getList')
@@ -31,3 +31,10 @@ class SecretsWithAuthorization(Secrets):
 		params.update({'auth_token': self.token})
 		params['api_sig'] = self._ApiSig(params)
 		return params
+
+# the parameters which would let someone make calls as the user
+_SECRET_PARAMS = ('api_key', 'auth_token', 'api_sig')
+
+def _Redacted(params):
+	"""Copy of the signed parameters without the secrets, e.g. for logging"""
+	return {key: '<redacted>' if key in _SECRET_PARAMS else value for key, value in params.items()}
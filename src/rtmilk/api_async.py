@@ -3,43 +3,79 @@ from __future__ import annotations
 from datetime import date, datetime
 from logging import getLogger
 
-from niquests import AsyncSession, JSONDecodeError, RequestException
+from niquests import AsyncSession, RequestException
 from pydantic import validate_call
 
 from .api_base import UnauthorizedAPIBase
-from .models import AuthResponse, BaseError, EchoResponse, ListsResponse, NotesResponse, PriorityDirectionEnum, PriorityEnum, SettingsResponse, SingleListResponse, SubscriptionListResponse, SubscriptionResponse, TagListResponse, TaskListResponse, TaskPayload, TaskResponse, TimelineResponse, TopicListResponse
+from .metrics import _CallTimer
+from .models import AuthResponse, BaseError, EchoResponse, ListsResponse, NotesResponse, OkStat, PriorityDirectionEnum, PriorityEnum, SettingsResponse, SingleListResponse, SubscriptionListResponse, SubscriptionResponse, TagListResponse, TaskListResponse, TaskPayload, TaskResponse, TimelineResponse, TopicListResponse
 from ._sansio import AuthCheckToken, AuthGetFrob, AuthGetToken, ListsAdd, ListsArchive, ListsDelete, ListsGetList, ListsSetDefaultList, ListsSetName, ListsUnarchive, PushGetSubscriptions, PushGetTopics, PushSubscribe, PushUnsubscribe, TagsGetList, TasksAdd, TasksAddTags, TasksComplete, TasksDelete, TasksGetList
-from ._sansio import TasksMovePriority, TasksNotesAdd, TasksRemoveTags, TasksSetDueDate, TasksSetName, TasksSetPriority, TasksSetStartDate, TasksSetTags, TasksUncomplete, TestEcho, TimelinesCreate, SettingsGetList, REST_URL
+from ._sansio import TasksMovePriority, TasksNotesAdd, TasksRemoveTags, TasksSetDueDate, TasksSetName, TasksSetPriority, TasksSetStartDate, TasksSetTags, TasksUncomplete, TestEcho, TimelinesCreate, TransactionsUndo, SettingsGetList, REST_URL
+from .profiling import Stage
+from .ratelimit import RateLimiter
 from ._secrets import SecretsWithAuthorization
 from ._utils import HttpsUrl
 
 _log = getLogger(__name__)
 
-async def _CallAsync(params):
+async def _GetAsync(params):
 	try:
 		async with AsyncSession() as session:
-			resp = await session.get(REST_URL, params=params)
-			return resp.json()['rsp']
-	except (RequestException, JSONDecodeError) as e:
+			return await session.get(REST_URL, params=params)
+	except RequestException as e:
 		raise BaseError from e
 
 class UnauthorizedAPIAsync(UnauthorizedAPIBase):
-	"""Async wrappers for API calls that don't need authorization"""
+	"""Async wrappers for API calls that don't need authorization. With a rateLimiter, every call waits for it"""
+
+	def __init__(self, apiKey: str, sharedSecret: str, rateLimiter: RateLimiter | None = None):
+		super().__init__(apiKey, sharedSecret)
+		self._rateLimiter = rateLimiter
+
+	async def _Call(self, call, secrets, /, *args, **params):
+		"""Sign, send and parse one call, timing each stage for the hooks"""
+		timer = _CallTimer(call.__name__)
+		try:
+			params = call(secrets).In(*args, **params)
+			timer.method = params['method']
+			timer.Lap('sign')
+			if self._rateLimiter is not None:
+				await self._rateLimiter.AcquireAsync()
+			timer.Lap('wait')
+			with Stage('transport'):
+				response = await _GetAsync(params) if self.transport is None else await self.transport.GetAsync(params, _GetAsync)
+			timer.Lap('network')
+			timer.responseBytes = len(response.content or b'')
+			if self.payloads is not None:
+				self.payloads.Record(params, response.content)
+			try:
+				with Stage('decode'):
+					rsp = response.json()['rsp']
+			except ValueError as e: # includes niquests' JSONDecodeError
+				raise BaseError from e
+			timer.Lap('decode')
+			with Stage('validate'):
+				result = call.Out(**rsp)
+			timer.Lap('validate')
+		except Exception as e:
+			self._Report(timer, e)
+			raise
+		self._Report(timer, result)
+		return result
 
 	async def TestEcho(self, **params) -> EchoResponse:
-		rsp = await _CallAsync(TestEcho(self._secrets).In(**params))
-		return TestEcho.Out(**rsp)
+		return await self._Call(TestEcho, self._secrets, **params)
 
 	async def AuthGetFrob(self) -> str:
-		return AuthGetFrob.Out(** await _CallAsync(AuthGetFrob(self._secrets).In()))
+		return await self._Call(AuthGetFrob, self._secrets)
 
 	@validate_call
 	async def AuthGetToken(self, frob: str) -> str:
-		return AuthGetToken.Out(** await _CallAsync(AuthGetToken(self._secrets).In(frob)))
+		return await self._Call(AuthGetToken, self._secrets, frob)
 
 	@validate_call
 	async def AuthCheckToken(self, auth_token: str) -> AuthResponse:
-		return AuthCheckToken.Out(** await _CallAsync(AuthCheckToken(self._secrets).In(auth_token)))
+		return await self._Call(AuthCheckToken, self._secrets, auth_token)
 
 class APIAsync(UnauthorizedAPIAsync):
 	"""Low-level asynchronous API wrapper
@@ -49,8 +85,8 @@ class APIAsync(UnauthorizedAPIAsync):
 	The inputs are python types
 	The outputs are parsed into pydantic types, including errors"""
 
-	def __init__(self, apiKey: str, sharedSecret: str, token: str):
-		super().__init__(apiKey, sharedSecret)
+	def __init__(self, apiKey: str, sharedSecret: str, token: str, rateLimiter: RateLimiter | None = None):
+		super().__init__(apiKey, sharedSecret, rateLimiter)
 		self._authSecrets = SecretsWithAuthorization(apiKey, sharedSecret, token)
 
 	@property
@@ -59,106 +95,110 @@ class APIAsync(UnauthorizedAPIAsync):
 
 	@validate_call
 	async def ListsAdd(self, timeline: str, name: str, filter: str | None = None) -> SingleListResponse:
-		return ListsAdd.Out(** await _CallAsync(ListsAdd(self._authSecrets).In(timeline=timeline, name=name, filter=filter)))
+		return await self._Call(ListsAdd, self._authSecrets, timeline=timeline, name=name, filter=filter)
 
 	@validate_call
 	async def ListsArchive(self, timeline: str, list_id: str) -> SingleListResponse:
-		return ListsArchive.Out(** await _CallAsync(ListsArchive(self._authSecrets).In(timeline=timeline, list_id=list_id)))
+		return await self._Call(ListsArchive, self._authSecrets, timeline=timeline, list_id=list_id)
 
 	@validate_call
 	async def ListsDelete(self, timeline: str, list_id: str) -> SingleListResponse:
-		return ListsDelete.Out(** await _CallAsync(ListsDelete(self._authSecrets).In(timeline=timeline, list_id=list_id)))
+		return await self._Call(ListsDelete, self._authSecrets, timeline=timeline, list_id=list_id)
 
 	async def ListsGetList(self) -> ListsResponse:
-		return ListsGetList.Out(** await _CallAsync(ListsGetList(self._authSecrets).In()))
+		return await self._Call(ListsGetList, self._authSecrets)
 
 	@validate_call
 	async def ListsSetDefaultList(self, timeline: str, list_id: str) -> None:
-		return ListsSetDefaultList.Out(** await _CallAsync(ListsSetDefaultList(self._authSecrets).In(timeline=timeline, list_id=list_id)))
+		return await self._Call(ListsSetDefaultList, self._authSecrets, timeline=timeline, list_id=list_id)
 
 	@validate_call
 	async def ListsSetName(self, timeline: str, list_id: str, name: str) -> SingleListResponse:
-		return ListsSetName.Out(** await _CallAsync(ListsSetName(self._authSecrets).In(timeline=timeline, list_id=list_id, name=name)))
+		return await self._Call(ListsSetName, self._authSecrets, timeline=timeline, list_id=list_id, name=name)
 
 	@validate_call
 	async def ListsUnarchive(self, timeline: str, list_id: str) -> SingleListResponse:
-		return ListsUnarchive.Out(** await _CallAsync(ListsUnarchive(self._authSecrets).In(timeline=timeline, list_id=list_id)))
+		return await self._Call(ListsUnarchive, self._authSecrets, timeline=timeline, list_id=list_id)
 
 	async def PushGetSubscriptions(self) -> SubscriptionListResponse:
-		return PushGetSubscriptions.Out(** await _CallAsync(PushGetSubscriptions(self._authSecrets).In()))
+		return await self._Call(PushGetSubscriptions, self._authSecrets)
 
 	async def PushGetTopics(self) -> TopicListResponse:
-		return PushGetTopics.Out(** await _CallAsync(PushGetTopics(self._authSecrets).In()))
+		return await self._Call(PushGetTopics, self._authSecrets)
 
 	@validate_call
 	async def PushSubscribe(self, url: HttpsUrl, topics: str, push_format: str, timeline: str, lease_seconds: int | None = None, filter: str | None = None) -> SubscriptionResponse:
-		return PushSubscribe.Out(** await _CallAsync(PushSubscribe(self._authSecrets).In(url=url, topics=topics, push_format=push_format, timeline=timeline, lease_seconds=lease_seconds, filter=filter)))
+		return await self._Call(PushSubscribe, self._authSecrets, url=url, topics=topics, push_format=push_format, timeline=timeline, lease_seconds=lease_seconds, filter=filter)
 
 	@validate_call
 	async def PushUnsubscribe(self, timeline: str, subscription_id: str) -> None:
-		return PushUnsubscribe.Out(** await _CallAsync(PushUnsubscribe(self._authSecrets).In(timeline=timeline, subscription_id=subscription_id)))
+		return await self._Call(PushUnsubscribe, self._authSecrets, timeline=timeline, subscription_id=subscription_id)
 
 	async def TimelinesCreate(self) -> TimelineResponse:
-		return TimelinesCreate.Out(** await _CallAsync(TimelinesCreate(self._authSecrets).In()))
+		return await self._Call(TimelinesCreate, self._authSecrets)
+
+	@validate_call
+	async def TransactionsUndo(self, timeline: str, transaction_id: str) -> OkStat:
+		return await self._Call(TransactionsUndo, self._authSecrets, timeline=timeline, transaction_id=transaction_id)
 
 	async def SettingsGetList(self) -> SettingsResponse:
-		return SettingsGetList.Out(** await _CallAsync(SettingsGetList(self._authSecrets).In()))
+		return await self._Call(SettingsGetList, self._authSecrets)
 
 	async def TagsGetList(self) -> TagListResponse:
-		return TagsGetList.Out(** await _CallAsync(TagsGetList(self._authSecrets).In()))
+		return await self._Call(TagsGetList, self._authSecrets)
 
 	@validate_call
 	async def TasksAdd(self, timeline: str, name: str, list_id: str | None = None, parse: bool | None = None, parent_task_id: str | None = None, external_id: str | None = None) -> TaskResponse:
-		return TasksAdd.Out(** await _CallAsync(TasksAdd(self._authSecrets).In(timeline=timeline, name=name, list_id=list_id, parse=parse, parent_task_id=parent_task_id, external_id=external_id)))
+		return await self._Call(TasksAdd, self._authSecrets, timeline=timeline, name=name, list_id=list_id, parse=parse, parent_task_id=parent_task_id, external_id=external_id)
 
 	@validate_call
 	async def TasksAddTags(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, tags: list[str]) -> TaskResponse:
-		return TasksAddTags.Out(** await _CallAsync(TasksAddTags(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, tags=tags)))
+		return await self._Call(TasksAddTags, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, tags=tags)
 
 	@validate_call
 	async def TasksComplete(self, timeline: str, list_id: str, taskseries_id: str, task_id: str) -> TaskResponse:
-		return TasksComplete.Out(** await _CallAsync(TasksComplete(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id)))
+		return await self._Call(TasksComplete, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id)
 
 	@validate_call
 	async def TasksUncomplete(self, timeline: str, list_id: str, taskseries_id: str, task_id: str) -> TaskResponse:
-		return TasksUncomplete.Out(** await _CallAsync(TasksUncomplete(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id)))
+		return await self._Call(TasksUncomplete, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id)
 
 	@validate_call
 	async def TasksDelete(self, timeline: str, list_id: str, taskseries_id: str, task_id: str) -> TaskResponse:
-		return TasksDelete.Out(** await _CallAsync(TasksDelete(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id)))
+		return await self._Call(TasksDelete, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id)
 
 	@validate_call
 	async def TasksGetList(self, list_id: str | None = None, filter: str | None = None, last_sync: datetime | None = None) -> TaskListResponse:
-		return TasksGetList.Out(** await _CallAsync(TasksGetList(self._authSecrets).In(list_id=list_id, filter=filter, last_sync=last_sync)))
+		return await self._Call(TasksGetList, self._authSecrets, list_id=list_id, filter=filter, last_sync=last_sync)
 
 	@validate_call
 	async def TasksMovePriority(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, direction: PriorityDirectionEnum) -> TaskResponse:
-		return TasksMovePriority.Out(** await _CallAsync(TasksMovePriority(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, direction=direction)))
+		return await self._Call(TasksMovePriority, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, direction=direction)
 
 	@validate_call
 	async def TasksNotesAdd(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, note_title: str, note_text: str) -> NotesResponse:
-		return TasksNotesAdd.Out(** await _CallAsync(TasksNotesAdd(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, note_title=note_title, note_text=note_text)))
+		return await self._Call(TasksNotesAdd, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, note_title=note_title, note_text=note_text)
 
 	@validate_call
 	async def TasksRemoveTags(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, tags: list[str]) -> TaskResponse:
-		return TasksRemoveTags.Out(** await _CallAsync(TasksRemoveTags(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, tags=tags)))
+		return await self._Call(TasksRemoveTags, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, tags=tags)
 
 	@validate_call
 	async def TasksSetDueDate(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, due: date | datetime | str | None = None, has_due_time: bool | None = None, parse: bool | None = None) -> TaskResponse:
-		return TasksSetDueDate.Out(** await _CallAsync(TasksSetDueDate(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, due=due, has_due_time=has_due_time, parse=parse)))
+		return await self._Call(TasksSetDueDate, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, due=due, has_due_time=has_due_time, parse=parse)
 
 	@validate_call
 	async def TasksSetName(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, name: str) -> TaskResponse:
-		return TasksSetName.Out(** await _CallAsync(TasksSetName(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, name=name)))
+		return await self._Call(TasksSetName, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, name=name)
 
 	@validate_call
 	async def TasksSetPriority(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, priority: PriorityEnum | None = None) -> TaskPayload:
-		return TasksSetPriority.Out(** await _CallAsync(TasksSetPriority(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, priority=priority)))
+		return await self._Call(TasksSetPriority, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, priority=priority)
 
 	@validate_call
 	async def TasksSetStartDate(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, start: date | datetime | str | None = None, has_start_time: bool | None = None, parse: bool | None = None) -> TaskResponse:
-		return TasksSetStartDate.Out(** await _CallAsync(TasksSetStartDate(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, start=start, has_start_time=has_start_time, parse=parse)))
+		return await self._Call(TasksSetStartDate, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, start=start, has_start_time=has_start_time, parse=parse)
 
 	@validate_call
 	async def TasksSetTags(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, tags: list[str] | None = None) -> TaskResponse:
-		return TasksSetTags.Out(** await _CallAsync(TasksSetTags(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, tags=tags)))
+		return await self._Call(TasksSetTags, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, tags=tags)
@@ -1,14 +1,45 @@
+from logging import getLogger
+
 from ._secrets import Secrets, SecretsWithAuthorization
 
+_log = getLogger(__name__)
+
 class UnauthorizedAPIBase:
-	"""Holds secrets for unauthorized calls"""
+	"""Holds secrets for unauthorized calls, and the hooks which are told about every call"""
 	def __init__(self, apiKey, sharedSecret):
 		self._secrets = Secrets(apiKey, sharedSecret)
+		# replaced rather than changed, so a call that's reporting doesn't see a hook being added
+		self._hooks = ()
+		# set to a PayloadRingBuffer to keep the raw payloads of the most recent calls
+		self.payloads = None
+		# set to e.g. a RecordingTransport or ReplayTransport to change how the requests are sent
+		self.transport = None
 
 	@property
 	def secrets(self):
 		return self._secrets
 
+	def AddHook(self, hook):
+		"""hook is called with the CallMetrics of each call, e.g. a MetricsCollector or MetricsExporter"""
+		self._hooks = (*self._hooks, hook)
+
+	def RemoveHook(self, hook):
+		self._hooks = tuple(hook_ for hook_ in self._hooks if hook_ is not hook)
+
+	def _Report(self, timer, result):
+		if len(self._hooks) == 0:
+			return
+		metrics = timer.Metrics(result)
+		for hook in self._hooks:
+			self._CallHook(hook, metrics)
+
+	@staticmethod
+	def _CallHook(hook, metrics):
+		try:
+			hook(metrics)
+		except Exception: # noqa: BLE001 - a broken hook mustn't break the call
+			_log.exception(f'Hook {hook} failed on {metrics}')
+
 class AuthorizedAPIBase:
 	"""Holds secrets for authorized calls"""
 	def __init__(self, apiKey, sharedSecret, token):
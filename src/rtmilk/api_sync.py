@@ -1,47 +1,93 @@
 from __future__ import annotations
 
 from datetime import date, datetime
-from logging import getLogger
+from logging import DEBUG, getLogger
 from pprint import pformat
+from threading import Lock
 
 from pydantic import validate_call
-from niquests import get
+from niquests import Session
 from niquests.exceptions import RequestException
 
 from .api_base import UnauthorizedAPIBase
-from .models import AuthResponse, BaseError, EchoResponse, ListsResponse, NotesResponse, PriorityDirectionEnum, PriorityEnum, SettingsResponse, SingleListResponse, SubscriptionListResponse, SubscriptionResponse, TagListResponse, TaskListResponse, TaskPayload, TaskResponse, TimelineResponse, TopicListResponse
+from .metrics import _CallTimer
+from .models import AuthResponse, BaseError, EchoResponse, ListsResponse, NotesResponse, OkStat, PriorityDirectionEnum, PriorityEnum, SettingsResponse, SingleListResponse, SubscriptionListResponse, SubscriptionResponse, TagListResponse, TaskListResponse, TaskPayload, TaskResponse, TimelineResponse, TopicListResponse
 from ._sansio import AuthCheckToken, AuthGetFrob, AuthGetToken, ListsAdd, ListsArchive, ListsDelete, ListsGetList, ListsSetDefaultList, ListsSetName, ListsUnarchive, PushGetSubscriptions, PushGetTopics, PushSubscribe, PushUnsubscribe, TagsGetList, TasksAdd, TasksAddTags, TasksComplete, TasksDelete, TasksGetList
-from ._sansio import TasksMovePriority, TasksNotesAdd, TasksRemoveTags, TasksSetDueDate, TasksSetName, TasksSetPriority, TasksSetStartDate, TasksSetTags, TasksUncomplete, TestEcho, TimelinesCreate, SettingsGetList, REST_URL
+from ._sansio import TasksMovePriority, TasksNotesAdd, TasksRemoveTags, TasksSetDueDate, TasksSetName, TasksSetPriority, TasksSetStartDate, TasksSetTags, TasksUncomplete, TestEcho, TimelinesCreate, TransactionsUndo, SettingsGetList, REST_URL
+from .profiling import Stage
+from .ratelimit import RateLimiter
 from ._secrets import SecretsWithAuthorization
 from ._utils import HttpsUrl
 
 _log = getLogger(__name__)
 
-def _CallSync(params):
-	try:
-		response = get(REST_URL, params=params)
-		json = response.json()
-		_log.debug(f'JSON response:\n{pformat(json)}')
-		return json['rsp']
-	except (RequestException, ValueError) as e:
-		raise BaseError from e
-
 class UnauthorizedAPI(UnauthorizedAPIBase):
-	"""Synchronous wrappers for API calls that don't need authorization"""
+	"""Synchronous wrappers for API calls that don't need authorization
+	Safe to use from multiple threads, which share one pooled session. With a rateLimiter, every call waits for it"""
+
+	def __init__(self, apiKey: str, sharedSecret: str, rateLimiter: RateLimiter | None = None, maxConnections: int = 10):
+		super().__init__(apiKey, sharedSecret)
+		self._rateLimiter = rateLimiter
+		self._maxConnections = maxConnections
+		self._session = None
+		self._sessionLock = Lock()
+
+	def _Session(self):
+		if self._session is None:
+			with self._sessionLock:
+				if self._session is None:
+					self._session = Session(pool_maxsize=self._maxConnections)
+		return self._session
+
+	def _Get(self, params):
+		return self._Session().get(REST_URL, params=params)
+
+	def _Call(self, call, secrets, /, *args, **params):
+		"""Sign, send and parse one call, timing each stage for the hooks"""
+		timer = _CallTimer(call.__name__)
+		try:
+			params = call(secrets).In(*args, **params)
+			timer.method = params['method']
+			timer.Lap('sign')
+			if self._rateLimiter is not None:
+				self._rateLimiter.Acquire()
+			timer.Lap('wait')
+			try:
+				with Stage('transport'):
+					response = self._Get(params) if self.transport is None else self.transport.Get(params, self._Get)
+				timer.Lap('network')
+				timer.responseBytes = len(response.content or b'')
+				if self.payloads is not None:
+					self.payloads.Record(params, response.content)
+				with Stage('decode'):
+					json = response.json()
+				timer.Lap('decode')
+			except (RequestException, ValueError) as e:
+				raise BaseError from e
+			if _log.isEnabledFor(DEBUG):
+				_log.debug(f'JSON response:\n{pformat(json)}')
+			with Stage('validate'):
+				result = call.Out(**json['rsp'])
+			timer.Lap('validate')
+		except Exception as e:
+			self._Report(timer, e)
+			raise
+		self._Report(timer, result)
+		return result
 
 	def TestEcho(self, **params) -> EchoResponse:
-		return TestEcho.Out(**_CallSync(TestEcho(self._secrets).In(**params)))
+		return self._Call(TestEcho, self._secrets, **params)
 
 	def AuthGetFrob(self) -> str:
-		return AuthGetFrob.Out(**_CallSync(AuthGetFrob(self._secrets).In()))
+		return self._Call(AuthGetFrob, self._secrets)
 
 	@validate_call
 	def AuthGetToken(self, frob: str) -> str:
-		return AuthGetToken.Out(**_CallSync(AuthGetToken(self._secrets).In(frob)))
+		return self._Call(AuthGetToken, self._secrets, frob)
 
 	@validate_call
 	def AuthCheckToken(self, auth_token: str) -> AuthResponse:
-		return AuthCheckToken.Out(**_CallSync(AuthCheckToken(self._secrets).In(auth_token)))
+		return self._Call(AuthCheckToken, self._secrets, auth_token)
 
 # replace self._secrets with the authorized version
 # allow to call unauthorized secrets with the same object
@@ -53,8 +99,8 @@ class API(UnauthorizedAPI):
 	The inputs are python types
 	The outputs are parsed into pydantic types, including errors"""
 
-	def __init__(self, apiKey: str, sharedSecret: str, token: str):
-		super().__init__(apiKey, sharedSecret)
+	def __init__(self, apiKey: str, sharedSecret: str, token: str, rateLimiter: RateLimiter | None = None, maxConnections: int = 10):
+		super().__init__(apiKey, sharedSecret, rateLimiter, maxConnections)
 		self._authSecrets = SecretsWithAuthorization(apiKey, sharedSecret, token)
 
 	@property
@@ -63,106 +109,110 @@ class API(UnauthorizedAPI):
 
 	@validate_call
 	def ListsAdd(self, timeline: str, name: str, filter: str | None = None) -> SingleListResponse:
-		return ListsAdd.Out(**_CallSync(ListsAdd(self._authSecrets).In(timeline=timeline, name=name, filter=filter)))
+		return self._Call(ListsAdd, self._authSecrets, timeline=timeline, name=name, filter=filter)
 
 	@validate_call
 	def ListsArchive(self, timeline: str, list_id: str) -> SingleListResponse:
-		return ListsArchive.Out(**_CallSync(ListsArchive(self._authSecrets).In(timeline=timeline, list_id=list_id)))
+		return self._Call(ListsArchive, self._authSecrets, timeline=timeline, list_id=list_id)
 
 	@validate_call
 	def ListsDelete(self, timeline: str, list_id: str) -> SingleListResponse:
-		return ListsDelete.Out(**_CallSync(ListsDelete(self._authSecrets).In(timeline=timeline, list_id=list_id)))
+		return self._Call(ListsDelete, self._authSecrets, timeline=timeline, list_id=list_id)
 
 	def ListsGetList(self) -> ListsResponse:
-		return ListsGetList.Out(**_CallSync(ListsGetList(self._authSecrets).In()))
+		return self._Call(ListsGetList, self._authSecrets)
 
 	@validate_call
 	def ListsSetDefaultList(self, timeline: str, list_id: str) -> None:
-		return ListsSetDefaultList.Out(**_CallSync(ListsSetDefaultList(self._authSecrets).In(timeline=timeline, list_id=list_id)))
+		return self._Call(ListsSetDefaultList, self._authSecrets, timeline=timeline, list_id=list_id)
 
 	@validate_call
 	def ListsSetName(self, timeline: str, list_id: str, name: str) -> SingleListResponse:
-		return ListsSetName.Out(**_CallSync(ListsSetName(self._authSecrets).In(timeline=timeline, list_id=list_id, name=name)))
+		return self._Call(ListsSetName, self._authSecrets, timeline=timeline, list_id=list_id, name=name)
 
 	@validate_call
 	def ListsUnarchive(self, timeline: str, list_id: str) -> SingleListResponse:
-		return ListsUnarchive.Out(**_CallSync(ListsUnarchive(self._authSecrets).In(timeline=timeline, list_id=list_id)))
+		return self._Call(ListsUnarchive, self._authSecrets, timeline=timeline, list_id=list_id)
 
 	def PushGetSubscriptions(self) -> SubscriptionListResponse:
-		return PushGetSubscriptions.Out(**_CallSync(PushGetSubscriptions(self._authSecrets).In()))
+		return self._Call(PushGetSubscriptions, self._authSecrets)
 
 	def PushGetTopics(self) -> TopicListResponse:
-		return PushGetTopics.Out(**_CallSync(PushGetTopics(self._authSecrets).In()))
+		return self._Call(PushGetTopics, self._authSecrets)
 
 	@validate_call
 	def PushSubscribe(self, url: HttpsUrl, topics: str, push_format: str, timeline: str, lease_seconds: int | None = None, filter: str | None = None) -> SubscriptionResponse:
-		return PushSubscribe.Out(**_CallSync(PushSubscribe(self._authSecrets).In(url=url, topics=topics, push_format=push_format, timeline=timeline, lease_seconds=lease_seconds, filter=filter)))
+		return self._Call(PushSubscribe, self._authSecrets, url=url, topics=topics, push_format=push_format, timeline=timeline, lease_seconds=lease_seconds, filter=filter)
 
 	@validate_call
 	def PushUnsubscribe(self, timeline: str, subscription_id: str) -> None:
-		return PushUnsubscribe.Out(**_CallSync(PushUnsubscribe(self._authSecrets).In(timeline=timeline, subscription_id=subscription_id)))
+		return self._Call(PushUnsubscribe, self._authSecrets, timeline=timeline, subscription_id=subscription_id)
 
 	def TimelinesCreate(self) -> TimelineResponse:
-		return TimelinesCreate.Out(**_CallSync(TimelinesCreate(self._authSecrets).In()))
+		return self._Call(TimelinesCreate, self._authSecrets)
+
+	@validate_call
+	def TransactionsUndo(self, timeline: str, transaction_id: str) -> OkStat:
+		return self._Call(TransactionsUndo, self._authSecrets, timeline=timeline, transaction_id=transaction_id)
 
 	def SettingsGetList(self) -> SettingsResponse:
-		return SettingsGetList.Out(**_CallSync(SettingsGetList(self._authSecrets).In()))
+		return self._Call(SettingsGetList, self._authSecrets)
 
 	def TagsGetList(self) -> TagListResponse:
-		return TagsGetList.Out(**_CallSync(TagsGetList(self._authSecrets).In()))
+		return self._Call(TagsGetList, self._authSecrets)
 
 	@validate_call
 	def TasksAdd(self, timeline: str, name: str, list_id: str | None = None, parse: bool | None = None, parent_task_id: str | None = None, external_id: str | None = None) -> TaskResponse:
-		return TasksAdd.Out(**_CallSync(TasksAdd(self._authSecrets).In(timeline=timeline, name=name, list_id=list_id, parse=parse, parent_task_id=parent_task_id, external_id=external_id)))
+		return self._Call(TasksAdd, self._authSecrets, timeline=timeline, name=name, list_id=list_id, parse=parse, parent_task_id=parent_task_id, external_id=external_id)
 
 	@validate_call
 	def TasksAddTags(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, tags: list[str]) -> TaskResponse:
-		return TasksAddTags.Out(**_CallSync(TasksAddTags(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, tags=tags)))
+		return self._Call(TasksAddTags, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, tags=tags)
 
 	@validate_call
 	def TasksComplete(self, timeline: str, list_id: str, taskseries_id: str, task_id: str) -> TaskResponse:
-		return TasksComplete.Out(**_CallSync(TasksComplete(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id)))
+		return self._Call(TasksComplete, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id)
 
 	@validate_call
 	def TasksUncomplete(self, timeline: str, list_id: str, taskseries_id: str, task_id: str) -> TaskResponse:
-		return TasksUncomplete.Out(**_CallSync(TasksUncomplete(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id)))
+		return self._Call(TasksUncomplete, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id)
 
 	@validate_call
 	def TasksDelete(self, timeline: str, list_id: str, taskseries_id: str, task_id: str) -> TaskResponse:
-		return TasksDelete.Out(**_CallSync(TasksDelete(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id)))
+		return self._Call(TasksDelete, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id)
 
 	@validate_call
 	def TasksGetList(self, list_id: str | None = None, filter: str | None = None, last_sync: datetime | None = None) -> TaskListResponse:
-		return TasksGetList.Out(**_CallSync(TasksGetList(self._authSecrets).In(list_id=list_id, filter=filter, last_sync=last_sync)))
+		return self._Call(TasksGetList, self._authSecrets, list_id=list_id, filter=filter, last_sync=last_sync)
 
 	@validate_call
 	def TasksMovePriority(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, direction: PriorityDirectionEnum) -> TaskResponse:
-		return TasksMovePriority.Out(**_CallSync(TasksMovePriority(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, direction=direction)))
+		return self._Call(TasksMovePriority, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, direction=direction)
 
 	@validate_call
 	def TasksNotesAdd(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, note_title: str, note_text: str) -> NotesResponse:
-		return TasksNotesAdd.Out(**_CallSync(TasksNotesAdd(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, note_title=note_title, note_text=note_text)))
+		return self._Call(TasksNotesAdd, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, note_title=note_title, note_text=note_text)
 
 	@validate_call
 	def TasksRemoveTags(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, tags: list[str]) -> TaskResponse:
-		return TasksRemoveTags.Out(**_CallSync(TasksRemoveTags(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, tags=tags)))
+		return self._Call(TasksRemoveTags, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, tags=tags)
 
 	@validate_call
 	def TasksSetDueDate(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, due: date | datetime | str | None = None, has_due_time: bool | None = None, parse: bool | None = None) -> TaskResponse:
-		return TasksSetDueDate.Out(**_CallSync(TasksSetDueDate(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, due=due, has_due_time=has_due_time, parse=parse)))
+		return self._Call(TasksSetDueDate, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, due=due, has_due_time=has_due_time, parse=parse)
 
 	@validate_call
 	def TasksSetName(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, name: str) -> TaskResponse:
-		return TasksSetName.Out(**_CallSync(TasksSetName(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, name=name)))
+		return self._Call(TasksSetName, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, name=name)
 
 	@validate_call
 	def TasksSetPriority(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, priority: PriorityEnum | None = None) -> TaskPayload:
-		return TasksSetPriority.Out(**_CallSync(TasksSetPriority(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, priority=priority)))
+		return self._Call(TasksSetPriority, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, priority=priority)
 
 	@validate_call
 	def TasksSetStartDate(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, start: date | datetime | str | None = None, has_start_time: bool | None = None, parse: bool | None = None) -> TaskResponse:
-		return TasksSetStartDate.Out(**_CallSync(TasksSetStartDate(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, start=start, has_start_time=has_start_time, parse=parse)))
+		return self._Call(TasksSetStartDate, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, start=start, has_start_time=has_start_time, parse=parse)
 
 	@validate_call
 	def TasksSetTags(self, timeline: str, list_id: str, taskseries_id: str, task_id: str, tags: list[str] | None = None) -> TaskResponse:
-		return TasksSetTags.Out(**_CallSync(TasksSetTags(self._authSecrets).In(timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, tags=tags)))
+		return self._Call(TasksSetTags, self._authSecrets, timeline=timeline, list_id=list_id, taskseries_id=taskseries_id, task_id=task_id, tags=tags)
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from asyncio import sleep as asyncio_sleep
+from collections import defaultdict, deque
+from json import dumps, loads
+from logging import getLogger
+from os import PathLike
+from pathlib import Path
+from threading import Lock
+from time import perf_counter, sleep
+
+from .models import BaseError
+from ._secrets import _Redacted, _SECRET_PARAMS
+
+_log = getLogger(__name__)
+
+def _MatchKey(params):
+	"""Requests match if their parameters other than the secrets and signature are the same"""
+	return tuple(sorted((key, value) for key, value in params.items() if key not in _SECRET_PARAMS))
+
+class RecordingTransport:
+	"""Transport which sends the requests as normal and also writes them to a cassette file for ReplayTransport
+	The secrets are redacted from the parameters and responses, so the cassette can be shared
+
+		api.transport = RecordingTransport('cassette.jsonl')"""
+
+	def __init__(self, path: str | PathLike):
+		self.path = Path(path)
+		self._file = None
+		self._lock = Lock()
+
+	def __repr__(self):
+		return f'RecordingTransport({self.path})'
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *_):
+		self.Close()
+
+	def _Record(self, params, response, elapsed):
+		text = (response.content or b'').decode()
+		for key in _SECRET_PARAMS:
+			if key in params:
+				text = text.replace(params[key], '<redacted>')
+		line = dumps({'params': _Redacted(params), 'elapsed': elapsed, 'response': text})
+		with self._lock:
+			if self._file is None:
+				self._file = self.path.open('a', encoding='utf-8')
+			self._file.write(f'{line}\n')
+			self._file.flush()
+
+	def Get(self, params, send):
+		started = perf_counter()
+		response = send(params)
+		self._Record(params, response, perf_counter() - started)
+		return response
+
+	async def GetAsync(self, params, send):
+		started = perf_counter()
+		response = await send(params)
+		self._Record(params, response, perf_counter() - started)
+		return response
+
+	def Close(self):
+		with self._lock:
+			if self._file is not None:
+				self._file.close()
+				self._file = None
+
+class _CassetteResponse:
+	"""The parts of a niquests response that the APIs use"""
+
+	def __init__(self, text):
+		self.content = text.encode()
+
+	def json(self):
+		return loads(self.content)
+
+class ReplayTransport:
+	"""Transport which answers requests from a cassette written by RecordingTransport, without any network access
+	Each request is answered by the next recorded response to a request with the same parameters, ignoring the secrets and signature.
+	With inOrder, requests are answered in the order they were recorded regardless of their parameters,
+	e.g. when the parameters contain names that are different on every run
+	speed is how many times faster than recorded to replay, e.g. 1 for the recorded latency. By default there's no delay"""
+
+	def __init__(self, path: str | PathLike, speed: float | None = None, *, inOrder: bool = False):
+		self.path = Path(path)
+		self.speed = speed
+		self._inOrder = inOrder
+		self._lock = Lock()
+		self._inRecordedOrder = deque()
+		self._byParams = defaultdict(deque)
+		with self.path.open(encoding='utf-8') as f:
+			for line in f:
+				recorded = loads(line)
+				self._inRecordedOrder.append(recorded)
+				self._byParams[_MatchKey(recorded['params'])].append(recorded)
+		_log.info(f'Loaded {len(self._inRecordedOrder)} response(s) from {self.path}')
+
+	def __repr__(self):
+		return f'ReplayTransport({self.path}, {len(self)})'
+
+	def __len__(self):
+		"""The number of responses left"""
+		return len(self._inRecordedOrder)
+
+	def _Next(self, params):
+		with self._lock:
+			if self._inOrder:
+				if len(self._inRecordedOrder) == 0:
+					raise BaseError(f'No responses left in {self.path} for {params.get("method")}')
+				recorded = self._inRecordedOrder.popleft()
+				self._byParams[_MatchKey(recorded['params'])].remove(recorded)
+			else:
+				responses = self._byParams.get(_MatchKey(params))
+				if not responses:
+					raise BaseError(f'No recorded response in {self.path} for {_Redacted(params)}')
+				recorded = responses.popleft()
+				self._inRecordedOrder.remove(recorded)
+		return recorded
+
+	def _Delay(self, recorded):
+		return 0 if self.speed is None else recorded['elapsed'] / self.speed
+
+	def Get(self, params, _send):
+		recorded = self._Next(params)
+		sleep(self._Delay(recorded))
+		return _CassetteResponse(recorded['response'])
+
+	async def GetAsync(self, params, _send):
+		recorded = self._Next(params)
+		await asyncio_sleep(self._Delay(recorded))
+		return _CassetteResponse(recorded['response'])
@@ -1,14 +1,26 @@
 from __future__ import annotations
 
-from datetime import datetime
+from asyncio import create_task, gather, Semaphore, shield
+from collections import defaultdict, deque
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from functools import partial
 from logging import getLogger
+from re import compile as re_compile
+from threading import RLock
+from weakref import WeakValueDictionary
 
 from pydantic import validate_call
 
-from .api_async import APIAsync
-from .api_sync import API
-from .models import _RaiseIfError
-from ._properties import CompleteProperty, DueDateProperty, NameProperty, NotesProperty, StartDateProperty, TagsProperty
+from .filter import _Combine, _Operands, Always, And, CanEvaluate, CanonicalText, ConditionABC, Evaluate, FilterParseError, Never, Normalize, Or, ParseFilter
+from .models import _RaiseIfError, AggregateError, BaseError, Transaction
+from .profiling import _Profiled
+from .ratelimit import RateLimiter
+from .timeline import TimelineKey, TimelineProvider
+from ._properties import _WRITE_BEHIND, CompleteProperty, DueDateProperty, NameProperty, NotesProperty, StartDateProperty, TagsProperty
 
 _log = getLogger(__name__)
 
@@ -29,25 +41,55 @@ class Task:
 		self.notes = NotesProperty(self)
 		self.createTime: datetime | None = None
 		self.modifiedTime: datetime | None = None
+		self.externalId: str | None = None
 
 	def __repr__(self):
 		return f'Task({self.name.value})'
 
+	@property
+	def ids(self) -> tuple[str, str, str]:
+		"""The list, task series and task ids which identify the task to the API"""
+		return self._listId, self._taskSeriesId, self._taskId
+
+	def _Load(self, listId, taskSeries):
+		"""Load the values from a task series model, e.g. from the response to a write"""
+		task0 = next((task for task in taskSeries.task if task.id == self._taskId), taskSeries.task[0])
+		if listId != self._listId:
+			# moved to another list, so the client's identity map needs the new ids instead of the old ones
+			with self._client._lock:
+				if self._client._tasks.get(self.ids) is self:
+					del self._client._tasks[self.ids]
+				self._listId = listId
+				self._client._tasks[self.ids] = self
+		self.name._LoadValue(taskSeries.name)
+		self.tags._LoadValue(set(taskSeries.tags.tag) if hasattr(taskSeries.tags, 'tag') else set(taskSeries.tags))
+		self.startDate._LoadValue(_LoadDate(task0.start, task0.has_start_time))
+		self.dueDate._LoadValue(_LoadDate(task0.due, task0.has_due_time))
+		self.complete._LoadValue(task0.completed is not None)
+		self.notes._LoadValue([] if isinstance(taskSeries.notes, list) else taskSeries.notes.note)
+		self.createTime = taskSeries.created
+		self.modifiedTime = taskSeries.modified
+		self.externalId = taskSeries.external_id
+
 	@validate_call
 	def Delete(self):
 		_log.info(f'{self}.Delete')
-		_RaiseIfError(self._client.api.TasksDelete(timeline=self._client.timeline,
+		transaction = _RaiseIfError(self._client.api.TasksDelete(timeline=self._client._Timeline(),
 								list_id=self._listId,
 								taskseries_id=self._taskSeriesId,
-								task_id=self._taskId))
+								task_id=self._taskId)).transaction
+		self._client.transactions.Record(self._client.timeline, transaction, self.ids)
+		return transaction
 
 	@validate_call
 	async def DeleteAsync(self):
 		_log.info(f'{self}.DeleteAsync')
-		_RaiseIfError(await self._client.apiAsync.TasksDelete(timeline=self._client.timeline,
+		transaction = _RaiseIfError(await self._client.apiAsync.TasksDelete(timeline=await self._client._TimelineAsync(),
 								list_id=self._listId,
 								taskseries_id=self._taskSeriesId,
-								task_id=self._taskId))
+								task_id=self._taskId)).transaction
+		self._client.transactions.Record(self._client.timeline, transaction, self.ids)
+		return transaction
 
 # Serialize python datetime object to string for use by filters
 def FilterDate(date_):
@@ -61,21 +103,18 @@ def _LoadDate(rtmDate, hasTime):
 	return rtmDate.date()
 
 def _CreateFromTaskSeries(client, listId, taskSeries):
-	_log.info(f'{taskSeries=}')
-	task0 = taskSeries.task[0]
-	result = Task(client, listId, taskSeries.id, task0.id)
-
-	result.name._LoadValue(taskSeries.name)
-	result.tags._LoadValue(set(taskSeries.tags.tag) if hasattr(taskSeries.tags, 'tag') else set(taskSeries.tags))
-	result.startDate._LoadValue(_LoadDate(task0.start, task0.has_start_time))
-	result.dueDate._LoadValue(_LoadDate(task0.due, task0.has_due_time))
-	result.complete._LoadValue(task0.completed is not None)
-	result.notes._LoadValue([] if isinstance(taskSeries.notes, list) else taskSeries.notes.note)
-	result.createTime = taskSeries.created
-	result.modifiedTime = taskSeries.modified
-
+	"""Returns the client's existing Task object for the task if there is one, updated from taskSeries"""
+	_log.debug('taskSeries=%r', taskSeries)
+	ids = (listId, taskSeries.id, taskSeries.task[0].id)
+	with client._lock:
+		result = client._tasks.get(ids)
+		if result is None:
+			result = Task(client, *ids)
+			client._tasks[ids] = result
+		result._Load(listId, taskSeries)
 	return result
 
+@_Profiled('tasks')
 def _CreateListOfTasks(client, listResponse):
 	if listResponse.tasks.list is None:
 		return []
@@ -86,34 +125,427 @@ def _CreateListOfTasks(client, listResponse):
 		tasks.extend([_CreateFromTaskSeries(client, listId=list_.id, taskSeries=ts) for ts in list_.taskseries])
 	return tasks
 
-def CreateClient(clientId: str, clientSecret: str, token: str) -> _Client:
-	"""Create RTM client object synchronously"""
-	client = _Client(clientId, clientSecret, token)
-	client._CreateTimeline()
-	return client
+def _FilterText(filter_):
+	return filter_ if isinstance(filter_, str) else filter_.Text()
+
+def _ParseCondition(filter_):
+	"""The normalized condition, or None for filter text that ParseFilter doesn't understand but the server might"""
+	if not isinstance(filter_, str):
+		return Normalize(filter_)
+	try:
+		return Normalize(ParseFilter(filter_))
+	except FilterParseError as e:
+		_log.info(f'Fetching {filter_!r} with its own query: {e}')
+		return None
+
+def _PlanGetMany(filters):
+	"""Work out a single covering query for the filters
+	Returns the covering query (None if it isn't worth it) and, per filter, the condition that selects its tasks from the covering query's results
+	None means the filter needs its own query and Never() means it can't match anything"""
+	conditions = [_ParseCondition(filter_) for filter_ in filters]
+	candidates = [i for i, condition in enumerate(conditions) if condition is not None and condition != Never()]
+	conjuncts = {i: frozenset(_Operands(conditions[i], And)) for i in candidates}
+	# conditions shared by every filter (e.g. a list: or status: prefix) go to the server, the rest is evaluated locally
+	common = frozenset.intersection(*conjuncts.values()) if len(conjuncts) != 0 else frozenset()
+	residuals = [Never() if condition == Never() else None for condition in conditions]
+	for i in candidates:
+		remainder = conjuncts[i] - common
+		residual = Normalize(_Combine(And, list(remainder))) if len(remainder) != 0 else Always()
+		if CanEvaluate(residual):
+			residuals[i] = residual
+	local = [i for i in candidates if residuals[i] is not None]
+	if len(local) < 2: # noqa: PLR2004
+		return None, [Never() if residual == Never() else None for residual in residuals]
+	if len(common) != 0:
+		return Normalize(_Combine(And, list(common))), residuals
+	return Normalize(_Combine(Or, [conditions[i] for i in local])), residuals
+
+def _Partition(tasks, residuals):
+	"""Select the tasks for each filter from the covering query's results
+	Filters which can't be decided for every task are left as None so that they get their own query"""
+	results = []
+	for residual in residuals:
+		if residual is None:
+			results.append(None)
+			continue
+		matches = [Evaluate(residual, task) for task in tasks]
+		results.append(None if None in matches else [task for task, match in zip(tasks, matches, strict=True) if match])
+	return results
+
+# a word starting with one of these characters is a Smart Add token
+_SMART_ADD_TOKEN = re_compile(r'(^|\s)[#^~!*=@]')
+_SMART_ADD_TAG = re_compile(r'[^\s,#^~!*=@]+')
+
+def _IsDateOnly(value):
+	return isinstance(value, date) and not isinstance(value, datetime)
+
+def _SmartAddFields(name, tags, startDate, dueDate, listNames=frozenset()):
+	"""The fields which can be sent in Smart Add syntax as part of the name
+	Times are left out because Smart Add interprets them in the account's timezone
+	#name means the list with that name if there is one, so tags which match one of the (lowercase) listNames are left out"""
+	if _SMART_ADD_TOKEN.search(name) is not None:
+		return set()
+	fields = set()
+	if tags and all(_SMART_ADD_TAG.fullmatch(tag) is not None and tag.lower() not in listNames for tag in tags):
+		fields.add('tags')
+	if _IsDateOnly(startDate):
+		fields.add('startDate')
+	if _IsDateOnly(dueDate):
+		fields.add('dueDate')
+	return fields
+
+def _AddArguments(name, tags, startDate, dueDate, externalId, *, listNames):
+	"""Arguments for TasksAdd, with the fields that can be sent that way in Smart Add syntax"""
+	fields = _SmartAddFields(name, tags, startDate, dueDate, listNames)
+	if len(fields) == 0:
+		return {'name': name, 'external_id': externalId}
+	parts = [name]
+	if 'tags' in fields:
+		parts.extend(f'#{tag}' for tag in sorted(tags))
+	if 'startDate' in fields:
+		parts.append(f'~{startDate.isoformat()}')
+	if 'dueDate' in fields:
+		parts.append(f'^{dueDate.isoformat()}')
+	return {'name': ' '.join(parts), 'parse': True, 'external_id': externalId}
+
+def _TagBecameList(fields, task, tags):
+	"""Whether a tag sent in Smart Add syntax was taken as a list, i.e. a list with that name was created since the list names were read"""
+	return 'tags' in fields and not {tag.lower() for tag in tags} <= {tag.lower() for tag in task.tags.value}
+
+def _AvoidTags(tags):
+	"""listNames which stop all the tags from being sent in Smart Add syntax"""
+	return frozenset(tag.lower() for tag in tags)
+
+def _ListNames(listsResponse):
+	return frozenset(list_.name.lower() for list_ in _RaiseIfError(listsResponse).lists.list)
+
+def _Mismatches(task, name, tags, startDate, dueDate):
+	"""The properties of a newly added task which don't have the requested values, with the values they should have"""
+	requested = [(task.name, name), (task.startDate, startDate), (task.dueDate, dueDate)]
+	if tags is not None:
+		requested.append((task.tags, set(tags)))
+	return [(property_, value) for property_, value in requested if property_.value != value]
+
+@dataclass(frozen=True)
+class TransactionRecord:
+	"""An undoable write. Transactions can only be undone on the timeline they were made in"""
+	timeline: str
+	transaction: Transaction
+	# list, task series and task ids of the task that was written
+	ids: tuple[str, str, str]
+
+async def _RunConcurrently(runs, concurrency, errorType):
+	"""Await each of runs, coroutine functions which return None or an (item, exception) failure, with up to concurrency in flight (all of them if None)
+	A failure doesn't stop the others. They're all raised together at the end as errorType, an AggregateError"""
+	if concurrency is not None and concurrency < 1:
+		raise ValueError(f'concurrency must be at least 1, not {concurrency}')
+	runs = list(runs)
+	semaphore = Semaphore(max(len(runs), 1) if concurrency is None else concurrency)
+
+	async def _Run(run):
+		async with semaphore:
+			return await run()
+
+	errors = [error for error in await gather(*[_Run(run) for run in runs]) if error is not None]
+	if len(errors) != 0:
+		raise errorType(errors)
+
+class UndoError(AggregateError):
+	"""Some transactions failed to undo. errors is a list of (TransactionRecord, exception)"""
+	failed = 'transaction(s) failed to undo'
+
+class TransactionLog:
+	"""The client's undoable writes in the order they were made, up to maxSize of the most recent ones"""
+
+	def __init__(self, maxSize: int | None = 10000):
+		self._records = deque(maxlen=maxSize)
+		self._batches = []
+		self._lock = RLock()
+
+	def __repr__(self):
+		return f'TransactionLog({len(self._records)})'
+
+	def __len__(self):
+		return len(self._records)
+
+	def __iter__(self):
+		with self._lock:
+			return iter(list(self._records))
+
+	def Record(self, timeline, transaction, ids):
+		if transaction is None or not transaction.undoable:
+			return
+		record = TransactionRecord(timeline, transaction, ids)
+		with self._lock:
+			self._records.append(record)
+			for batch in self._batches:
+				batch.append(record)
+
+	@contextmanager
+	def Batch(self):
+		"""Collects the records of all the client's writes made inside the with block, e.g. to undo a failed Mirror"""
+		batch = []
+		with self._lock:
+			self._batches.append(batch)
+		try:
+			yield batch
+		finally:
+			with self._lock:
+				self._batches.remove(batch)
+
+	def Clear(self):
+		with self._lock:
+			self._records.clear()
+
+def _UndoChains(records):
+	"""The records for each task, most recent first, since the transactions on one task have to be undone in reverse order"""
+	chains = defaultdict(list)
+	for record in reversed(list(records)):
+		chains[record.ids].append(record)
+	return list(chains.values())
+
+class CommitError(AggregateError):
+	"""Some tasks' buffered writes failed. errors is a list of (Task, exception)"""
+	failed = 'task(s) failed to commit'
+
+@dataclass
+class _PendingWrites:
+	task: Task
+	# property class to (property, value), in the order of the last change to each property
+	properties: dict = field(default_factory=dict)
+	# (NotesProperty, title, text) in the order they were added
+	notes: list = field(default_factory=list)
+
+	def Changes(self):
+		"""The buffered property values which are different from the task's current ones"""
+		return [(property_, value) for property_, value in self.properties.values() if property_.value != value]
+
+	def Send(self):
+		for property_, value in self.Changes():
+			property_._Send(value)
+		for notes, title, text in self.notes:
+			notes._Send(title, text)
+
+	async def SendAsync(self):
+		for property_, value in self.Changes():
+			await property_._SendAsync(value)
+		for notes, title, text in self.notes:
+			await notes._SendAsync(title, text)
+
+class WriteBehindBuffer:
+	"""Property changes and notes buffered by _Client.WriteBehind, per task
+	Only the final value of each property is sent, and not at all if the task already has that value"""
 
-async def CreateClientAsync(clientId: str, clientSecret: str, token: str) -> _Client:
-	"""Create RTM client object asynchronously"""
-	client = _Client(clientId, clientSecret, token)
-	await client._CreateTimelineAsync()
-	return client
+	def __init__(self, client):
+		self.client = client
+		self._pending = {}
+
+	def __repr__(self):
+		return f'WriteBehindBuffer({self.apiCalls})'
+
+	def _Pending(self, task):
+		if task.ids not in self._pending:
+			self._pending[task.ids] = _PendingWrites(task)
+		return self._pending[task.ids]
+
+	def Set(self, property_, value):
+		properties = self._Pending(property_._task).properties
+		properties.pop(property_.__class__, None)
+		properties[property_.__class__] = (property_, value)
+
+	def AddNote(self, notes, title, text):
+		self._Pending(notes._task).notes.append((notes, title, text))
+
+	@property
+	def apiCalls(self) -> int:
+		"""Number of API calls that committing will make"""
+		return sum(len(writes.Changes()) + len(writes.notes) for writes in self._pending.values())
+
+	def Commit(self):
+		"""Each task's writes are sent in order. The tasks that failed are raised as a CommitError once the rest have been sent"""
+		pending, self._pending = self._pending, {}
+		errors = []
+		for writes in pending.values():
+			try:
+				writes.Send()
+			except BaseError as e: # noqa: PERF203 - one task failing mustn't stop the others
+				_log.warning(f'Failed to commit {writes.task}: {e!r}')
+				errors.append((writes.task, e))
+		if len(errors) != 0:
+			raise CommitError(errors)
+
+	async def CommitAsync(self, concurrency: int | None = None):
+		"""Up to concurrency tasks' writes are sent in parallel (all of them if None). Each task's writes are still sent in order
+		The tasks that failed are raised as a CommitError once the rest have been sent"""
+		pending, self._pending = self._pending, {}
+
+		async def _Send(writes):
+			try:
+				await writes.SendAsync()
+			except BaseError as e:
+				_log.warning(f'Failed to commit {writes.task}: {e!r}')
+				return writes.task, e
+			return None
+
+		await _RunConcurrently([partial(_Send, writes) for writes in pending.values()], concurrency, CommitError)
+
+def CreateClient(clientId: str, clientSecret: str, token: str, rateLimiter: RateLimiter | None = None, timelineProvider: TimelineProvider | None = None) -> _Client:
+	"""Create RTM client object synchronously
+	The timeline is created by the first write, so a client that only reads never makes that call
+	With a timelineProvider, a timeline from it is reused if there's one that hasn't expired"""
+	return _Client(clientId, clientSecret, token, rateLimiter, timelineProvider)
+
+async def CreateClientAsync(clientId: str, clientSecret: str, token: str, rateLimiter: RateLimiter | None = None, timelineProvider: TimelineProvider | None = None) -> _Client:
+	"""Create RTM client object asynchronously
+	The timeline is created by the first write, so a client that only reads never makes that call
+	With a timelineProvider, a timeline from it is reused if there's one that hasn't expired"""
+	return _Client(clientId, clientSecret, token, rateLimiter, timelineProvider)
+
+def CreateSyncOnlyClient(clientId: str, clientSecret: str, token: str, rateLimiter: RateLimiter | None = None, timelineProvider: TimelineProvider | None = None) -> _Client:
+	"""Client which never imports or creates the async API, e.g. for scripts. Its async functions raise BaseError"""
+	return _Client(clientId, clientSecret, token, rateLimiter, timelineProvider, async_=False)
+
+async def CreateAsyncOnlyClient(clientId: str, clientSecret: str, token: str, rateLimiter: RateLimiter | None = None, timelineProvider: TimelineProvider | None = None) -> _Client:
+	"""Client which never imports or creates the sync API, e.g. for asyncio services. Its sync functions raise BaseError"""
+	return _Client(clientId, clientSecret, token, rateLimiter, timelineProvider, sync=False)
 
 class _Client:
-	"""Wraps the timeline and adds convenience functions to add and query tasks"""
+	"""Wraps the timeline and adds convenience functions to add and query tasks
+	The sync functions can be called from multiple threads. The rateLimiter is shared by the sync and async APIs"""
 
-	def __init__(self, clientId: str, clientSecret: str, token: str):
-		self.api = API(clientId, clientSecret, token)
-		self.apiAsync = APIAsync(clientId, clientSecret, token)
+	def __init__(self, clientId: str, clientSecret: str, token: str, rateLimiter: RateLimiter | None = None, timelineProvider: TimelineProvider | None = None, *, sync: bool = True, async_: bool = True):
+		self._credentials = (clientId, clientSecret, token)
+		self._rateLimiter = rateLimiter
+		self._sync = sync
+		self._async = async_
+		self._api = None
+		self._apiAsync = None
 		self.timeline = None
+		self._timelineProvider = timelineProvider
+		self._timelineKey = TimelineKey(clientId, token)
+		self.transactions = TransactionLog()
+		# identity map so that there's one Task object per task for as long as something refers to it
+		self._tasks = WeakValueDictionary()
+		self._lock = RLock()
+		self._timelineCreation = None
+		self._hooks = []
+		# lowercase names of the lists, read when they're first needed for Smart Add
+		self._listNames = None
+		self._listNamesRead = None
 
 	def __repr__(self):
 		return '_Client()'
 
+	def AddHook(self, hook):
+		"""Add the hook to the sync and async APIs, including ones that haven't been created yet"""
+		self._hooks.append(hook)
+		for api in (self._api, self._apiAsync):
+			if api is not None:
+				api.AddHook(hook)
+
+	@property
+	def api(self):
+		"""The API, which is only imported and created when it's first used"""
+		if self._api is None:
+			if not self._sync:
+				raise BaseError('This client was created without the sync API - use the async functions')
+			from .api_sync import API # noqa: PLC0415 - so that async-only clients don't import it
+			with self._lock:
+				if self._api is None:
+					api = API(*self._credentials, self._rateLimiter)
+					for hook in self._hooks:
+						api.AddHook(hook)
+					self._api = api
+		return self._api
+
+	@api.setter
+	def api(self, value):
+		self._api = value
+
+	@property
+	def apiAsync(self):
+		"""The APIAsync, which is only imported and created when it's first used"""
+		if self._apiAsync is None:
+			if not self._async:
+				raise BaseError('This client was created without the async API - use the sync functions')
+			from .api_async import APIAsync # noqa: PLC0415 - so that sync-only clients don't import it
+			self._apiAsync = APIAsync(*self._credentials, self._rateLimiter)
+			for hook in self._hooks:
+				self._apiAsync.AddHook(hook)
+		return self._apiAsync
+
+	@apiAsync.setter
+	def apiAsync(self, value):
+		self._apiAsync = value
+
+	def _ReuseTimeline(self):
+		"""Returns whether there was a timeline to reuse"""
+		if self._timelineProvider is not None:
+			self.timeline = self._timelineProvider.Load(self._timelineKey)
+		return self.timeline is not None
+
+	def _SaveTimeline(self):
+		if self._timelineProvider is not None:
+			self._timelineProvider.Save(self._timelineKey, self.timeline)
+
 	def _CreateTimeline(self):
-		self.timeline = _RaiseIfError(self.api.TimelinesCreate().timeline)
+		if not self._ReuseTimeline():
+			self.timeline = _RaiseIfError(self.api.TimelinesCreate()).timeline
+			self._SaveTimeline()
 
 	async def _CreateTimelineAsync(self):
-		self.timeline = _RaiseIfError((await self.apiAsync.TimelinesCreate()).timeline)
+		if not self._ReuseTimeline():
+			self.timeline = _RaiseIfError(await self.apiAsync.TimelinesCreate()).timeline
+			self._SaveTimeline()
+
+	def _Timeline(self):
+		"""The timeline for writes, which is created by the first one"""
+		if self.timeline is None:
+			with self._lock:
+				if self.timeline is None:
+					self._CreateTimeline()
+		return self.timeline
+
+	async def _TimelineAsync(self):
+		"""Concurrent first writes share one creation"""
+		if self.timeline is None:
+			if self._timelineCreation is None:
+				self._timelineCreation = create_task(self._CreateTimelineAsync())
+			creation = self._timelineCreation
+			try:
+				await shield(creation)
+			finally:
+				if creation.done():
+					self._timelineCreation = None
+		return self.timeline
+
+	def _ListNamesForAdd(self):
+		"""The lowercase list names for Smart Add, which are read by the first add with tags"""
+		listNames = self._listNames
+		if listNames is None:
+			with self._lock:
+				listNames = self._listNames
+				if listNames is None:
+					listNames = self._listNames = _ListNames(self.api.ListsGetList())
+		return listNames
+
+	async def _ReadListNamesAsync(self):
+		self._listNames = _ListNames(await self.apiAsync.ListsGetList())
+		return self._listNames
+
+	async def _ListNamesForAddAsync(self):
+		"""Concurrent adds share one read"""
+		listNames = self._listNames
+		if listNames is None:
+			if self._listNamesRead is None:
+				self._listNamesRead = create_task(self._ReadListNamesAsync())
+			read = self._listNamesRead
+			try:
+				listNames = await shield(read)
+			finally:
+				if read.done():
+					self._listNamesRead = None
+		return listNames
 
 	@validate_call
 	def Get(self, filter_: str, lastSync: datetime | None = None) -> list[Task]:
@@ -121,11 +553,49 @@ class _Client:
 		listResponse = _RaiseIfError(self.api.TasksGetList(filter=filter_, last_sync=lastSync))
 		return _CreateListOfTasks(self, listResponse)
 
+	def GetMany(self, filters: list[str | ConditionABC], lastSync: datetime | None = None, maxWorkers: int | None = None) -> list[list[Task]]:
+		"""Equivalent to calling Get for each filter but shares a single query between the filters where possible
+		With maxWorkers, the filters which need their own query are fetched in parallel by that many threads
+		The results are in the same order as the filters"""
+		_log.info(f'GetMany: {filters}, {lastSync}, {maxWorkers}')
+		superset, residuals = _PlanGetMany(filters)
+		results = _Partition([] if superset is None else self.Get(CanonicalText(superset), lastSync), residuals)
+		remaining = [i for i, result in enumerate(results) if result is None]
+		if maxWorkers is None or len(remaining) < 2: # noqa: PLR2004
+			fetched = [self.Get(_FilterText(filters[i]), lastSync) for i in remaining]
+		else:
+			with ThreadPoolExecutor(max_workers=maxWorkers, thread_name_prefix='rtmilk') as executor:
+				fetched = list(executor.map(lambda i: self.Get(_FilterText(filters[i]), lastSync), remaining))
+		for i, tasks in zip(remaining, fetched, strict=True):
+			results[i] = tasks
+		return results
+
+	def _Add(self, name, tags, startDate, dueDate, externalId, *, retry=False):
+		"""TasksAdd, without fixing up the fields that didn't come back as requested
+		If a tag was taken as a list, the task is deleted and added again without the tags"""
+		listNames = _AvoidTags(tags) if retry else frozenset()
+		if tags and not retry:
+			listNames = self._ListNamesForAdd()
+		arguments = _AddArguments(name, tags, startDate, dueDate, externalId, listNames=listNames)
+		taskResponse = _RaiseIfError(self.api.TasksAdd(self._Timeline(), **arguments))
+		task = _CreateFromTaskSeries(self, listId=taskResponse.list.id, taskSeries=taskResponse.list.taskseries[0])
+		self.transactions.Record(self.timeline, taskResponse.transaction, task.ids)
+		if _TagBecameList(_SmartAddFields(name, tags, startDate, dueDate, listNames), task, tags):
+			_log.info(f'A tag of {task} was taken as a list, adding it again')
+			self._listNames = None
+			task.Delete()
+			return self._Add(name, tags, startDate, dueDate, externalId, retry=True)
+		return task
+
 	@validate_call
-	def Add(self, name: str) -> Task:
-		_log.info(f'Add: {name}')
-		taskResponse = _RaiseIfError(self.api.TasksAdd(self.timeline, name)) # ty: ignore[invalid-argument-type]
-		return _CreateFromTaskSeries(self, listId=taskResponse.list.id, taskSeries=taskResponse.list.taskseries[0])
+	def Add(self, name: str, tags: set[str] | None = None, startDate: date | datetime | None = None, dueDate: date | datetime | None = None, externalId: str | None = None) -> Task:
+		"""Tags and dates are sent in Smart Add syntax in the same call where possible
+		Any which don't come back as requested are then set individually"""
+		_log.info(f'Add: {name}, {tags}, {startDate}, {dueDate}, {externalId}')
+		task = self._Add(name, tags, startDate, dueDate, externalId)
+		for property_, value in _Mismatches(task, name, tags, startDate, dueDate):
+			property_._Send(value)
+		return task
 
 	@validate_call
 	async def GetAsync(self, filter_: str, lastSync: datetime | None = None) -> list[Task]:
@@ -133,8 +603,84 @@ class _Client:
 		listResponse = _RaiseIfError(await self.apiAsync.TasksGetList(filter=filter_, last_sync=lastSync))
 		return _CreateListOfTasks(self, listResponse)
 
+	async def GetManyAsync(self, filters: list[str | ConditionABC], lastSync: datetime | None = None) -> list[list[Task]]:
+		"""Equivalent to calling GetAsync for each filter but shares a single query between the filters where possible
+		Filters which need their own query are fetched concurrently. The results are in the same order as the filters"""
+		_log.info(f'GetManyAsync: {filters}, {lastSync}')
+		superset, residuals = _PlanGetMany(filters)
+		results = _Partition([] if superset is None else await self.GetAsync(CanonicalText(superset), lastSync), residuals)
+		remaining = [i for i, result in enumerate(results) if result is None]
+		for i, tasks in zip(remaining, await gather(*[self.GetAsync(_FilterText(filters[i]), lastSync) for i in remaining]), strict=True):
+			results[i] = tasks
+		return results
+
+	async def _AddAsync(self, name, tags, startDate, dueDate, externalId, *, retry=False):
+		listNames = _AvoidTags(tags) if retry else frozenset()
+		if tags and not retry:
+			listNames = await self._ListNamesForAddAsync()
+		arguments = _AddArguments(name, tags, startDate, dueDate, externalId, listNames=listNames)
+		taskResponse = _RaiseIfError(await self.apiAsync.TasksAdd(await self._TimelineAsync(), **arguments))
+		task = _CreateFromTaskSeries(self, listId=taskResponse.list.id, taskSeries=taskResponse.list.taskseries[0])
+		self.transactions.Record(self.timeline, taskResponse.transaction, task.ids)
+		if _TagBecameList(_SmartAddFields(name, tags, startDate, dueDate, listNames), task, tags):
+			_log.info(f'A tag of {task} was taken as a list, adding it again')
+			self._listNames = None
+			await task.DeleteAsync()
+			return await self._AddAsync(name, tags, startDate, dueDate, externalId, retry=True)
+		return task
+
 	@validate_call
-	async def AddAsync(self, name: str) -> Task:
-		_log.info(f'AddAsync: {name}')
-		taskResponse = _RaiseIfError(await self.apiAsync.TasksAdd(self.timeline, name)) # ty: ignore[invalid-argument-type]
-		return _CreateFromTaskSeries(self, listId=taskResponse.list.id, taskSeries=taskResponse.list.taskseries[0])
+	async def AddAsync(self, name: str, tags: set[str] | None = None, startDate: date | datetime | None = None, dueDate: date | datetime | None = None, externalId: str | None = None) -> Task:
+		"""Tags and dates are sent in Smart Add syntax in the same call where possible
+		Any which don't come back as requested are then set individually"""
+		_log.info(f'AddAsync: {name}, {tags}, {startDate}, {dueDate}, {externalId}')
+		task = await self._AddAsync(name, tags, startDate, dueDate, externalId)
+		for property_, value in _Mismatches(task, name, tags, startDate, dueDate):
+			await property_._SendAsync(value)
+		return task
+
+	@contextmanager
+	def WriteBehind(self):
+		"""Buffers the property changes and notes made to this client's tasks inside the with block and commits them at the end
+		Only the final value of each property is sent. Adds and deletes aren't buffered. If the block raises, the buffered writes are dropped"""
+		buffer = WriteBehindBuffer(self)
+		token = _WRITE_BEHIND.set(buffer)
+		try:
+			yield buffer
+		finally:
+			_WRITE_BEHIND.reset(token)
+		buffer.Commit()
+
+	@asynccontextmanager
+	async def WriteBehindAsync(self, concurrency: int | None = None):
+		"""WriteBehind which commits with WriteBehindBuffer.CommitAsync"""
+		buffer = WriteBehindBuffer(self)
+		token = _WRITE_BEHIND.set(buffer)
+		try:
+			yield buffer
+		finally:
+			_WRITE_BEHIND.reset(token)
+		await buffer.CommitAsync(concurrency)
+
+	def Undo(self, records: Iterable[TransactionRecord]):
+		"""Undo the transactions, e.g. from TransactionLog.Batch, most recent first"""
+		_log.info(f'Undo: {records}')
+		for record in reversed(list(records)):
+			_RaiseIfError(self.api.TransactionsUndo(timeline=record.timeline, transaction_id=record.transaction.id))
+
+	async def UndoAsync(self, records: Iterable[TransactionRecord], concurrency: int | None = None):
+		"""Undo the transactions with up to concurrency tasks being undone in parallel (all of them if None)
+		Each task's transactions are undone most recent first. A task that fails stops at that transaction and the failures are raised as an UndoError"""
+		_log.info(f'UndoAsync: {records}')
+
+		async def _UndoChain(chain):
+			record = None
+			try:
+				for record in chain:
+					_RaiseIfError(await self.apiAsync.TransactionsUndo(timeline=record.timeline, transaction_id=record.transaction.id))
+			except BaseError as e:
+				_log.warning(f'Failed to undo {record}: {e!r}')
+				return record, e
+			return None
+
+		await _RunConcurrently([partial(_UndoChain, chain) for chain in _UndoChains(records)], concurrency, UndoError)
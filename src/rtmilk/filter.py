@@ -3,8 +3,11 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from datetime import date, datetime
+from functools import lru_cache
+from hashlib import sha256
+from re import compile as re_compile, VERBOSE
 
-from .models import PriorityEnum
+from .models import BaseError, PriorityEnum
 
 # https://www.rememberthemilk.com/help/?ctx=basics.search.advanced
 
@@ -19,25 +22,40 @@ def _DateText(value):
 	return f'"{value}"'
 
 class ConditionABC(ABC):
+	"""Conditions are frozen dataclasses so they can be compared and used as dict keys"""
 	@abstractmethod
 	def Text(self) -> str:
 		pass
 
-@dataclass
+@dataclass(frozen=True)
+class Always(ConditionABC):
+	"""Matches every task - the empty filter"""
+
+	def Text(self):
+		return ''
+
+@dataclass(frozen=True)
+class Never(ConditionABC):
+	"""Matches no tasks. RTM has no literal for this so it's spelt as a contradiction"""
+
+	def Text(self):
+		return '(status:completed) AND (status:incomplete)'
+
+@dataclass(frozen=True)
 class ListIs(ConditionABC):
 	name: str
 
 	def Text(self):
 		return f'list:"{self.name}"'
 
-@dataclass
+@dataclass(frozen=True)
 class ListContains(ConditionABC):
 	substr: str
 
 	def Text(self):
 		return f'listContains:"{self.substr}"'
 
-@dataclass
+@dataclass(frozen=True)
 class Priority(ConditionABC):
 	value: PriorityEnum
 
@@ -50,354 +68,744 @@ class Priority(ConditionABC):
 		}[self.value]
 		return f'priority:{text}'
 
-@dataclass
+@dataclass(frozen=True)
 class Status(ConditionABC):
 	complete: bool
 
 	def Text(self):
 		return 'status:' + ('completed' if self.complete else 'incomplete')
 
-@dataclass
+@dataclass(frozen=True)
 class TagIs(ConditionABC):
 	name: str
 
 	def Text(self):
 		return f'tag:{self.name}'
 
-@dataclass
+@dataclass(frozen=True)
 class TagContains(ConditionABC):
 	substr: str
 
 	def Text(self):
 		return f'tagContains:{self.substr}'
 
-@dataclass
+@dataclass(frozen=True)
 class IsTagged(ConditionABC):
 	value: bool
 
 	def Text(self):
 		return f'isTagged:{_BoolText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class LocationIs(ConditionABC):
 	name: str
 
 	def Text(self):
 		return f'location:{self.name}'
 
-@dataclass
+@dataclass(frozen=True)
 class LocationContains(ConditionABC):
 	location: str
 
 	def Text(self):
 		return f'locationContains:"{self.location}"'
 
-@dataclass
+@dataclass(frozen=True)
 class LocatedWithin(ConditionABC):
 	location: str
 
 	def Text(self):
 		return f'locatedWithin:"{self.location}"'
 
-@dataclass
+@dataclass(frozen=True)
 class IsLocated(ConditionABC):
 	value: bool
 
 	def Text(self):
 		return f'isLocated:{_BoolText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class IsRepeating(ConditionABC):
 	value: bool
 
 	def Text(self):
 		return f'isRepeating:{_BoolText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class NameIs(ConditionABC):
 	name: str
 
 	def Text(self):
 		return f'name:"{self.name}"'
 
-@dataclass
+@dataclass(frozen=True)
 class NoteContains(ConditionABC):
 	substr: str
 
 	def Text(self):
 		return f'noteContains:"{self.substr}"'
 
-@dataclass
+@dataclass(frozen=True)
 class HasNotes(ConditionABC):
 	value: bool
 
 	def Text(self):
 		return f'hasNotes:"{_BoolText(self.value)}"'
 
-@dataclass
+@dataclass(frozen=True)
 class FilenameContains(ConditionABC):
 	substr: str
 
 	def Text(self):
 		return f'filename:"{self.substr}"'
 
-@dataclass
+@dataclass(frozen=True)
 class HasAttachments(ConditionABC):
 	value: bool
 
 	def Text(self):
 		return f'hasAttachments:{_BoolText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class Due(ConditionABC):
 	value: str | date
 
 	def Text(self):
 		return f'due:{_DateText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class DueBefore(ConditionABC):
 	value: str | date
 
 	def Text(self):
 		return f'dueBefore:{_DateText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class DueAfter(ConditionABC):
 	value: str | date
 
 	def Text(self):
 		return f'dueAfter:{_DateText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class DueWithin(ConditionABC):
 	value: str
 
 	def Text(self):
 		return f'dueWithin:{self.value}'
 
-@dataclass
+@dataclass(frozen=True)
 class Start(ConditionABC):
 	value: str | date
 
 	def Text(self):
 		return f'start:{_DateText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class StartBefore(ConditionABC):
 	value: str | date
 
 	def Text(self):
 		return f'startBefore:{_DateText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class StartAfter(ConditionABC):
 	value: str | date
 
 	def Text(self):
 		return f'startAfter:{_DateText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class StartWithin(ConditionABC):
 	value: str
 
 	def Text(self):
 		return f'startWithin:{self.value}'
 
-@dataclass
+@dataclass(frozen=True)
 class TimeEstimate(ConditionABC):
 	value: str
 
 	def Text(self):
 		return f'timeEstimate: "{self.value}"'
 
-@dataclass
+@dataclass(frozen=True)
 class HasTimeEstimate(ConditionABC):
 	value: bool
 
 	def Text(self):
 		return f'hasTimeEstimate:{_BoolText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class HasURL(ConditionABC):
 	value: bool
 
 	def Text(self):
 		return f'hasURL:{_BoolText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class HasSubtasks(ConditionABC):
 	value: bool
 
 	def Text(self):
 		return f'hasSubtasks:{_BoolText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class IsSubtask(ConditionABC):
 	value: bool
 
 	def Text(self):
 		return f'isSubtask:{_BoolText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class Completed(ConditionABC):
 	value: str | date
 
 	def Text(self):
 		return f'completed:{_DateText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class CompletedBefore(ConditionABC):
 	value: str | date
 
 	def Text(self):
 		return f'completedBefore:{_DateText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class CompletedAfter(ConditionABC):
 	value: str | date
 
 	def Text(self):
 		return f'completedAfter:{_DateText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class CompletedWithin(ConditionABC):
 	value: str
 
 	def Text(self):
 		return f'completedWithin:{self.value}'
 
-@dataclass
+@dataclass(frozen=True)
 class Added(ConditionABC):
 	value: str | date
 
 	def Text(self):
 		return f'added:{_DateText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class AddedBefore(ConditionABC):
 	value: str | date
 
 	def Text(self):
 		return f'addedBefore:{_DateText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class AddedAfter(ConditionABC):
 	value: str | date
 
 	def Text(self):
 		return f'addedAfter:{_DateText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class AddedWithin(ConditionABC):
 	value: str
 
 	def Text(self):
 		return f'addedWithin:{self.value}'
 
-@dataclass
+@dataclass(frozen=True)
 class Updated(ConditionABC):
 	value: str | date
 
 	def Text(self):
 		return f'updated:{_DateText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class UpdatedBefore(ConditionABC):
 	value: str | date
 
 	def Text(self):
 		return f'updatedBefore:{_DateText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class UpdatedAfter(ConditionABC):
 	value: str | date
 
 	def Text(self):
 		return f'updatedAfter:{_DateText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class UpdatedWithin(ConditionABC):
 	value: str
 
 	def Text(self):
 		return f'updatedWithin:{self.value}'
 
-@dataclass
+@dataclass(frozen=True)
 class Postponed(ConditionABC):
 	value: str
 
 	def Text(self):
 		return f'postponed:"{self.value}"'
 
-@dataclass
+@dataclass(frozen=True)
 class IsShared(ConditionABC):
 	value: bool
 
 	def Text(self):
 		return f'isShared:{_BoolText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class SharedWith(ConditionABC):
 	value: str
 
 	def Text(self):
 		return f'sharedWith:{self.value}'
 
-@dataclass
+@dataclass(frozen=True)
 class GivenTo(ConditionABC):
 	value: str
 
 	def Text(self):
 		return f'givenTo:{self.value}'
 
-@dataclass
+@dataclass(frozen=True)
 class GivenBy(ConditionABC):
 	value: str
 
 	def Text(self):
 		return f'givenBy:{self.value}'
 
-@dataclass
+@dataclass(frozen=True)
 class IsGiven(ConditionABC):
 	value: bool
 
 	def Text(self):
 		return f'isGiven:{_BoolText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
 class Source(ConditionABC):
 	value: str
 
 	def Text(self):
 		return f'source:{self.value}'
 
-@dataclass
+@dataclass(frozen=True)
 class IncludeArchived(ConditionABC):
 	value: bool
 
 	def Text(self):
 		return f'includeArchived:{_BoolText(self.value)}'
 
-@dataclass
+@dataclass(frozen=True)
+class Keyword(ConditionABC):
+	"""A bare word or quoted phrase, as typed into the basic search box"""
+	value: str
+
+	def Text(self):
+		return f'"{self.value}"'
+
+@dataclass(frozen=True)
 class And(ConditionABC):
 	lhs: ConditionABC
 	rhs: ConditionABC
 
 	def Text(self):
-		return f'({self.lhs.Text()}) AND ({self.rhs.Text()})'
+		return _Text(_Fold(self))
 
-@dataclass
+@dataclass(frozen=True)
 class Or(ConditionABC):
 	lhs: ConditionABC
 	rhs: ConditionABC
 
 	def Text(self):
-		return f'({self.lhs.Text()}) OR ({self.rhs.Text()})'
+		return _Text(_Fold(self))
 
-@dataclass
+@dataclass(frozen=True)
 class Not(ConditionABC):
 	condition: ConditionABC
 
 	def Text(self):
-		return f'NOT ({self.condition.Text()})'
+		return _Text(_Fold(self))
+
+def _Fold(condition):
+	"""Replace the And/Or/Not whose result is decided by an Always or Never operand with that constant, and drop the ones that make no difference
+	Always has no text of its own, so it can't be an operand in the text"""
+	match condition:
+		case And() | Or():
+			identity, absorbing = (Always(), Never()) if isinstance(condition, And) else (Never(), Always())
+			operands = [_Fold(condition.lhs), _Fold(condition.rhs)]
+			if absorbing in operands:
+				return absorbing
+			operands = [operand for operand in operands if operand != identity]
+			return type(condition)(*operands) if len(operands) == 2 else next(iter(operands), identity) # noqa: PLR2004
+		case Not():
+			inner = _Fold(condition.condition)
+			return {Always(): Never(), Never(): Always()}.get(inner, Not(inner))
+		case _:
+			return condition
+
+def _Text(folded):
+	match folded:
+		case And():
+			return f'({_Text(folded.lhs)}) AND ({_Text(folded.rhs)})'
+		case Or():
+			return f'({_Text(folded.lhs)}) OR ({_Text(folded.rhs)})'
+		case Not():
+			return f'NOT ({_Text(folded.condition)})'
+		case _:
+			return folded.Text()
+
+class FilterParseError(BaseError):
+	"""Filter text isn't valid RTM search syntax"""
+
+def _ParseBool(value):
+	lowered = value.lower()
+	if lowered not in {'true', 'false'}:
+		raise FilterParseError(f'Expected true or false, got {value!r}')
+	return lowered == 'true'
+
+def _ParsePriority(value):
+	try:
+		return {
+			'none': PriorityEnum.NoPriority,
+			'n': PriorityEnum.NoPriority,
+			'1': PriorityEnum.Priority1,
+			'2': PriorityEnum.Priority2,
+			'3': PriorityEnum.Priority3,
+		}[value.lower()]
+	except KeyError:
+		raise FilterParseError(f'Unknown priority {value!r}') from None
+
+def _ParseStatus(value):
+	try:
+		return {'completed': True, 'complete': True, 'incomplete': False}[value.lower()]
+	except KeyError:
+		raise FilterParseError(f'Unknown status {value!r}') from None
+
+def _Identity(value):
+	return value
+
+# operator names are case-insensitive in RTM so the keys are lowercase
+# dates are left as strings because their interpretation depends on the account's settings
+_OPERATORS = {
+	'list': (ListIs, _Identity),
+	'listcontains': (ListContains, _Identity),
+	'priority': (Priority, _ParsePriority),
+	'status': (Status, _ParseStatus),
+	'tag': (TagIs, _Identity),
+	'tagcontains': (TagContains, _Identity),
+	'istagged': (IsTagged, _ParseBool),
+	'location': (LocationIs, _Identity),
+	'locationcontains': (LocationContains, _Identity),
+	'locatedwithin': (LocatedWithin, _Identity),
+	'islocated': (IsLocated, _ParseBool),
+	'isrepeating': (IsRepeating, _ParseBool),
+	'name': (NameIs, _Identity),
+	'notecontains': (NoteContains, _Identity),
+	'hasnotes': (HasNotes, _ParseBool),
+	'filename': (FilenameContains, _Identity),
+	'hasattachments': (HasAttachments, _ParseBool),
+	'due': (Due, _Identity),
+	'duebefore': (DueBefore, _Identity),
+	'dueafter': (DueAfter, _Identity),
+	'duewithin': (DueWithin, _Identity),
+	'start': (Start, _Identity),
+	'startbefore': (StartBefore, _Identity),
+	'startafter': (StartAfter, _Identity),
+	'startwithin': (StartWithin, _Identity),
+	'timeestimate': (TimeEstimate, _Identity),
+	'hastimeestimate': (HasTimeEstimate, _ParseBool),
+	'hasurl': (HasURL, _ParseBool),
+	'hassubtasks': (HasSubtasks, _ParseBool),
+	'issubtask': (IsSubtask, _ParseBool),
+	'completed': (Completed, _Identity),
+	'completedbefore': (CompletedBefore, _Identity),
+	'completedafter': (CompletedAfter, _Identity),
+	'completedwithin': (CompletedWithin, _Identity),
+	'added': (Added, _Identity),
+	'addedbefore': (AddedBefore, _Identity),
+	'addedafter': (AddedAfter, _Identity),
+	'addedwithin': (AddedWithin, _Identity),
+	'updated': (Updated, _Identity),
+	'updatedbefore': (UpdatedBefore, _Identity),
+	'updatedafter': (UpdatedAfter, _Identity),
+	'updatedwithin': (UpdatedWithin, _Identity),
+	'postponed': (Postponed, _Identity),
+	'isshared': (IsShared, _ParseBool),
+	'sharedwith': (SharedWith, _Identity),
+	'givento': (GivenTo, _Identity),
+	'givenby': (GivenBy, _Identity),
+	'isgiven': (IsGiven, _ParseBool),
+	'source': (Source, _Identity),
+	'includearchived': (IncludeArchived, _ParseBool),
+}
+
+_TOKEN = re_compile(r'''\s*(?:
+	(?P<open>\() |
+	(?P<close>\)) |
+	(?P<operator>[A-Za-z]+):\s*(?:"(?P<quotedValue>[^"]*)"|(?P<value>[^\s()"]+)) |
+	"(?P<quotedWord>[^"]*)" |
+	(?P<word>[^\s()"]+)
+	)''', VERBOSE)
+
+_KEYWORDS = {'and', 'or', 'not'}
+
+def _Tokenize(text):
+	"""Yields (kind, value) pairs, where kind is one of '(', ')', 'and', 'or', 'not', 'leaf'"""
+	position = 0
+	end = len(text.rstrip())
+	while position < end:
+		match = _TOKEN.match(text, position)
+		if match is None:
+			raise FilterParseError(f'Unexpected text at position {position}: {text[position:]!r}')
+		position = match.end()
+		if match['open'] is not None:
+			yield '(', None
+		elif match['close'] is not None:
+			yield ')', None
+		elif match['operator'] is not None:
+			yield 'leaf', _MakeLeaf(match['operator'], match['value'] if match['quotedValue'] is None else match['quotedValue'])
+		elif match['quotedWord'] is not None:
+			yield 'leaf', Keyword(match['quotedWord'])
+		elif match['word'].lower() in _KEYWORDS:
+			yield match['word'].lower(), None
+		else:
+			yield 'leaf', Keyword(match['word'])
+
+def _MakeLeaf(operator, value):
+	try:
+		class_, convert = _OPERATORS[operator.lower()]
+	except KeyError:
+		raise FilterParseError(f'Unknown operator {operator!r}') from None
+	return class_(convert(value))
+
+class _Parser:
+	"""Recursive descent over the token list. Precedence from high to low is NOT, AND, OR
+	Adjacent terms without an operator between them are ANDed, as on the website"""
+
+	def __init__(self, tokens):
+		self._tokens = tokens
+		self._index = 0
+
+	def _Peek(self):
+		return self._tokens[self._index][0] if self._index < len(self._tokens) else None
+
+	def _Next(self):
+		token = self._tokens[self._index]
+		self._index += 1
+		return token
+
+	def Parse(self):
+		result = self._Or()
+		if self._index != len(self._tokens):
+			raise FilterParseError(f'Unexpected {self._Peek()!r}')
+		return result
+
+	def _Or(self):
+		result = self._And()
+		while self._Peek() == 'or':
+			self._Next()
+			result = Or(result, self._And())
+		return result
+
+	def _And(self):
+		result = self._Not()
+		while self._Peek() in {'and', 'not', '(', 'leaf'}:
+			if self._Peek() == 'and':
+				self._Next()
+			result = And(result, self._Not())
+		return result
+
+	def _Not(self):
+		if self._Peek() == 'not':
+			self._Next()
+			return Not(self._Not())
+		return self._Primary()
+
+	def _Primary(self):
+		if self._Peek() is None:
+			raise FilterParseError('Unexpected end of filter')
+		kind, value = self._Next()
+		if kind == 'leaf':
+			return value
+		if kind == '(':
+			result = self._Or()
+			if self._Peek() != ')':
+				raise FilterParseError('Missing )')
+			self._Next()
+			return result
+		raise FilterParseError(f'Unexpected {kind!r}')
+
+@lru_cache(maxsize=1024)
+def ParseFilter(text: str) -> ConditionABC:
+	"""Parse RTM search syntax into a tree of conditions
+	The empty filter parses to Always()
+	Results are cached, which is safe because conditions are immutable"""
+	tokens = list(_Tokenize(text))
+	if len(tokens) == 0:
+		return Always()
+	return _Parser(tokens).Parse()
+
+def _Operands(condition, type_):
+	"""Flatten nested binary And/Or into a list of operands"""
+	if isinstance(condition, type_):
+		return _Operands(condition.lhs, type_) + _Operands(condition.rhs, type_)
+	return [condition]
+
+def _Combine(type_, operands):
+	result = operands[0]
+	for operand in operands[1:]:
+		result = type_(result, operand)
+	return result
+
+_BOOLEAN_CONDITIONS = (IsTagged, IsLocated, IsRepeating, HasNotes, HasAttachments, HasTimeEstimate, HasURL, HasSubtasks, IsSubtask, IsShared, IsGiven)
+
+def _Complement(condition):
+	"""The condition which matches exactly the tasks that the given one doesn't"""
+	if isinstance(condition, Not):
+		return condition.condition
+	if isinstance(condition, Status):
+		return Status(not condition.complete)
+	if isinstance(condition, _BOOLEAN_CONDITIONS):
+		return type(condition)(not condition.value)
+	return Not(condition)
+
+def _NormalizeNary(type_, condition):
+	# identity is the constant that can be dropped, absorbing is the one that decides the result
+	identity, absorbing = (Always(), Never()) if type_ is And else (Never(), Always())
+	operands = set()
+	for operand in _Operands(condition, type_):
+		normalized = Normalize(operand)
+		if normalized == absorbing:
+			return absorbing
+		if normalized != identity:
+			operands.update(_Operands(normalized, type_))
+	# x AND NOT x can never match, x OR NOT x always matches
+	if any(_Complement(operand) in operands for operand in operands):
+		return absorbing
+	if len(operands) == 0:
+		return identity
+	return _Combine(type_, sorted(operands, key=CanonicalText))
+
+@lru_cache(maxsize=1024)
+def Normalize(condition: ConditionABC) -> ConditionABC:
+	"""Rewrite a condition into a canonical form which matches the same tasks
+	And/Or are flattened, deduplicated, sorted and rebuilt left-nested
+	Double negation is removed, negated true/false conditions are flipped (NOT status:completed is status:incomplete)
+	Always/Never are folded away unless they're the whole result"""
+	match condition:
+		case Not():
+			inner = Normalize(condition.condition)
+			if inner == Always():
+				return Never()
+			if inner == Never():
+				return Always()
+			return _Complement(inner)
+		case And() | Or():
+			return _NormalizeNary(type(condition), condition)
+		case _:
+			return condition
+
+def _CanonicalText(normalized):
+	match normalized:
+		case And() | Or():
+			joiner = ' AND ' if isinstance(normalized, And) else ' OR '
+			return joiner.join(_Parenthesize(operand) for operand in _Operands(normalized, type(normalized)))
+		case Not():
+			return f'NOT {_Parenthesize(normalized.condition)}'
+		case _:
+			return normalized.Text()
+
+def _Parenthesize(condition):
+	if isinstance(condition, (And, Or)):
+		return f'({_CanonicalText(condition)})'
+	return _CanonicalText(condition)
+
+@lru_cache(maxsize=1024)
+def CanonicalText(condition: ConditionABC) -> str:
+	"""Filter text which is identical for semantically identical conditions, without redundant parentheses"""
+	return _CanonicalText(Normalize(condition))
+
+def CanonicalHash(condition: ConditionABC) -> str:
+	"""Hash of CanonicalText which is stable across processes, for use as a cache key"""
+	return sha256(CanonicalText(condition).encode()).hexdigest()
+
+def _LowerTags(task):
+	return {tag.lower() for tag in task.tags.value}
+
+def _NoteTexts(task):
+	for note in task.notes.value:
+		yield note.title.lower()
+		if note.body is not None:
+			yield note.body.lower()
+
+def _HasNoDate(getter):
+	"""A task without the date never matches. Any date the task has is loaded from UTC but RTM compares it in the account's timezone,
+	where it can be a different day, so tasks with a date are undecidable"""
+	def _Evaluate(_condition, task):
+		return False if getter(task) is None else None
+	return _Evaluate
+
+def _DueDate(task):
+	return task.dueDate.value
+
+def _StartDate(task):
+	return task.startDate.value
+
+# name and note searches are case-insensitive substring matches on the website
+_EVALUATORS = {
+	Always: lambda _condition, _task: True,
+	Never: lambda _condition, _task: False,
+	Status: lambda condition, task: task.complete.value == condition.complete,
+	TagIs: lambda condition, task: condition.name.lower() in _LowerTags(task),
+	TagContains: lambda condition, task: any(condition.substr.lower() in tag for tag in _LowerTags(task)),
+	IsTagged: lambda condition, task: (len(task.tags.value) != 0) == condition.value,
+	NameIs: lambda condition, task: condition.name.lower() in task.name.value.lower(),
+	NoteContains: lambda condition, task: any(condition.substr.lower() in text for text in _NoteTexts(task)),
+	HasNotes: lambda condition, task: (len(task.notes.value) != 0) == condition.value,
+	Due: _HasNoDate(_DueDate),
+	DueBefore: _HasNoDate(_DueDate),
+	DueAfter: _HasNoDate(_DueDate),
+	Start: _HasNoDate(_StartDate),
+	StartBefore: _HasNoDate(_StartDate),
+	StartAfter: _HasNoDate(_StartDate),
+}
+
+def CanEvaluate(condition: ConditionABC) -> bool:
+	"""Whether Evaluate can decide the condition for at least some tasks, without asking the server"""
+	match condition:
+		case And() | Or():
+			return CanEvaluate(condition.lhs) and CanEvaluate(condition.rhs)
+		case Not():
+			return CanEvaluate(condition.condition)
+		case Due() | DueBefore() | DueAfter() | Start() | StartBefore() | StartAfter():
+			# dates given as strings (today, 1 week of today...) depend on the account's settings
+			return isinstance(condition.value, date)
+		case _:
+			return type(condition) in _EVALUATORS
+
+def _EvaluateBinary(condition, task, decisive):
+	"""decisive is the operand result which settles the answer on its own: False for And, True for Or"""
+	lhs = Evaluate(condition.lhs, task)
+	if lhs is decisive:
+		return decisive
+	rhs = Evaluate(condition.rhs, task)
+	if rhs is decisive:
+		return decisive
+	return None if None in (lhs, rhs) else not decisive
+
+def Evaluate(condition: ConditionABC, task) -> bool | None:
+	"""Evaluate a condition against a loaded client Task
+	Returns None if the answer can't be known locally, in which case the server has to be asked"""
+	match condition:
+		case And():
+			return _EvaluateBinary(condition, task, False)
+		case Or():
+			return _EvaluateBinary(condition, task, True)
+		case Not():
+			result = Evaluate(condition.condition, task)
+			return None if result is None else not result
+	if not CanEvaluate(condition):
+		return None
+	return _EVALUATORS[type(condition)](condition, task)
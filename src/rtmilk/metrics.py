@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Callable
+from dataclasses import dataclass
+from threading import Lock
+from time import perf_counter
+
+from .models import FailStat
+
+# the stages of an API call, in the order they happen
+STAGES = ('sign', 'wait', 'network', 'decode', 'validate')
+
+@dataclass(frozen=True)
+class CallMetrics:
+	"""What one API call did. The stage times are in seconds and are 0 for stages that weren't reached
+	wait is the time spent waiting for the rate limiter"""
+	method: str
+	sign: float = 0
+	wait: float = 0
+	network: float = 0
+	decode: float = 0
+	validate: float = 0
+	responseBytes: int = 0
+	# 'ok', 'fail' for a FailStat, or the class name of the exception that was raised
+	outcome: str = 'ok'
+	# the FailStat's error code
+	code: int | None = None
+
+	@property
+	def total(self) -> float:
+		return sum(getattr(self, stage) for stage in STAGES)
+
+Hook = Callable[[CallMetrics], None]
+
+class _CallTimer:
+	"""Times the stages of one call as it goes through them"""
+
+	def __init__(self, method):
+		self.method = method
+		self.responseBytes = 0
+		self._durations = {}
+		self._last = perf_counter()
+
+	def Lap(self, stage):
+		now = perf_counter()
+		self._durations[stage] = now - self._last
+		self._last = now
+
+	def Metrics(self, result):
+		"""result is the call's return value or the exception that it raised"""
+		if isinstance(result, BaseException):
+			outcome, code = type(result.__cause__ or result).__name__, None
+		elif isinstance(result, FailStat):
+			outcome, code = 'fail', result.err.code
+		else:
+			outcome, code = 'ok', None
+		return CallMetrics(self.method, **self._durations, responseBytes=self.responseBytes, outcome=outcome, code=code)
+
+# upper bounds, roughly logarithmic from 1ms to 1 minute
+_SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# upper bounds from 1KB to 10MB
+_BYTES_BUCKETS = (1 << 10, 4 << 10, 16 << 10, 64 << 10, 256 << 10, 1 << 20, 4 << 20, 10 << 20)
+
+class Histogram:
+	"""Counts of observed values in fixed buckets, the same shape as a Prometheus histogram"""
+
+	def __init__(self, buckets=_SECONDS_BUCKETS):
+		self.buckets = tuple(buckets)
+		# the last count is for values above the last bucket
+		self.counts = [0] * (len(self.buckets) + 1)
+		self.count = 0
+		self.sum = 0
+
+	def __repr__(self):
+		return f'Histogram({self.count}, {self.mean})'
+
+	def Observe(self, value):
+		self.counts[bisect_left(self.buckets, value)] += 1
+		self.count += 1
+		self.sum += value
+
+	@property
+	def mean(self):
+		return self.sum / self.count if self.count != 0 else 0
+
+	def Quantile(self, quantile: float):
+		"""Upper bound of the bucket that the quantile falls in, or infinity if it's above the last bucket"""
+		rank = quantile * self.count
+		seen = 0
+		for bound, count in zip(self.buckets, self.counts, strict=False):
+			seen += count
+			if seen >= rank and seen != 0:
+				return bound
+		return float('inf')
+
+class MetricsCollector:
+	"""Hook which keeps in-memory histograms of each stage, the response size and the total time of each RTM method, plus counts of the outcomes
+	Thread-safe, so one collector can be added to several APIs"""
+
+	def __init__(self):
+		self.histograms: dict[tuple[str, str], Histogram] = {}
+		self.outcomes: dict[tuple[str, str], int] = {}
+		self._lock = Lock()
+
+	def __repr__(self):
+		return f'MetricsCollector({len(self.outcomes)})'
+
+	def _Observe(self, method, name, value, buckets=_SECONDS_BUCKETS):
+		histogram = self.histograms.get((method, name))
+		if histogram is None:
+			histogram = self.histograms[(method, name)] = Histogram(buckets)
+		histogram.Observe(value)
+
+	def __call__(self, metrics: CallMetrics):
+		with self._lock:
+			for stage in STAGES:
+				self._Observe(metrics.method, stage, getattr(metrics, stage))
+			self._Observe(metrics.method, 'total', metrics.total)
+			self._Observe(metrics.method, 'responseBytes', metrics.responseBytes, _BYTES_BUCKETS)
+			outcome = metrics.outcome if metrics.code is None else f'{metrics.outcome} {metrics.code}'
+			self.outcomes[(metrics.method, outcome)] = self.outcomes.get((metrics.method, outcome), 0) + 1
+
+	def Clear(self):
+		with self._lock:
+			self.histograms.clear()
+			self.outcomes.clear()
+
+	def Report(self) -> str:
+		"""A table of the mean time of each stage per method, slowest total first"""
+		with self._lock:
+			methods = sorted({method for method, _ in self.histograms}, key=lambda method: -self.histograms[(method, 'total')].sum)
+			lines = [f'{"method":<30}{"calls":>7}' + ''.join(f'{stage:>10}' for stage in (*STAGES, 'total')) + f'{"bytes":>10}  outcomes']
+			for method in methods:
+				outcomes = ', '.join(f'{outcome}: {count}' for (method_, outcome), count in sorted(self.outcomes.items()) if method_ == method)
+				lines.append(f'{method:<30}{self.histograms[(method, "total")].count:>7}'
+					+ ''.join(f'{self.histograms[(method, stage)].mean * 1000:>8.1f}ms' for stage in (*STAGES, 'total'))
+					+ f'{self.histograms[(method, "responseBytes")].mean:>10.0f}  {outcomes}')
+			return '\n'.join(lines)
+
+class MetricsExporter(ABC):
+	"""Hook which forwards the metrics to a metrics library e.g. Prometheus or OpenTelemetry
+	Subclasses only need to map these two calls onto the library's histogram and counter"""
+
+	@abstractmethod
+	def Observe(self, name: str, value: float, labels: dict[str, str]):
+		pass
+
+	@abstractmethod
+	def Increment(self, name: str, labels: dict[str, str]):
+		pass
+
+	def __call__(self, metrics: CallMetrics):
+		labels = {'method': metrics.method}
+		for stage in STAGES:
+			self.Observe(f'rtm_call_{stage}_seconds', getattr(metrics, stage), labels)
+		self.Observe('rtm_call_seconds', metrics.total, labels)
+		self.Observe('rtm_response_bytes', metrics.responseBytes, labels)
+		self.Increment('rtm_calls_total', {**labels, 'outcome': metrics.outcome, 'code': '' if metrics.code is None else str(metrics.code)})
@@ -1,23 +1,39 @@
 from __future__ import annotations
 
+from collections import Counter, defaultdict, deque
+from collections.abc import AsyncIterable, Callable, Iterable
 from copy import copy
 from dataclasses import dataclass, field
-from datetime import date, datetime
+from datetime import date, datetime, timedelta, timezone
+from functools import partial
+from hashlib import sha256
+from json import dumps, JSONDecodeError, loads
 from logging import getLogger
+from os import PathLike
+from pathlib import Path
+from typing import Any
 
 from listdiff import DiffUnsortedLists
-from rtmilk.models import APIError
+from rtmilk.models import AggregateError, APIError, BaseError
+
+from .client import _RunConcurrently, _SmartAddFields, Task
+from .profiling import _Profiled
 
 _log = getLogger(__name__)
 
+class MirrorError(AggregateError):
+	"""Some tasks failed to mirror. errors is a list of (Task or TaskData, exception)"""
+	failed = 'task(s) failed to mirror'
+
 @dataclass
 class TaskData:
 	name: str
-	tags: set[str] = field(default_factory=dict)
+	tags: set[str] = field(default_factory=set)
 	startDate: date | datetime | None = None
 	dueDate: date | datetime | None = None
 	notes: str = ''
 	complete: bool | None = False # optional here means that either is acceptable i.e. don't change an existing task's complete value
+	externalId: str | None = None
 
 	@classmethod
 	def FromTask(cls, task):
@@ -26,87 +42,599 @@ class TaskData:
 			tags=copy(task.tags.value),
 			startDate=task.startDate.value,
 			dueDate=task.dueDate.value,
-			complete=task.complete.value
+			complete=task.complete.value,
+			externalId=task.externalId
 		)
 
-def _MirrorProperty(property_, value):
-	if property_.value != value:
-		property_.Set(value)
+	def Fingerprint(self) -> str:
+		"""Hash of the content that Mirror sets, which is stable across processes so it can be persisted between runs"""
+		dates = [None if value is None else value.isoformat() for value in (self.startDate, self.dueDate)]
+		return sha256(dumps([self.name, sorted(self.tags), *dates, self.notes, self.complete]).encode()).hexdigest()
+
+@dataclass(frozen=True)
+class MatchKey:
+	"""How to get the key that pairs an existing Task with the TaskData it should mirror"""
+	task: Callable[[Any], Any]
+	taskData: Callable[[TaskData], Any]
+
+MatchByName = MatchKey(lambda task: task.name.value, lambda taskData: taskData.name)
+MatchByExternalId = MatchKey(lambda task: task.externalId, lambda taskData: taskData.externalId)
+
+@dataclass
+class TaskUpdate:
+	"""Properties to change on an existing task. changes maps the Task's property attribute name to the new value, in the order they'll be set"""
+	task: Any
+	taskData: TaskData
+	changes: dict[str, Any]
+
+	@property
+	def apiCalls(self) -> int:
+		return len(self.changes)
+
+def _AddCalls(taskData, listNames=frozenset()):
+	"""Assumes that the fields sent with Smart Add come back as requested"""
+	smartAdded = _SmartAddFields(taskData.name, taskData.tags, taskData.startDate, taskData.dueDate, listNames)
+	separate = [len(taskData.tags) != 0 and 'tags' not in smartAdded,
+		taskData.startDate is not None and 'startDate' not in smartAdded,
+		taskData.dueDate is not None and 'dueDate' not in smartAdded,
+		taskData.complete is not False,
+		taskData.notes != '']
+	return 1 + sum(separate)
+
+@dataclass
+class MirrorPlan:
+	"""The operations that Mirror will make, which can be inspected before (or instead of) executing them"""
+	deletes: list[Any] = field(default_factory=list)
+	adds: list[TaskData] = field(default_factory=list)
+	updates: list[TaskUpdate] = field(default_factory=list)
+	# number of tasks which weren't compared because their fingerprint hadn't changed
+	skipped: int = 0
+	# match key to TaskData.Fingerprint() for all the required tasks, plus any keys no longer required whose tasks still have to be deleted,
+	# to pass to the next run once this plan has been executed
+	fingerprints: dict[Any, str] = field(default_factory=dict)
+	matchKey: MatchKey = field(default=MatchByName, repr=False)
+
+	@property
+	def apiCalls(self) -> int:
+		"""Number of API calls that the plan's operations make. This leaves out
+		- the client's one-off calls before its first write, creating the timeline and reading the list names for Smart Add (see ApiCallsWith)
+		- setting the tags separately when they match a list name, which ApiCallsWith counts once the client has read the list names
+		- the due-before-start fallback, which sets the dates again in the other order
+		- deleting and adding a task again when one of its tags was taken as a list that was created since the list names were read"""
+		return self._ApiCalls(frozenset())
+
+	def ApiCallsWith(self, client) -> int:
+		"""apiCalls plus the one-off calls that the client will make first, given what it has already read
+		The timeline is counted as created even if the client's timelineProvider has one to reuse
+		Until the client has read the list names, tags that turn out to match a list aren't counted as set separately"""
+		listNames = client._listNames # noqa: SLF001
+		writes = len(self.deletes) + len(self.adds) + len(self.updates) != 0
+		readsListNames = listNames is None and any(len(taskData.tags) != 0 for taskData in self.adds)
+		return self._ApiCalls(listNames or frozenset()) + (writes and client.timeline is None) + readsListNames
+
+	def _ApiCalls(self, listNames):
+		return len(self.deletes) + sum(_AddCalls(taskData, listNames) for taskData in self.adds) + sum(update.apiCalls for update in self.updates)
+
+	def Duration(self, requestsPerSecond: float = 1.0) -> timedelta:
+		"""How long the plan will take to execute at the given request rate"""
+		return timedelta(seconds=self.apiCalls / requestsPerSecond)
+
+def _Changes(task, taskData):
+	changes = {}
+	# only possible when not matching by name, and then it's a rename rather than a delete and add
+	if task.name.value != taskData.name:
+		changes['name'] = taskData.name
+	if task.tags.value != taskData.tags:
+		changes['tags'] = taskData.tags
+	# Move the due date first because you're more likely to be moving both dates to be later
+	if task.dueDate.value != taskData.dueDate:
+		changes['dueDate'] = taskData.dueDate
+	if task.startDate.value != taskData.startDate:
+		changes['startDate'] = taskData.startDate
+	if taskData.complete is not None and task.complete.value != taskData.complete:
+		changes['complete'] = taskData.complete
+	return changes
+
+def _HashJoin(existingTasks, requiredTaskData, matchKey):
+	"""Pairs up tasks with equal keys in linear time. Tasks which share a key are paired in the order they're given
+	and any left over are deleted or added. A key of None never matches"""
+	existingByKey = defaultdict(deque)
+	toDelete = []
+	for task in existingTasks:
+		key = matchKey.task(task)
+		if key is None:
+			toDelete.append(task)
+		else:
+			existingByKey[key].append(task)
+	matches, toAdd = [], []
+	for taskData in requiredTaskData:
+		candidates = existingByKey.get(matchKey.taskData(taskData))
+		if candidates:
+			matches.append((candidates.popleft(), taskData))
+		else:
+			toAdd.append(taskData)
+	toDelete.extend(task for candidates in existingByKey.values() for task in candidates)
+	return toDelete, matches, toAdd
+
+def _AsUtc(value):
+	return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def _Fingerprints(requiredTaskData, matchKey, fingerprints):
+	"""The current fingerprints by key and the keys whose fingerprint is the same as last time"""
+	currentFingerprints = {matchKey.taskData(taskData): taskData.Fingerprint() for taskData in requiredTaskData}
+	keyCounts = Counter(matchKey.taskData(taskData) for taskData in requiredTaskData)
+	unchanged = {key for key, fingerprint in currentFingerprints.items() if key is not None and keyCounts[key] == 1 and fingerprints.get(key) == fingerprint}
+	return currentFingerprints, unchanged
+
+def KeysToLoad(requiredTaskData: Iterable[TaskData], fingerprints: dict[Any, str], matchKey: MatchKey | None = None) -> set:
+	"""The keys whose existing tasks PlanMirror needs in existingTasks, when it's given fingerprints, in addition to the tasks modified since lastSync
+	These are the required tasks whose fingerprint has changed and the keys from the last run that are no longer required, which have to be deleted"""
+	matchKey = matchKey or MatchByName
+	requiredTaskData = list(requiredTaskData)
+	currentFingerprints, unchanged = _Fingerprints(requiredTaskData, matchKey, fingerprints)
+	return {key for key in currentFingerprints.keys() | fingerprints.keys() if key is not None and key not in unchanged}
+
+def _SkipUnchanged(existingTasks, requiredTaskData, matchKey, fingerprints, lastSync, *, removed):
+	"""Remove the required tasks whose fingerprints are the same as last time, along with their existing tasks
+	Unless the existing task has been modified since lastSync or removed, in which case it has to be compared"""
+	currentFingerprints, unchanged = _Fingerprints(requiredTaskData, matchKey, fingerprints)
+	removed = set(removed or ())
+	if lastSync is not None:
+		lastSync = _AsUtc(lastSync)
+		unchanged -= {matchKey.task(task) for task in existingTasks if task.modifiedTime is not None and _AsUtc(task.modifiedTime) > lastSync}
+	# a removed task is missing from existingTasks, so comparing it adds it again
+	unchanged -= removed
+	existingKeys = {matchKey.task(task) for task in existingTasks}
+	# a key that's no longer required but whose task wasn't loaded can't be deleted yet, so it's kept for a later run to delete
+	unresolved = {key: fingerprint for key, fingerprint in fingerprints.items() if key not in currentFingerprints and key not in existingKeys and key not in removed}
+	if len(unresolved) != 0:
+		_log.warning(f'Not deleting {len(unresolved)} task(s) which are no longer required because they are missing from existingTasks - see KeysToLoad')
+	existingTasks = [task for task in existingTasks if matchKey.task(task) not in unchanged]
+	requiredTaskData = [taskData for taskData in requiredTaskData if matchKey.taskData(taskData) not in unchanged]
+	return existingTasks, requiredTaskData, len(unchanged), {**unresolved, **{key: fingerprint for key, fingerprint in currentFingerprints.items() if key is not None}}
+
+@_Profiled('mirror diff')
+def PlanMirror(existingTasks, requiredTaskData, matchKey: MatchKey | None = None, fingerprints: dict[Any, str] | None = None, lastSync: datetime | None = None, *, removed: Iterable | None = None) -> MirrorPlan:
+	"""Work out what Mirror would do without making any API calls
+	By default tasks are matched by name. With a matchKey (e.g. MatchByExternalId) they're matched with a hash join,
+	and matched tasks whose names differ are renamed
+	fingerprints is MirrorPlan.fingerprints from the last successful run and lastSync is when that run read the existing tasks
+	Tasks whose fingerprint is unchanged are skipped unless their existing task was modified after lastSync
+	Those tasks don't need to be in existingTasks at all, so it can be limited to the tasks modified since lastSync plus the ones with the KeysToLoad
+	Otherwise a changed task whose existing task is missing is added again, and a task that's no longer required isn't deleted until a run that has it
+	removed is the keys of the tasks which were deleted or moved out of existingTasks since lastSync, which are compared (and so added again) even if they're unchanged"""
+	skipped, newFingerprints = 0, {}
+	if fingerprints is not None:
+		existingTasks, requiredTaskData, skipped, newFingerprints = _SkipUnchanged(list(existingTasks), list(requiredTaskData), matchKey or MatchByName, fingerprints, lastSync, removed=removed)
+	if matchKey is None:
+		toDelete, matches, toAdd = DiffUnsortedLists(iter(existingTasks), iter(requiredTaskData), lambda x: x.name.value, lambda x: x.name)
+	else:
+		toDelete, matches, toAdd = _HashJoin(existingTasks, requiredTaskData, matchKey)
+	plan = MirrorPlan(deletes=list(toDelete), adds=list(toAdd), skipped=skipped, fingerprints=newFingerprints, matchKey=matchKey or MatchByName)
+	for task, taskData in matches:
+		changes = _Changes(task, taskData)
+		if len(changes) != 0:
+			plan.updates.append(TaskUpdate(task, taskData, changes))
+	return plan
+
+class MirrorJournal:
+	"""Append-only record of the operations a Mirror run has completed, so that rerunning the same plan after a failure resumes where it stopped
+	Each line is a JSON object with the RTM ids, and the transaction id where there is one, of a completed call
+	The file is removed when the run succeeds. With no path, the journal is only kept in memory"""
+
+	def __init__(self, path: str | PathLike | None = None):
+		self.path = None if path is None else Path(path)
+		self._added = {}
+		self._set = set()
+		self._done = set()
+		self._file = None
+		if self.path is not None and self.path.exists():
+			self._Load()
+
+	def __repr__(self):
+		return f'MirrorJournal({self.path})'
+
+	def _Load(self):
+		with self.path.open(encoding='utf-8') as f: # ty: ignore[possibly-missing-attribute]
+			for line in f:
+				try:
+					record = loads(line)
+				except JSONDecodeError:
+					# the run was stopped part way through writing the last line
+					_log.warning(f'Ignoring incomplete journal line: {line!r}')
+					continue
+				self._Apply(record)
+		_log.info(f'Resuming from {self}: {len(self._done)} operation(s) already done')
+
+	def _Apply(self, record):
+		if record['op'] == 'add':
+			self._added[record['key']] = tuple(record['ids'])
+		elif record['op'] == 'set':
+			self._set.add((record['key'], record['property']))
+		elif record['op'] == 'done':
+			self._done.add(record['key'])
+
+	def _Write(self, record):
+		self._Apply(record)
+		if self.path is None:
+			return
+		if self._file is None:
+			self._file = self.path.open('a', encoding='utf-8')
+		self._file.write(dumps(record, separators=(',', ':'), default=str) + '\n')
+		self._file.flush()
+
+	def IsDone(self, key: str) -> bool:
+		return key in self._done
+
+	def IsSet(self, key: str, property_: str) -> bool:
+		return (key, property_) in self._set
+
+	def AddedIds(self, key: str) -> tuple[str, str, str] | None:
+		return self._added.get(key)
+
+	def RecordAdd(self, key: str, ids):
+		self._added[key] = ids
+		if self.path is not None:
+			self._Write({'op': 'add', 'key': key, 'ids': list(ids)})
+
+	def RecordSet(self, key: str, property_: str, transaction):
+		self._Write({'op': 'set', 'key': key, 'property': property_, 'transaction': _TransactionId(transaction)})
+
+	def RecordDone(self, key: str, transaction=None):
+		self._Write({'op': 'done', 'key': key, 'transaction': _TransactionId(transaction)})
+
+	def Close(self):
+		if self._file is not None:
+			self._file.close()
+			self._file = None
+
+	def Finish(self):
+		"""Called when the run has succeeded so there's nothing to resume"""
+		self.Close()
+		if self.path is not None:
+			self.path.unlink(missing_ok=True)
+
+class _NullJournal(MirrorJournal):
+	"""Journal which remembers nothing, so that streaming mirrors use constant memory"""
+
+	def _Apply(self, record):
+		pass
 
-async def _MirrorPropertyAsync(property_, value):
-	if property_.value != value:
-		await property_.SetAsync(value)
+	def RecordAdd(self, key, ids):
+		pass
 
-def _MirrorTask(task, taskData):
-	_MirrorProperty(task.tags, taskData.tags)
+def _TransactionId(transaction):
+	return getattr(transaction, 'id', None)
+
+def _JournalKey(value):
+	return dumps(value, separators=(',', ':'), default=str)
+
+def _AddKeys(adds, matchKey):
+	"""Journal keys for the adds, which are the same when the same plan is made again. Adds which share a match key are told apart by their order"""
+	occurrences = Counter()
+	keys = []
+	for taskData in adds:
+		key = matchKey.taskData(taskData)
+		keys.append(_JournalKey(['add', key, occurrences[key]]))
+		occurrences[key] += 1
+	return keys
+
+@dataclass
+class MirrorProgress:
+	"""Passed to the progress callback as each operation finishes"""
+	done: int
+	total: int
+	kind: str # 'delete', 'add' or 'update'
+	item: Any # Task, TaskData or TaskUpdate respectively
+	resumed: bool # the journal says that an earlier run already did it
+
+def _DateOrder(changes):
+	return [name for name in ('dueDate', 'startDate') if name in changes]
+
+def _Set(journal, key, task, name, value):
+	if not journal.IsSet(key, name):
+		journal.RecordSet(key, name, getattr(task, name).Set(value))
+
+async def _SetAsync(journal, key, task, name, value):
+	if not journal.IsSet(key, name):
+		journal.RecordSet(key, name, await getattr(task, name).SetAsync(value))
+
+def _DeleteTask(task, journal):
+	key = _JournalKey(task.ids)
+	if journal.IsDone(key):
+		return True
+	journal.RecordDone(key, task.Delete())
+	return False
+
+async def _DeleteTaskAsync(task, journal):
+	key = _JournalKey(task.ids)
+	if journal.IsDone(key):
+		return True
+	journal.RecordDone(key, await task.DeleteAsync())
+	return False
+
+def _SetChanges(journal, key, task, changes):
+	for name in ('name', 'tags'):
+		if name in changes:
+			_Set(journal, key, task, name, changes[name])
+	dates = _DateOrder(changes)
 	try:
-		# Move the due date first because you're more likely to be moving both dates to be later
-		_MirrorProperty(task.dueDate, taskData.dueDate)
-		_MirrorProperty(task.startDate, taskData.startDate)
+		for name in dates:
+			_Set(journal, key, task, name, changes[name])
 	except APIError:
-		_MirrorProperty(task.startDate, taskData.startDate)
-		_MirrorProperty(task.dueDate, taskData.dueDate)
-	if taskData.complete is not None:
-		_MirrorProperty(task.complete, taskData.complete)
+		# the first order can be rejected e.g. a due date before the existing start date
+		for name in reversed(dates):
+			_Set(journal, key, task, name, changes[name])
+	if 'complete' in changes:
+		_Set(journal, key, task, 'complete', changes['complete'])
 
-async def _MirrorTaskAsync(task, taskData):
-	await _MirrorPropertyAsync(task.tags, taskData.tags)
+async def _SetChangesAsync(journal, key, task, changes):
+	for name in ('name', 'tags'):
+		if name in changes:
+			await _SetAsync(journal, key, task, name, changes[name])
+	dates = _DateOrder(changes)
 	try:
-		# Move the due date first because you're more likely to be moving both dates to be later
-		await _MirrorPropertyAsync(task.dueDate, taskData.dueDate)
-		await _MirrorPropertyAsync(task.startDate, taskData.startDate)
+		for name in dates:
+			await _SetAsync(journal, key, task, name, changes[name])
 	except APIError:
-		await _MirrorPropertyAsync(task.startDate, taskData.startDate)
-		await _MirrorPropertyAsync(task.dueDate, taskData.dueDate)
-	if taskData.complete is not None:
-		await _MirrorPropertyAsync(task.complete, taskData.complete)
+		for name in reversed(dates):
+			await _SetAsync(journal, key, task, name, changes[name])
+	if 'complete' in changes:
+		await _SetAsync(journal, key, task, 'complete', changes['complete'])
 
-def Mirror(client, existingTasks, requiredTaskData):
-	"""Assumes that there have been no changes since existingTasks were read from the remote
-	Won't update a value which was already correct, according to existingTasks"""
-	_log.info(f'Mirror: {existingTasks}, {requiredTaskData}')
-	toDelete, matches, toAdd = DiffUnsortedLists(iter(existingTasks), iter(requiredTaskData), lambda x: x.name.value, lambda x: x.name)
-
-	for task in toDelete:
-		task.Delete()
-
-	for taskData in toAdd:
-		newTask = client.Add(taskData.name)
-		if len(taskData.tags) != 0:
-			newTask.tags.Set(taskData.tags)
-		if taskData.startDate is not None:
-			newTask.startDate.Set(taskData.startDate)
-		if taskData.dueDate is not None:
-			newTask.dueDate.Set(taskData.dueDate)
-		if taskData.complete is not False:
-			newTask.complete.Set(taskData.complete)
-		if taskData.notes != '':
-			newTask.notes.Add('', taskData.notes)
+def _ApplyUpdate(update, journal):
+	key = _JournalKey(update.task.ids)
+	if journal.IsDone(key):
+		return True
+	_SetChanges(journal, key, update.task, update.changes)
+	journal.RecordDone(key)
+	return False
 
-	for task, taskData in matches:
-		_MirrorTask(task, taskData)
+async def _ApplyUpdateAsync(update, journal):
+	key = _JournalKey(update.task.ids)
+	if journal.IsDone(key):
+		return True
+	await _SetChangesAsync(journal, key, update.task, update.changes)
+	journal.RecordDone(key)
+	return False
+
+def _TagsToAdd(taskData):
+	return taskData.tags if len(taskData.tags) != 0 else None
+
+def _AddChanges(task, taskData):
+	"""The changes to make to a task that's just been added, for the fields that didn't come back as requested
+	For a task added by an earlier run, the values aren't loaded so all the requested fields are set, except those the journal says were already set"""
+	changes = {name: value for name, value in (('name', taskData.name), ('startDate', taskData.startDate), ('dueDate', taskData.dueDate)) if getattr(task, name).value != value}
+	if len(taskData.tags) != 0 and task.tags.value != taskData.tags:
+		changes['tags'] = taskData.tags
+	if taskData.complete is not False:
+		changes['complete'] = taskData.complete
+	return changes
+
+def _AddTask(client, taskData, journal, key):
+	"""A task which was added by an earlier run is picked up from its journaled ids rather than added again
+	The ids are journaled as soon as the task is added, before any of the calls to fix up the fields which didn't come back as requested"""
+	if journal.IsDone(key):
+		return True
+	ids = journal.AddedIds(key)
+	if ids is None:
+		newTask = client._Add(taskData.name, _TagsToAdd(taskData), taskData.startDate, taskData.dueDate, taskData.externalId) # noqa: SLF001 - Add without its fix-ups, which are made here under the journal
+		journal.RecordAdd(key, newTask.ids)
+	else:
+		newTask = Task(client, *ids)
+	_SetChanges(journal, key, newTask, _AddChanges(newTask, taskData))
+	if taskData.notes != '' and not journal.IsSet(key, 'notes'):
+		journal.RecordSet(key, 'notes', newTask.notes.Add('', taskData.notes))
+	journal.RecordDone(key)
+	return False
+
+async def _AddTaskAsync(client, taskData, journal, key):
+	if journal.IsDone(key):
+		return True
+	ids = journal.AddedIds(key)
+	if ids is None:
+		newTask = await client._AddAsync(taskData.name, _TagsToAdd(taskData), taskData.startDate, taskData.dueDate, taskData.externalId) # noqa: SLF001
+		journal.RecordAdd(key, newTask.ids)
+	else:
+		newTask = Task(client, *ids)
+	await _SetChangesAsync(journal, key, newTask, _AddChanges(newTask, taskData))
+	if taskData.notes != '' and not journal.IsSet(key, 'notes'):
+		journal.RecordSet(key, 'notes', await newTask.notes.AddAsync('', taskData.notes))
+	journal.RecordDone(key)
+	return False
+
+def _Operations(client, plan, journal, *, asynchronous):
+	"""(kind, item, function) for each operation in the plan, where the function returns whether the journal says it was already done"""
+	deleteTask, addTask, applyUpdate = (_DeleteTaskAsync, _AddTaskAsync, _ApplyUpdateAsync) if asynchronous else (_DeleteTask, _AddTask, _ApplyUpdate)
+	return [('delete', task, partial(deleteTask, task, journal)) for task in plan.deletes] \
+		+ [('add', taskData, partial(addTask, client, taskData, journal, key)) for taskData, key in zip(plan.adds, _AddKeys(plan.adds, plan.matchKey), strict=True)] \
+		+ [('update', update, partial(applyUpdate, update, journal)) for update in plan.updates]
+
+class _ProgressReporter:
+	def __init__(self, total, progress):
+		self._total = total
+		self._progress = progress
+		self._done = 0
+
+	def __call__(self, kind, item, resumed):
+		self._done += 1
+		if self._progress is not None:
+			self._progress(MirrorProgress(self._done, self._total, kind, item, resumed))
 
-async def MirrorAsync(client, existingTasks, requiredTaskData):
+async def _RunOperation(kind, item, operation, report):
+	"""Returns the failure for _RunConcurrently if the operation fails"""
+	try:
+		resumed = await operation()
+	except BaseError as e:
+		_log.warning(f'Failed to mirror {item}: {e!r}')
+		return item.task if kind == 'update' else item, e
+	report(kind, item, resumed)
+	return None
+
+@_Profiled('mirror execute')
+def ExecutePlan(client, plan: MirrorPlan, journal: MirrorJournal | None = None, progress: Callable[[MirrorProgress], None] | None = None):
+	"""With a journal, the operations it records as done are skipped and the rest are recorded as they complete
+	progress is called with a MirrorProgress after each operation"""
+	_log.info('ExecutePlan: %s', plan)
+	journal = journal if journal is not None else MirrorJournal()
+	operations = _Operations(client, plan, journal, asynchronous=False)
+	report = _ProgressReporter(len(operations), progress)
+	try:
+		for kind, item, operation in operations:
+			report(kind, item, operation())
+	finally:
+		journal.Close()
+	journal.Finish()
+
+@_Profiled('mirror execute')
+async def ExecutePlanAsync(client, plan: MirrorPlan, concurrency: int | None = None, journal: MirrorJournal | None = None, progress: Callable[[MirrorProgress], None] | None = None):
+	"""With concurrency, up to that many tasks are mirrored in parallel. The calls for any one task are still made in order
+	and the tasks that failed are raised as a MirrorError once the rest are done
+	See ExecutePlan for journal and progress"""
+	_log.info('ExecutePlanAsync: %s', plan)
+	journal = journal if journal is not None else MirrorJournal()
+	operations = _Operations(client, plan, journal, asynchronous=True)
+	report = _ProgressReporter(len(operations), progress)
+	try:
+		if concurrency is not None:
+			await _RunConcurrently([partial(_RunOperation, *operation, report) for operation in operations], concurrency, MirrorError)
+		else:
+			for kind, item, operation in operations:
+				report(kind, item, await operation())
+	finally:
+		journal.Close()
+	journal.Finish()
+
+def Mirror(client, existingTasks, requiredTaskData, *, dryRun: bool = False, matchKey: MatchKey | None = None, fingerprints: dict[Any, str] | None = None, lastSync: datetime | None = None, removed: Iterable | None = None,
+	journal: MirrorJournal | None = None, progress: Callable[[MirrorProgress], None] | None = None) -> MirrorPlan:
 	"""Assumes that there have been no changes since existingTasks were read from the remote
-	Won't update a value which was already correct, according to existingTasks"""
-	_log.info(f'Mirror: {existingTasks}, {requiredTaskData}')
-	toDelete, matches, toAdd = DiffUnsortedLists(iter(existingTasks), iter(requiredTaskData), lambda x: x.name.value, lambda x: x.name)
-
-	for task in toDelete:
-		await task.DeleteAsync()
-
-	for taskData in toAdd:
-		newTask = await client.AddAsync(taskData.name)
-		if len(taskData.tags) != 0:
-			await newTask.tags.SetAsync(taskData.tags)
-		if taskData.startDate is not None:
-			await newTask.startDate.SetAsync(taskData.startDate)
-		if taskData.dueDate is not None:
-			await newTask.dueDate.SetAsync(taskData.dueDate)
-		if taskData.complete is not False:
-			await newTask.complete.SetAsync(taskData.complete)
-		if taskData.notes != '':
-			await newTask.notes.AddAsync('', taskData.notes)
+	Won't update a value which was already correct, according to existingTasks
+	Returns the plan that was executed, or would have been with dryRun. See PlanMirror for matchKey, fingerprints, lastSync and removed and ExecutePlan for journal and progress"""
+	_log.info('Mirror: %s, %s', existingTasks, requiredTaskData)
+	plan = PlanMirror(existingTasks, requiredTaskData, matchKey, fingerprints, lastSync, removed=removed)
+	if not dryRun:
+		ExecutePlan(client, plan, journal, progress)
+	return plan
 
-	for task, taskData in matches:
-		await _MirrorTaskAsync(task, taskData)
+async def MirrorAsync(client, existingTasks, requiredTaskData, *, concurrency: int | None = None, dryRun: bool = False, matchKey: MatchKey | None = None, fingerprints: dict[Any, str] | None = None, lastSync: datetime | None = None, removed: Iterable | None = None,
+	journal: MirrorJournal | None = None, progress: Callable[[MirrorProgress], None] | None = None) -> MirrorPlan:
+	"""Assumes that there have been no changes since existingTasks were read from the remote
+	Won't update a value which was already correct, according to existingTasks
+	Returns the plan that was executed, or would have been with dryRun. See PlanMirror for matchKey, fingerprints, lastSync and removed and ExecutePlanAsync for concurrency, journal and progress"""
+	_log.info('Mirror: %s, %s', existingTasks, requiredTaskData)
+	plan = PlanMirror(existingTasks, requiredTaskData, matchKey, fingerprints, lastSync, removed=removed)
+	if not dryRun:
+		await ExecutePlanAsync(client, plan, concurrency, journal, progress)
+	return plan
+
+_END = object()
+
+class _SortChecker:
+	"""Checks that keys arrive in ascending order, which the merge join relies on"""
+	def __init__(self, side):
+		self._side = side
+		self._previous = _END
+
+	def __call__(self, key):
+		if key is None:
+			raise ValueError(f'{self._side} has an item without a key')
+		if self._previous is not _END and key < self._previous:
+			raise ValueError(f'{self._side} is not sorted by key: {key!r} came after {self._previous!r}')
+		self._previous = key
+		return key
+
+def _MergeStep(task, taskData, taskKey, taskDataKey):
+	"""Which side(s) the merge join consumes next: 'delete', 'add' or 'match'"""
+	if taskData is _END:
+		return 'delete'
+	if task is _END:
+		return 'add'
+	if taskKey < taskDataKey:
+		return 'delete'
+	if taskDataKey < taskKey:
+		return 'add'
+	return 'match'
+
+def _Operation(step, task, taskData):
+	"""The plan operation for a merge join step, or None for a matched task which is already correct"""
+	if step == 'delete':
+		return 'delete', task
+	if step == 'add':
+		return 'add', taskData
+	changes = _Changes(task, taskData)
+	return ('update', TaskUpdate(task, taskData, changes)) if len(changes) != 0 else None
+
+def IterMirrorPlan(existingTasks: Iterable, requiredTaskData: Iterable[TaskData], matchKey: MatchKey | None = None):
+	"""Streaming version of PlanMirror which uses constant memory
+	Both sides must already be sorted by their match key (the name by default), otherwise ValueError is raised
+	Yields ('delete', Task), ('add', TaskData) and ('update', TaskUpdate) as soon as they're known"""
+	matchKey = matchKey or MatchByName
+	checkTask, checkTaskData = _SortChecker('existingTasks'), _SortChecker('requiredTaskData')
+	existing, required = iter(existingTasks), iter(requiredTaskData)
+	task, taskData = next(existing, _END), next(required, _END)
+	while task is not _END or taskData is not _END:
+		taskKey = _END if task is _END else checkTask(matchKey.task(task))
+		taskDataKey = _END if taskData is _END else checkTaskData(matchKey.taskData(taskData))
+		step = _MergeStep(task, taskData, taskKey, taskDataKey)
+		operation = _Operation(step, task, taskData)
+		if operation is not None:
+			yield operation
+		if step in {'delete', 'match'}:
+			task = next(existing, _END)
+		if step in {'add', 'match'}:
+			taskData = next(required, _END)
+
+async def _NextAsync(iterator):
+	try:
+		return await anext(iterator)
+	except StopAsyncIteration:
+		return _END
+
+async def IterMirrorPlanAsync(existingTasks: AsyncIterable, requiredTaskData: AsyncIterable[TaskData], matchKey: MatchKey | None = None):
+	"""IterMirrorPlan for async iterators"""
+	matchKey = matchKey or MatchByName
+	checkTask, checkTaskData = _SortChecker('existingTasks'), _SortChecker('requiredTaskData')
+	existing, required = aiter(existingTasks), aiter(requiredTaskData)
+	task, taskData = await _NextAsync(existing), await _NextAsync(required)
+	while task is not _END or taskData is not _END:
+		taskKey = _END if task is _END else checkTask(matchKey.task(task))
+		taskDataKey = _END if taskData is _END else checkTaskData(matchKey.taskData(taskData))
+		step = _MergeStep(task, taskData, taskKey, taskDataKey)
+		operation = _Operation(step, task, taskData)
+		if operation is not None:
+			yield operation
+		if step in {'delete', 'match'}:
+			task = await _NextAsync(existing)
+		if step in {'add', 'match'}:
+			taskData = await _NextAsync(required)
+
+def MirrorStream(client, existingTasks: Iterable, requiredTaskData: Iterable[TaskData], matchKey: MatchKey | None = None) -> Counter:
+	"""Mirror for sorted iterators (see IterMirrorPlan), executing each operation as soon as it's known
+	Returns the number of operations of each kind"""
+	_log.info('MirrorStream')
+	counts = Counter()
+	journal = _NullJournal()
+	for kind, item in IterMirrorPlan(existingTasks, requiredTaskData, matchKey):
+		if kind == 'delete':
+			_DeleteTask(item, journal)
+		elif kind == 'add':
+			_AddTask(client, item, journal, _JournalKey(['add', counts[kind]]))
+		else:
+			_ApplyUpdate(item, journal)
+		counts[kind] += 1
+	return counts
+
+async def MirrorStreamAsync(client, existingTasks: AsyncIterable, requiredTaskData: AsyncIterable[TaskData], matchKey: MatchKey | None = None) -> Counter:
+	"""MirrorStream for async iterators"""
+	_log.info('MirrorStreamAsync')
+	counts = Counter()
+	journal = _NullJournal()
+	async for kind, item in IterMirrorPlanAsync(existingTasks, requiredTaskData, matchKey):
+		if kind == 'delete':
+			await _DeleteTaskAsync(item, journal)
+		elif kind == 'add':
+			await _AddTaskAsync(client, item, journal, _JournalKey(['add', counts[kind]]))
+		else:
+			await _ApplyUpdateAsync(item, journal)
+		counts[kind] += 1
+	return counts
@@ -4,7 +4,7 @@ from datetime import datetime
 from enum import Enum, IntEnum
 from typing import Annotated
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from pydantic.types import StringConstraints
 
 from ._utils import EmptyStrToNone
@@ -12,6 +12,15 @@ from ._utils import EmptyStrToNone
 class BaseError(Exception):
 	"""Base class for all errors"""
 
+class AggregateError(BaseError):
+	"""Some of a batch of concurrent operations failed. errors is a list of (item, exception)"""
+	# the end of the message, after the number of failures
+	failed = 'operation(s) failed'
+
+	def __init__(self, errors):
+		super().__init__(f'{len(errors)} {self.failed}')
+		self.errors = errors
+
 class APIError(BaseError):
 	"""Error documented in RTM API"""
 	def __init__(self, code, message):
@@ -22,14 +31,18 @@ class APIError(BaseError):
 	def __repr__(self):
 		return f'APIError({self.code=}, {self.message=})'
 
-class ErrorData(BaseModel):
+class _Model(BaseModel):
+	# validators are built the first time a model is used rather than when rtmilk is imported
+	model_config = ConfigDict(defer_build=True)
+
+class ErrorData(_Model):
 	code: int
 	msg: str
 
-class OkStat(BaseModel):
+class OkStat(_Model):
 	stat: Annotated[str, StringConstraints(pattern='ok')]
 
-class FailStat(BaseModel):
+class FailStat(_Model):
 	stat: Annotated[str, StringConstraints(pattern='fail')]
 	err: ErrorData
 
@@ -42,7 +55,7 @@ class EchoResponse(OkStat):
 	__test__ = False # avoid pytest warning
 	method: Annotated[str, StringConstraints(pattern='rtm.test.echo')]
 
-class RTMList(BaseModel):
+class RTMList(_Model):
 	id: str
 	name: str
 	deleted: bool
@@ -70,7 +83,7 @@ class RTMSmartList(RTMList):
 			raise ValueError('Must be True for smart lists')
 		return value
 
-class ListPayload(BaseModel):
+class ListPayload(_Model):
 	list: list[RTMSmartList | RTMList]
 
 class SingleListResponse(OkStat):
@@ -84,12 +97,12 @@ class PermsEnum(str, Enum):
 	write = 'write'
 	delete = 'delete'
 
-class User(BaseModel):
+class User(_Model):
 	id: str
 	username: str
 	fullname: str
 
-class AuthResponsePayload(BaseModel):
+class AuthResponsePayload(_Model):
 	perms: PermsEnum
 	token: str
 	user: User
@@ -110,7 +123,7 @@ class PriorityDirectionEnum(Enum):
 	Up = 'up'
 	Down = 'down'
 
-class Task(BaseModel):
+class Task(_Model):
 	id: str
 	added: datetime
 	completed: EmptyStrToNone[datetime | None]
@@ -123,14 +136,14 @@ class Task(BaseModel):
 	priority: PriorityEnum
 	start: EmptyStrToNone[datetime | None]
 
-class Note(BaseModel):
+class Note(_Model):
 	id: str
 	created: datetime
 	modified: datetime
 	title: str
 	body: str | None = Field(None, alias='$t')
 
-class Transaction(BaseModel):
+class Transaction(_Model):
 	id: str
 	undoable: bool
 
@@ -138,13 +151,13 @@ class NotesResponse(OkStat):
 	transaction: Transaction
 	note: Note
 
-class NotePayload(BaseModel):
+class NotePayload(_Model):
 	note: list[Note]
 
-class Tags(BaseModel):
+class Tags(_Model):
 	tag: list[str]
 
-class TaskSeries(BaseModel):
+class TaskSeries(_Model):
 	id: str
 	created: datetime
 	modified: datetime
@@ -153,6 +166,7 @@ class TaskSeries(BaseModel):
 	url: EmptyStrToNone[str | None]
 	location_id: str
 	participants: list[str]
+	external_id: EmptyStrToNone[str | None] = None
 
 	# see test_that_unions_are_necessary_for_notes_list for why the Union is necessary
 	# in the case where this is a list[str], it's always an empty list
@@ -163,7 +177,7 @@ class TaskSeries(BaseModel):
 	# in the case where this is a list[str], it's always an empty list
 	tags: Tags | list[str]
 
-class TaskPayload(BaseModel):
+class TaskPayload(_Model):
 	id: str
 	taskseries: list[TaskSeries]
 
@@ -171,7 +185,7 @@ class TaskResponse(OkStat):
 	transaction: Transaction
 	list: TaskPayload
 
-class TasksInListPayload(BaseModel):
+class TasksInListPayload(_Model):
 	id: str
 	# can be missing if there are no tasks in the list returned from TasksGetList with just a listid
 	taskseries: list[TaskSeries] | None = None
@@ -179,7 +193,7 @@ class TasksInListPayload(BaseModel):
 # hack to make the module import
 ListOfTasksInListPayload = list[TasksInListPayload]
 
-class TaskListPayload(BaseModel):
+class TaskListPayload(_Model):
 	rev: str
 	# if there are are no tasks in the list, returned from TasksGetList via a filter, this node is missing
 	list: ListOfTasksInListPayload | None = None
@@ -187,10 +201,10 @@ class TaskListPayload(BaseModel):
 class TaskListResponse(OkStat):
 	tasks: TaskListPayload
 
-class TagObject(BaseModel):
+class TagObject(_Model):
 	name: str
 
-class TagForList(BaseModel):
+class TagForList(_Model):
 	tag: list[TagObject]
 
 class TagListResponse(OkStat):
@@ -204,7 +218,7 @@ class TimeFormatEnum(IntEnum):
 	Format12Hour = 0
 	Format24Hour = 1
 
-class SettingsPayload(BaseModel):
+class SettingsPayload(_Model):
 	timezone: str
 	dateformat: DateFormatEnum # 0 for Euro format, 1 for US format
 	timeformat: TimeFormatEnum # 0 for 12-hour format, 1 for 24-hour format
@@ -216,13 +230,13 @@ class SettingsPayload(BaseModel):
 class SettingsResponse(OkStat):
 	settings: SettingsPayload
 
-class Topic(BaseModel):
+class Topic(_Model):
 	topic: list[str]
 
 class TopicListResponse(OkStat):
 	topics: Topic
 
-class SubscriptionPayload(BaseModel):
+class SubscriptionPayload(_Model):
 	id: str
 	url: str
 	format: Annotated[str, StringConstraints(pattern='json')]
@@ -234,7 +248,7 @@ class SubscriptionResponse(OkStat):
 	transaction: Transaction
 	subscription: SubscriptionPayload
 
-class SubscriptionList(BaseModel):
+class SubscriptionList(_Model):
 	subscription: list[SubscriptionPayload]
 
 class SubscriptionListResponse(OkStat):
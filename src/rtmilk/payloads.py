@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from time import time
+
+from ._secrets import _Redacted
+
+@dataclass(frozen=True)
+class Payload:
+	"""One call's signed parameters, with the secrets redacted, and the raw response body"""
+	time: datetime
+	params: dict[str, str]
+	response: bytes | None
+
+	@property
+	def method(self) -> str | None:
+		return self.params.get('method')
+
+class PayloadRingBuffer:
+	"""The most recent maxSize calls made by an API, for post-mortem debugging
+
+		api.payloads = PayloadRingBuffer(50)
+
+	Recording a call only appends references to a deque - the parameters are redacted and the responses decoded when they're read"""
+
+	def __init__(self, maxSize: int = 100):
+		self._payloads = deque(maxlen=maxSize)
+
+	def __repr__(self):
+		return f'PayloadRingBuffer({len(self._payloads)})'
+
+	def __len__(self):
+		return len(self._payloads)
+
+	def __iter__(self):
+		"""Oldest first"""
+		for time_, params, response in list(self._payloads):
+			yield Payload(datetime.fromtimestamp(time_, timezone.utc), _Redacted(params), response)
+
+	def Record(self, params: dict[str, str], response: bytes | None):
+		self._payloads.append((time(), params, response))
+
+	def Clear(self):
+		self._payloads.clear()
+
+	def Dump(self) -> str:
+		"""All the payloads as text, e.g. to log when something goes wrong"""
+		return '\n'.join(f'{payload.time.isoformat()} {payload.params}\n{(payload.response or b"").decode(errors="replace")}' for payload in self)
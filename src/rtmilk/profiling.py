@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from contextlib import nullcontext
+from dataclasses import dataclass
+from functools import wraps
+from inspect import iscoroutinefunction
+from sys import getallocatedblocks
+from threading import Lock
+from time import perf_counter
+
+from .models import BaseError
+
+# what Stage returns when not profiling, so that a disabled stage is just an empty with block
+_NOT_PROFILING = nullcontext()
+
+@dataclass
+class StageStats:
+	calls: int = 0
+	seconds: float = 0
+	# net retained blocks: the change in sys.getallocatedblocks() across the stage, i.e. the blocks it left allocated rather than how many it allocated
+	# this is process-wide, so it includes other threads and can be negative when the stage frees more than it keeps
+	blocks: int = 0
+
+class Profile:
+	"""Records the time spent in each stage of the client while it's active, across all threads, and the net retained blocks (see StageStats)
+	Stages nest (e.g. mirror diff includes the transport of the Gets it makes) and their times include the nested stages
+	Times are summed over calls, so concurrent calls can add up to more than the elapsed time
+
+		with Profile() as profile:
+			client.Get(...)
+		print(profile.Report())"""
+
+	# the profile that's recording, if any
+	active: Profile | None = None
+
+	def __init__(self):
+		self.stages: dict[str, StageStats] = {}
+		self._lock = Lock()
+
+	def __repr__(self):
+		return f'Profile({list(self.stages)})'
+
+	def __enter__(self):
+		if Profile.active is not None:
+			raise BaseError(f'Already profiling with {Profile.active}')
+		Profile.active = self
+		return self
+
+	def __exit__(self, *_):
+		Profile.active = None
+
+	def Add(self, stage, seconds, blocks):
+		with self._lock:
+			stats = self.stages.get(stage)
+			if stats is None:
+				stats = self.stages[stage] = StageStats()
+			stats.calls += 1
+			stats.seconds += seconds
+			stats.blocks += blocks
+
+	def Report(self) -> str:
+		"""A table of the stages, the slowest first"""
+		with self._lock:
+			lines = [f'{"stage":<20}{"calls":>8}{"total":>12}{"per call":>12}{"net blocks":>12}']
+			for stage, stats in sorted(self.stages.items(), key=lambda item: -item[1].seconds):
+				lines.append(f'{stage:<20}{stats.calls:>8}{stats.seconds * 1000:>10.1f}ms{stats.seconds * 1000 / stats.calls:>10.3f}ms{stats.blocks:>12}')
+			return '\n'.join(lines)
+
+class _Stage:
+	__slots__ = ('_blocks', '_name', '_profile', '_started')
+
+	def __init__(self, profile, name):
+		self._profile = profile
+		self._name = name
+
+	def __enter__(self):
+		self._blocks = getallocatedblocks()
+		self._started = perf_counter()
+
+	def __exit__(self, *_):
+		self._profile.Add(self._name, perf_counter() - self._started, getallocatedblocks() - self._blocks)
+
+def Stage(name: str):
+	"""Context manager which records the time spent in it against the stage, if there's an active Profile"""
+	profile = Profile.active
+	return _NOT_PROFILING if profile is None else _Stage(profile, name)
+
+def _Profiled(name):
+	"""Decorator for a function which is all one stage"""
+	def Decorator(function):
+		if iscoroutinefunction(function):
+			@wraps(function)
+			async def AsyncWrapper(*args, **kwargs):
+				with Stage(name):
+					return await function(*args, **kwargs)
+			return AsyncWrapper
+
+		@wraps(function)
+		def Wrapper(*args, **kwargs):
+			with Stage(name):
+				return function(*args, **kwargs)
+		return Wrapper
+	return Decorator
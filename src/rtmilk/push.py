@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+from asyncio import CancelledError, create_task, gather, IncompleteReadError, Queue, sleep, start_server, TimeoutError as AsyncioTimeoutError, wait_for
+from collections.abc import Awaitable, Callable
+from contextlib import suppress
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from heapq import heappop, heappush
+from hmac import compare_digest
+from http import HTTPStatus
+from inspect import isawaitable
+from logging import getLogger
+
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from .models import _RaiseIfError, BaseError, SubscriptionList, SubscriptionPayload
+from .ratelimit import RateLimiter
+
+_log = getLogger(__name__)
+
+class PushEvent(BaseModel):
+	"""One change from an RTM push notification. Fields that RTM adds which aren't listed here are kept as extras"""
+	model_config = ConfigDict(extra='allow')
+
+	type: str
+	timestamp: datetime | None = None
+	subscription_id: str | None = None
+	list_id: str | None = None
+	taskseries_id: str | None = None
+	task_id: str | None = None
+
+	@property
+	def ids(self) -> tuple[str, str, str] | None:
+		"""The same as Task.ids for the task that changed, if the event is about one"""
+		if self.list_id is None or self.taskseries_id is None or self.task_id is None:
+			return None
+		return self.list_id, self.taskseries_id, self.task_id
+
+class PushNotification(BaseModel):
+	"""The JSON body that RTM posts to a subscription's url"""
+	model_config = ConfigDict(extra='allow')
+
+	events: list[PushEvent]
+
+class TaskStore:
+	"""Local copy of the tasks matching a filter, kept up to date by fetching only what changed since the last refresh
+	That doesn't show the tasks which were deleted or stopped matching the filter, so every fullRefreshInterval all the tasks are read again
+	and the ones that are missing are dropped. Deletions that are pushed are removed straight away"""
+
+	def __init__(self, client, filter_: str = '', fullRefreshInterval: timedelta | None = timedelta(hours=1)):
+		self.client = client
+		self.filter = filter_
+		self.fullRefreshInterval = fullRefreshInterval
+		self.tasks = {}
+		self.lastSync: datetime | None = None
+		self._lastFullRefresh: datetime | None = None
+
+	def __repr__(self):
+		return f'TaskStore({self.filter!r}, {len(self.tasks)})'
+
+	def _FullRefreshDue(self, now):
+		if self._lastFullRefresh is None:
+			return True
+		return self.fullRefreshInterval is not None and now - self._lastFullRefresh >= self.fullRefreshInterval
+
+	async def RefreshAsync(self, *, full: bool = False):
+		"""Returns the tasks that were read, which is all of them for a full refresh"""
+		started = datetime.now(timezone.utc)
+		full = full or self._FullRefreshDue(started)
+		read = await self.client.GetAsync(self.filter, None if full else self.lastSync)
+		if full:
+			tasks = {task.ids: task for task in read}
+			_log.info(f'Full refresh of {self} dropped {len(self.tasks.keys() - tasks.keys())} task(s)')
+			self.tasks = tasks
+			self._lastFullRefresh = started
+		else:
+			for task in read:
+				self.tasks[task.ids] = task
+		self.lastSync = started
+		return read
+
+	def Remove(self, ids):
+		self.tasks.pop(ids, None)
+
+class _HttpError(BaseError):
+	def __init__(self, status):
+		super().__init__(status)
+		self.status = status
+
+class PushReceiver:
+	"""Minimal asyncio HTTP server for RTM push notifications
+	It only accepts POSTs to /<secret>, so the secret should be hard to guess and the subscription's url should end with it
+	RTM only pushes to https urls, so this is meant to run behind a TLS-terminating proxy
+	Each event is passed to onEvent. With a store, it's refreshed after each batch of notifications and deleted tasks are removed from it"""
+
+	def __init__(self, secret: str, onEvent: Callable[[PushEvent], Awaitable[None] | None] | None = None, store: TaskStore | None = None, maxBodySize: int = 1 << 20, timeout: float = 10):
+		self._path = f'/{secret}'
+		self._onEvent = onEvent
+		self._store = store
+		self._maxBodySize = maxBodySize
+		self._timeout = timeout
+		self._notifications = Queue()
+		self._server = None
+		self._worker = None
+
+	def __repr__(self):
+		return f'PushReceiver({self.sockets})'
+
+	@property
+	def sockets(self):
+		return [] if self._server is None else list(self._server.sockets)
+
+	async def Start(self, host: str | None = None, port: int = 8080):
+		self._server = await start_server(self._Handle, host, port)
+		self._worker = create_task(self._Work())
+		_log.info(f'Receiving push notifications on {self.sockets}')
+
+	async def Close(self):
+		if self._server is not None:
+			self._server.close()
+			await self._server.wait_closed()
+			self._server = None
+		if self._worker is not None:
+			self._worker.cancel()
+			with suppress(CancelledError):
+				await self._worker
+			self._worker = None
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, *_):
+		await self.Close()
+
+	async def _Handle(self, reader, writer):
+		try:
+			status = await wait_for(self._Receive(reader), self._timeout)
+		except _HttpError as e:
+			status = e.status
+		except (AsyncioTimeoutError, ValueError, IncompleteReadError): # asyncio's TimeoutError is only the builtin one from 3.11
+			status = HTTPStatus.BAD_REQUEST
+		writer.write(f'HTTP/1.1 {status.value} {status.phrase}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n'.encode('ascii'))
+		try:
+			await writer.drain()
+		finally:
+			writer.close()
+
+	async def _Receive(self, reader):
+		method, target, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+		headers = {}
+		while (line := await reader.readline()) not in {b'\r\n', b'\n', b''}:
+			name, _, value = line.decode('latin-1').partition(':')
+			headers[name.strip().lower()] = value.strip()
+		if not compare_digest(target.encode(), self._path.encode()):
+			raise _HttpError(HTTPStatus.NOT_FOUND)
+		if method != 'POST':
+			raise _HttpError(HTTPStatus.METHOD_NOT_ALLOWED)
+		length = int(headers.get('content-length', '0'))
+		if length > self._maxBodySize:
+			raise _HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+		try:
+			notification = PushNotification.model_validate_json(await reader.readexactly(length))
+		except ValidationError as e:
+			_log.warning(f'Invalid push notification: {e}')
+			raise _HttpError(HTTPStatus.BAD_REQUEST) from e
+		self._notifications.put_nowait(notification)
+		return HTTPStatus.OK
+
+	async def _Work(self):
+		"""Handles the notifications in order. Notifications that arrive while the store is being refreshed share the next refresh"""
+		while True:
+			notifications = [await self._notifications.get()]
+			while not self._notifications.empty():
+				notifications.append(self._notifications.get_nowait())
+			for notification in notifications:
+				for event in notification.events:
+					await self._Dispatch(event)
+			if self._store is not None:
+				try:
+					await self._store.RefreshAsync()
+				except BaseError as e:
+					_log.warning(f'Failed to refresh {self._store}: {e!r}')
+				except Exception: # noqa: BLE001 - keep handling notifications, the next refresh may work
+					_log.exception(f'Failed to refresh {self._store}')
+
+	async def _Dispatch(self, event):
+		_log.debug(f'Push event: {event}')
+		if self._store is not None and event.type.endswith('_deleted') and event.ids is not None:
+			self._store.Remove(event.ids)
+		if self._onEvent is None:
+			return
+		try:
+			result = self._onEvent(event)
+			if isawaitable(result):
+				await result
+		except Exception: # noqa: BLE001 - the handler's errors mustn't stop the receiver
+			_log.exception(f'Failed to handle {event}')
+
+def _AsUtc(value):
+	return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def _Topics(subscription):
+	return ','.join(subscription.topics.topic if hasattr(subscription.topics, 'topic') else subscription.topics)
+
+@dataclass(order=True)
+class _Lease:
+	# when the subscription should next be renewed
+	due: datetime
+	subscription: SubscriptionPayload = field(compare=False)
+
+class LeaseScheduler:
+	"""Renews push subscriptions ahead of their expiry and resubscribes ones that have lapsed
+	Subscriptions are kept in a heap ordered by when they're due, so each pass only touches the due ones
+	and renews them as one batch, spaced out by the rate limiter"""
+
+	def __init__(self, apiAsync, timeline: str, *, leaseSeconds: int | None = None, margin: timedelta = timedelta(minutes=10), rateLimiter: RateLimiter | None = None, batchSize: int = 100, retryDelay: timedelta = timedelta(minutes=1)):
+		self._api = apiAsync
+		self._timeline = timeline
+		self._leaseSeconds = leaseSeconds
+		self._margin = margin
+		self._rateLimiter = rateLimiter or RateLimiter()
+		self._batchSize = batchSize
+		self._retryDelay = retryDelay
+		self._heap = []
+
+	def __repr__(self):
+		return f'LeaseScheduler({len(self._heap)})'
+
+	def __len__(self):
+		return len(self._heap)
+
+	def Track(self, subscription: SubscriptionPayload):
+		heappush(self._heap, _Lease(_AsUtc(subscription.expires) - self._margin, subscription))
+
+	async def LoadAsync(self):
+		"""Track all the subscriptions from PushGetSubscriptions"""
+		response = _RaiseIfError(await self._api.PushGetSubscriptions())
+		subscriptions = response.subscriptions.subscription if isinstance(response.subscriptions, SubscriptionList) else response.subscriptions
+		self._heap = []
+		for subscription in subscriptions:
+			self.Track(subscription)
+		_log.info(f'Tracking {len(self._heap)} push subscription(s)')
+
+	@property
+	def nextDue(self) -> datetime | None:
+		return self._heap[0].due if len(self._heap) != 0 else None
+
+	async def _Renew(self, subscription, now):
+		"""Returns the renewed subscription"""
+		lapsed = _AsUtc(subscription.expires) <= now
+		await self._rateLimiter.AcquireAsync()
+		renewed = _RaiseIfError(await self._api.PushSubscribe(url=subscription.url, topics=_Topics(subscription), push_format=subscription.format, timeline=self._timeline, lease_seconds=self._leaseSeconds)).subscription
+		if lapsed:
+			_log.info(f'Resubscribed lapsed push subscription {subscription.id} as {renewed.id}')
+		elif renewed.id != subscription.id:
+			# it was renewed as a new subscription, so drop the old one rather than getting every notification twice
+			await self._rateLimiter.AcquireAsync()
+			_RaiseIfError(await self._api.PushUnsubscribe(timeline=self._timeline, subscription_id=subscription.id))
+		return renewed
+
+	async def RenewDueAsync(self, now: datetime | None = None) -> list[SubscriptionPayload]:
+		"""Renew up to batchSize of the subscriptions which are due. Returns the renewed subscriptions
+		Failed renewals are logged and retried after retryDelay"""
+		now = now or datetime.now(timezone.utc)
+		batch = []
+		while len(self._heap) != 0 and self._heap[0].due <= now and len(batch) < self._batchSize:
+			batch.append(heappop(self._heap))
+		results = await gather(*[self._Renew(lease.subscription, now) for lease in batch], return_exceptions=True)
+		renewed, unexpected = [], None
+		for lease, result in zip(batch, results, strict=True):
+			if isinstance(result, BaseError):
+				_log.warning(f'Failed to renew push subscription {lease.subscription.id}: {result!r}')
+				heappush(self._heap, _Lease(now + self._retryDelay, lease.subscription))
+			elif isinstance(result, BaseException):
+				# keep the lease so that it's still renewed if the caller carries on after the exception
+				heappush(self._heap, lease)
+				unexpected = unexpected or result
+			else:
+				self.Track(result)
+				renewed.append(result)
+		if unexpected is not None:
+			raise unexpected
+		return renewed
+
+	async def RunAsync(self):
+		"""Load the subscriptions and then renew them as they become due, until cancelled"""
+		await self.LoadAsync()
+		while True:
+			await self.RenewDueAsync()
+			nextDue = self.nextDue
+			wait = self._retryDelay.total_seconds() if nextDue is None else (nextDue - datetime.now(timezone.utc)).total_seconds()
+			await sleep(max(wait, 0))
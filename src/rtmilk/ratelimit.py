@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from asyncio import sleep as sleep_async
+from threading import Lock
+from time import monotonic, sleep
+
+class RateLimiter:
+	"""Spaces out requests to at most requestsPerSecond on average, allowing bursts of up to burst requests
+	Can be shared between threads and between coroutines (but not event loops in different threads)"""
+
+	def __init__(self, requestsPerSecond: float = 1.0, burst: int = 1):
+		self._interval = 1 / requestsPerSecond
+		self._burst = burst
+		self._next = 0.0
+		self._lock = Lock()
+
+	def __repr__(self):
+		return f'RateLimiter({1 / self._interval}, {self._burst})'
+
+	def _Reserve(self) -> float:
+		"""Takes the next free slot and returns how long to wait for it"""
+		with self._lock:
+			now = monotonic()
+			self._next = max(self._next, now - (self._burst - 1) * self._interval)
+			wait = self._next - now
+			self._next += self._interval
+		return max(wait, 0)
+
+	def Acquire(self):
+		sleep(self._Reserve())
+
+	async def AcquireAsync(self):
+		await sleep_async(self._Reserve())
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from hashlib import sha256
+from json import dumps, JSONDecodeError, loads
+from logging import getLogger
+from os import getpid, PathLike, replace
+from pathlib import Path
+from threading import Lock
+
+try:
+	from fcntl import flock, LOCK_EX, LOCK_UN
+
+	def _LockFile(file):
+		flock(file.fileno(), LOCK_EX)
+
+	def _UnlockFile(file):
+		flock(file.fileno(), LOCK_UN)
+except ImportError: # Windows
+	from msvcrt import locking, LK_LOCK, LK_UNLCK
+
+	def _LockFile(file):
+		locking(file.fileno(), LK_LOCK, 1)
+
+	def _UnlockFile(file):
+		locking(file.fileno(), LK_UNLCK, 1)
+
+_log = getLogger(__name__)
+
+@contextmanager
+def _Locked(path):
+	"""Advisory lock between the processes that use path. It's on a separate file because path itself is replaced"""
+	with path.with_name(f'{path.name}.lock').open('a', encoding='utf-8') as file:
+		_LockFile(file)
+		try:
+			yield
+		finally:
+			_UnlockFile(file)
+
+def TimelineKey(apiKey: str, token: str) -> str:
+	"""Timelines belong to a user, so they're stored by a hash of the credentials rather than the token itself"""
+	return sha256(f'{apiKey}:{token}'.encode()).hexdigest()
+
+class TimelineProvider(ABC):
+	"""Stores timelines so that they can be reused by other clients, processes or runs instead of creating a new one
+	Subclass this to keep them somewhere else, e.g. a cache shared by worker processes"""
+
+	def __init__(self, lifetime: timedelta = timedelta(hours=12)):
+		self.lifetime = lifetime
+
+	@abstractmethod
+	def _Load(self, key: str) -> tuple[str, datetime] | None:
+		"""Returns the timeline and when it was created"""
+
+	@abstractmethod
+	def _Save(self, key: str, timeline: str, created: datetime):
+		pass
+
+	def Load(self, key: str) -> str | None:
+		"""The stored timeline, unless it's older than lifetime"""
+		stored = self._Load(key)
+		if stored is None:
+			return None
+		timeline, created = stored
+		if datetime.now(timezone.utc) - created > self.lifetime:
+			_log.info(f'Timeline {timeline} has expired')
+			return None
+		return timeline
+
+	def Save(self, key: str, timeline: str):
+		self._Save(key, timeline, datetime.now(timezone.utc))
+
+class MemoryTimelineProvider(TimelineProvider):
+	"""Shares timelines between the clients in one process"""
+
+	def __init__(self, lifetime: timedelta = timedelta(hours=12)):
+		super().__init__(lifetime)
+		self._timelines = {}
+
+	def __repr__(self):
+		return f'MemoryTimelineProvider({len(self._timelines)})'
+
+	def _Load(self, key):
+		return self._timelines.get(key)
+
+	def _Save(self, key, timeline, created):
+		self._timelines[key] = (timeline, created)
+
+class FileTimelineProvider(TimelineProvider):
+	"""Keeps timelines in a JSON file so that they survive restarts. The file is replaced atomically so concurrent processes never see a partial write
+	and saves are made under a lock on path.lock so that processes saving different keys don't lose each other's timelines
+	If two processes both create a timeline for the same key at the same time, the last one to save wins and the other timeline is just not reused"""
+
+	def __init__(self, path: str | PathLike, lifetime: timedelta = timedelta(hours=12)):
+		super().__init__(lifetime)
+		self.path = Path(path)
+		self._lock = Lock()
+
+	def __repr__(self):
+		return f'FileTimelineProvider({self.path})'
+
+	def _Read(self):
+		try:
+			return loads(self.path.read_text(encoding='utf-8'))
+		except FileNotFoundError:
+			return {}
+		except JSONDecodeError:
+			_log.warning(f'Ignoring corrupt timeline file {self.path}')
+			return {}
+
+	def _Load(self, key):
+		stored = self._Read().get(key)
+		if stored is None:
+			return None
+		return stored['timeline'], datetime.fromisoformat(stored['created'])
+
+	def _Save(self, key, timeline, created):
+		with self._lock, _Locked(self.path):
+			timelines = self._Read()
+			timelines[key] = {'timeline': timeline, 'created': created.isoformat()}
+			temporary = self.path.with_name(f'{self.path.name}.{getpid()}.tmp')
+			temporary.write_text(dumps(timelines), encoding='utf-8')
+			replace(temporary, self.path)
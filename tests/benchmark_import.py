@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+
+from os import environ
+from pathlib import Path
+from statistics import median
+from subprocess import run
+from sys import executable
+
+# each statement runs in a fresh interpreter so nothing is already imported
+_STATEMENTS = {
+	'import rtmilk': 'import rtmilk',
+	'CreateClient': 'from rtmilk import CreateClient',
+	'every submodule': 'import rtmilk.api_async, rtmilk.api_sync, rtmilk.client, rtmilk.filter, rtmilk.mirror, rtmilk.push',
+}
+
+def _ImportTime(statement):
+	"""Microseconds spent importing rtmilk, including its dependencies, according to -X importtime"""
+	result = run([executable, '-X', 'importtime', '-c', statement], capture_output=True, text=True, check=True, env={**environ, 'PYTHONPATH': str(Path(__file__).parent.parent / 'src')}) # noqa: S603 - runs this interpreter
+	total = 0
+	for line in result.stderr.splitlines():
+		_, cumulative, name = line.split('|')
+		# nested imports are indented, and are already included in the cumulative time of the top-level import
+		if name.startswith(' rtmilk'):
+			total += int(cumulative)
+	return total
+
+def Benchmark(repeat=5):
+	for description, statement in _STATEMENTS.items():
+		times = [_ImportTime(statement) for _ in range(repeat)]
+		print(f'{description}: {median(times) / 1000:.1f}ms')
+
+if __name__ == '__main__':
+	Benchmark()
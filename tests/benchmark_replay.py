@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+from argparse import ArgumentParser
+from os import environ
+from statistics import median
+from time import perf_counter
+
+from rtmilk import CreateSyncOnlyClient, Mirror, Profile, RecordingTransport, ReplayTransport, TaskData
+
+try:
+	from dotenv import load_dotenv
+	load_dotenv()
+	print('.env imported')
+except ImportError:
+	pass
+
+def _GetConfig():
+	"""The same credentials as the tests"""
+	if 'RTM_TOKEN' in environ:
+		return (environ['RTM_API_KEY'], environ['RTM_SHARED_SECRET'], environ['RTM_TOKEN'])
+	with open('rtm-token.txt', encoding='utf-8') as f:
+		token = f.read()
+	return (environ['RTM_API_KEY'], environ['RTM_SHARED_SECRET'], token)
+
+def Record(path, filter_):
+	client = CreateSyncOnlyClient(*_GetConfig())
+	with RecordingTransport(path) as transport:
+		client.api.transport = transport
+		tasks = client.Get(filter_)
+	print(f'Recorded {len(tasks)} task(s) to {path}')
+
+def Replay(path, filter_, repeat, speed):
+	"""Times Get and a dry run of Mirror against the recorded responses, without network access"""
+	getTimes, mirrorTimes = [], []
+	with Profile() as profile:
+		for _ in range(repeat):
+			client = CreateSyncOnlyClient('api-key', 'shared-secret', 'token')
+			client.api.transport = ReplayTransport(path, speed)
+			started = perf_counter()
+			tasks = client.Get(filter_)
+			getTimes.append(perf_counter() - started)
+			# half the tasks unchanged, the other half renamed, so the plan has some of everything
+			required = [TaskData(task.name.value if i % 2 == 0 else f'{task.name.value} renamed', task.tags.value) for i, task in enumerate(tasks)]
+			started = perf_counter()
+			Mirror(client, tasks, required, dryRun=True)
+			mirrorTimes.append(perf_counter() - started)
+	print(f'{len(tasks)} task(s)')
+	print(f'Get: {median(getTimes) * 1000:.1f}ms')
+	print(f'Mirror (dry run): {median(mirrorTimes) * 1000:.1f}ms')
+	print(profile.Report())
+
+if __name__ == '__main__':
+	parser = ArgumentParser(description='Record RTM responses to a cassette, then benchmark against them offline')
+	parser.add_argument('mode', choices=['record', 'replay'])
+	parser.add_argument('cassette')
+	parser.add_argument('--filter', default='')
+	parser.add_argument('--repeat', type=int, default=5)
+	parser.add_argument('--speed', type=float, default=None, help='replay the recorded latency this many times faster. By default there is no latency')
+	args = parser.parse_args()
+	if args.mode == 'record':
+		Record(args.cassette, args.filter)
+	else:
+		Replay(args.cassette, args.filter, args.repeat, args.speed)
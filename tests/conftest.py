@@ -1,3 +1,4 @@
+from datetime import datetime, time, timezone
 from os import environ
 from unittest.mock import MagicMock
 from uuid import uuid4
@@ -5,6 +6,9 @@ from uuid import uuid4
 from pytest import fixture
 
 from rtmilk import API, APIAsync, CreateClient
+from rtmilk import NotePayload, Tags, TaskSeries
+from rtmilk.client import _Client, _CreateFromTaskSeries
+from rtmilk.models import Task as TaskModel
 
 try:
 	from dotenv import load_dotenv
@@ -111,3 +115,36 @@ def client():
 @fixture
 def mockClient():
 	return MagicMock()
+
+@fixture
+def offlineClient():
+	"""Client which has never talked to the server - for tests which replace the network calls"""
+	return _Client('api-key', 'shared-secret', 'token')
+
+def _RtmDatetime(value):
+	if value is None or isinstance(value, datetime):
+		return value
+	return datetime.combine(value, time(), timezone.utc)
+
+@fixture
+def makeTaskSeries():
+	"""Factory for task series models as they'd come back from the server"""
+	def _MakeTaskSeries(name, *, tags=(), startDate=None, dueDate=None, complete=False, notes=(), taskId=None, externalId=None):
+		taskId = taskId or name
+		now = datetime.now(timezone.utc)
+		return TaskSeries(
+			id=f'series-{taskId}', created=now, modified=now, name=name, source='api', url='', location_id='', participants=[], external_id=externalId,
+			notes=NotePayload(note=list(notes)) if len(notes) != 0 else [],
+			tags=Tags(tag=sorted(tags)) if len(tags) != 0 else [],
+			task=[TaskModel(
+				id=f'task-{taskId}', added=now, completed=now if complete else None, deleted=None, estimate='', postponed=0, priority='N',
+				due=_RtmDatetime(dueDate), has_due_time=isinstance(dueDate, datetime),
+				start=_RtmDatetime(startDate), has_start_time=isinstance(startDate, datetime))])
+	return _MakeTaskSeries
+
+@fixture
+def makeTask(offlineClient, makeTaskSeries):
+	"""Factory for client tasks with loaded values, built from the same models as a server response"""
+	def _MakeTask(name, **kwargs):
+		return _CreateFromTaskSeries(offlineClient, 'list-id', makeTaskSeries(name, **kwargs))
+	return _MakeTask
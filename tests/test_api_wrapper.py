@@ -1,13 +1,16 @@
 from datetime import datetime, timedelta, timezone
 from logging import info
+from json import dumps
 from random import randint
+from unittest.mock import MagicMock
 from uuid import uuid4
 
 from dateutil.tz import gettz
+from niquests.exceptions import RequestException
 from pydantic import ValidationError
 from pytest import mark, raises
 
-from rtmilk import AuthResponse, EchoResponse, FailStat, NotePayload, PriorityDirectionEnum, PriorityEnum, RTMList, RTMSmartList, Tags, TaskResponse, TaskSeries
+from rtmilk import API, AuthResponse, BaseError, EchoResponse, FailStat, MetricsCollector, NotePayload, PayloadRingBuffer, PriorityDirectionEnum, PriorityEnum, RTMList, RTMSmartList, Tags, TaskResponse, TaskSeries
 from rtmilk._sansio import TasksGetList
 
 def test_validation(api, timeline):
@@ -325,3 +328,55 @@ def test_url():
 
 	r = TasksGetList.Out(**fake)
 	print(r)
+
+def _Response(rsp):
+	response = MagicMock()
+	response.content = dumps({'rsp': rsp}).encode()
+	response.json.return_value = {'rsp': rsp}
+	return response
+
+def test_metrics_hooks():
+	api = API('key', 'secret', 'token')
+	api._session = MagicMock() # noqa: SLF001
+	api._session.get.side_effect = [ # noqa: SLF001
+		_Response({'stat': 'ok', 'method': 'rtm.test.echo'}),
+		_Response({'stat': 'fail', 'err': {'code': '98', 'msg': 'Login failed / Invalid auth token'}}),
+		RequestException()]
+	collector = MetricsCollector()
+	reported = []
+	api.AddHook(collector)
+	api.AddHook(reported.append)
+
+	assert isinstance(api.TestEcho(), EchoResponse)
+	assert isinstance(api.TimelinesCreate(), FailStat)
+	with raises(BaseError):
+		api.TagsGetList()
+
+	assert [(metrics.method, metrics.outcome, metrics.code) for metrics in reported] == [('rtm.test.echo', 'ok', None), ('rtm.timelines.create', 'fail', 98), ('rtm.tags.getList', 'RequestException', None)]
+	assert reported[0].responseBytes == len(dumps({'rsp': {'stat': 'ok', 'method': 'rtm.test.echo'}}))
+	assert reported[2].validate == 0
+	assert collector.outcomes[('rtm.timelines.create', 'fail 98')] == 1
+	assert collector.histograms[('rtm.test.echo', 'total')].count == 1
+	assert 'rtm.tags.getList' in collector.Report()
+
+def test_payload_ring_buffer():
+	api = API('the-api-key', 'secret', 'token')
+	api._session = MagicMock() # noqa: SLF001
+	api._session.get.side_effect = [_Response({'stat': 'ok', 'method': 'rtm.test.echo', 'i': str(i)}) for i in range(3)] # noqa: SLF001
+	api.payloads = PayloadRingBuffer(2)
+	for i in range(3):
+		api.TestEcho(i=str(i))
+
+	payloads = list(api.payloads)
+	assert [payload.params['i'] for payload in payloads] == ['1', '2']
+	assert {payloads[0].params[key] for key in ('api_key', 'api_sig')} == {'<redacted>'}
+	assert payloads[0].method == 'rtm.test.echo'
+	assert 'the-api-key' not in api.payloads.Dump()
+
+def test_package_exports():
+	import rtmilk # noqa: PLC0415
+	exported = {}
+	exec('from rtmilk import *', exported) # noqa: S102
+	assert {'API', 'CreateClient', 'Mirror', 'TasksAdd', 'REST_URL'} <= set(exported)
+	assert exported['Task'].__module__ == 'rtmilk.models' # not the client's Task
+	assert rtmilk.TasksGetList is TasksGetList
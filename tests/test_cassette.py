@@ -0,0 +1,48 @@
+from json import dumps, loads
+from unittest.mock import MagicMock
+
+from pytest import mark, raises
+
+from rtmilk import API, APIAsync, BaseError, EchoResponse, PayloadRingBuffer, RecordingTransport, ReplayTransport, TimelineResponse
+
+def _Send(params):
+	json = {'rsp': {'stat': 'ok', 'method': params['method'], 'api_key': params['api_key'], 'i': params['i']}}
+	response = MagicMock()
+	response.content = dumps(json).encode()
+	response.json.return_value = json
+	return response
+
+def testRecordAndReplay(tmp_path):
+	path = tmp_path / 'cassette.jsonl'
+	api = API('the-api-key', 'secret', 'the-token')
+	api._Get = _Send # noqa: SLF001
+	with RecordingTransport(path) as transport:
+		api.transport = transport
+		for i in range(3):
+			api.TestEcho(i=str(i))
+		api.TestEcho(i='1')
+	assert 'the-api-key' not in path.read_text()
+	assert len(path.read_text().splitlines()) == 4 # noqa: PLR2004
+
+	offline = API('another-api-key', 'another-secret', 'another-token')
+	offline.transport = ReplayTransport(path)
+	offline.payloads = PayloadRingBuffer()
+	offline.TestEcho(i='1')
+	offline.TestEcho(i='1') # the second recording of the same call
+	assert [loads(payload.response)['rsp']['i'] for payload in offline.payloads] == ['1', '1']
+	with raises(BaseError):
+		offline.TestEcho(i='1')
+	assert len(offline.transport) == 2 # noqa: PLR2004
+
+@mark.asyncio
+async def testReplayInOrder(tmp_path):
+	path = tmp_path / 'cassette.jsonl'
+	path.write_text(''.join(f'{dumps(recorded)}\n' for recorded in [
+		{'params': {'method': 'rtm.timelines.create', 'api_key': '<redacted>'}, 'elapsed': 0.01, 'response': dumps({'rsp': {'stat': 'ok', 'timeline': '123'}})},
+		{'params': {'method': 'rtm.test.echo', 'name': 'recorded name'}, 'elapsed': 0.01, 'response': dumps({'rsp': {'stat': 'ok', 'method': 'rtm.test.echo'}})},
+	]))
+	api = APIAsync('api-key', 'secret', 'token')
+	api.transport = ReplayTransport(path, speed=10, inOrder=True)
+	assert await api.TimelinesCreate() == TimelineResponse(stat='ok', timeline='123')
+	assert isinstance(await api.TestEcho(name='different name'), EchoResponse)
+	assert loads(path.read_text().splitlines()[0])['elapsed'] == 0.01 # noqa: PLR2004
@@ -1,9 +1,18 @@
+from asyncio import gather, sleep
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime, time, timedelta, timezone
+from threading import Barrier
+from time import sleep as sleep_
+from unittest.mock import AsyncMock, MagicMock
 from uuid import uuid4
 
 from pydantic import ValidationError
 from pytest import mark, raises
 
+from rtmilk.client import Task
+from rtmilk import APIAsync, APIError, BaseError, CommitError, CreateAsyncOnlyClient, CreateClientAsync, Due, ErrorData, FailStat, ListIs, ListPayload, ListsResponse, OkStat, PlanMirror
+from rtmilk import Profile, RTMList, Status, TagIs, TaskListPayload, TaskListResponse, TaskPayload, TaskResponse, TaskData, TasksInListPayload, TimelineResponse, Transaction, UndoError
+
 def testClientDeleteWithNoDates(client):
 	_ = client.Get('')
 	taskAdded = client.Add(f'{uuid4()}')
@@ -123,3 +132,277 @@ async def testClientAsync(client):
 	assert newTaskToo.complete.value is True
 
 	await newTaskToo.DeleteAsync()
+
+def testGetManySharesOneQuery(offlineClient, makeTask, monkeypatch):
+	today = date.today()
+	tasks = [
+		makeTask('a', tags={'tag1'}),
+		makeTask('b', tags={'tag2'}, complete=True),
+		makeTask('c', dueDate=today),
+	]
+	queries = []
+	def Get(filter_, _lastSync=None):
+		queries.append(filter_)
+		return tasks
+	monkeypatch.setattr(offlineClient, 'Get', Get)
+
+	dueToday = f'{ListIs("Work").Text()} AND {Due(today).Text()}' # parsed dates are strings which can't be evaluated locally
+	results = offlineClient.GetMany([
+		'list:Work tag:tag1',
+		'list:Work AND status:completed',
+		dueToday,
+		'list:Work AND priority:1', # priority isn't loaded into client tasks
+		'isRecurring:true', # not understood by ParseFilter
+	])
+	assert queries == ['list:"Work"', dueToday, 'list:Work AND priority:1', 'isRecurring:true']
+	assert results[0] == [tasks[0]]
+	assert results[1] == [tasks[1]]
+	assert len(results[2]) == len(tasks)
+
+def testGetManyInThreads(offlineClient, monkeypatch):
+	barrier = Barrier(3, timeout=5)
+	def Get(filter_, _lastSync=None):
+		barrier.wait() # only passes if all the queries are in flight at once
+		return [filter_]
+	monkeypatch.setattr(offlineClient, 'Get', Get)
+
+	filters = ['list:A AND priority:1', 'list:B AND priority:2', 'list:C AND priority:3']
+	assert offlineClient.GetMany(filters, maxWorkers=3) == [[filter_] for filter_ in filters]
+
+@mark.asyncio
+async def testGetManyAsyncWithoutCommonPrefix(offlineClient, makeTask, monkeypatch):
+	tasks = [makeTask('a', tags={'tag1'}), makeTask('b', complete=True)]
+	queries = []
+	async def GetAsync(filter_, _lastSync=None):
+		queries.append(filter_)
+		return tasks
+	monkeypatch.setattr(offlineClient, 'GetAsync', GetAsync)
+
+	results = await offlineClient.GetManyAsync([TagIs('tag1'), Status(True), '(status:completed) AND (status:incomplete)'])
+	assert queries == ['status:completed OR tag:tag1']
+	assert results == [[tasks[0]], [tasks[1]], []]
+
+def testAddWithSmartAdd(offlineClient, makeTaskSeries):
+	today = date.today()
+	offlineClient.api = MagicMock()
+	offlineClient.timeline = 'timeline'
+	offlineClient.api.TasksAdd.return_value = TaskResponse(stat='ok', transaction=Transaction(id='1', undoable=True),
+		list=TaskPayload(id='list-id', taskseries=[makeTaskSeries('name', tags={'tag1', 'tag2'})]))
+	# the due date didn't come back as requested so it has to be set separately
+	offlineClient.api.TasksSetDueDate.return_value = TaskResponse(stat='ok', transaction=Transaction(id='2', undoable=True),
+		list=TaskPayload(id='list-id', taskseries=[makeTaskSeries('name', tags={'tag1', 'tag2'}, dueDate=today)]))
+
+	offlineClient.api.ListsGetList.return_value = _Lists('Inbox')
+	task = offlineClient.Add('name', tags={'tag2', 'tag1'}, dueDate=today)
+	offlineClient.api.TasksAdd.assert_called_once_with('timeline', name=f'name #tag1 #tag2 ^{today.isoformat()}', parse=True, external_id=None)
+	offlineClient.api.TasksSetTags.assert_not_called()
+	offlineClient.api.TasksSetDueDate.assert_called_once()
+	assert task.tags.value == {'tag1', 'tag2'}
+	assert task.dueDate.value == today
+
+def _Lists(*names):
+	return ListsResponse(stat='ok', lists=ListPayload(list=[RTMList(id=name, name=name, deleted=False, locked=False, archived=False, position=0, smart=False) for name in names]))
+
+def testAddWithTagMatchingList(offlineClient, makeTaskSeries):
+	offlineClient.api = MagicMock()
+	offlineClient.timeline = 'timeline'
+	offlineClient.api.ListsGetList.return_value = _Lists('Work')
+	offlineClient.api.TasksAdd.return_value = TaskResponse(stat='ok', transaction=Transaction(id='1', undoable=True), list=TaskPayload(id='inbox', taskseries=[makeTaskSeries('name')]))
+	offlineClient.api.TasksSetTags.return_value = TaskResponse(stat='ok', transaction=Transaction(id='2', undoable=True),
+		list=TaskPayload(id='inbox', taskseries=[makeTaskSeries('name', tags={'work', 'tag1'})]))
+	offlineClient.Add('name', tags={'work', 'tag1'})
+	# #work would have put the task in the Work list
+	offlineClient.api.TasksAdd.assert_called_once_with('timeline', name='name', external_id=None)
+	offlineClient.api.TasksSetTags.assert_called_once()
+
+	# a list created since the list names were read
+	offlineClient.api.reset_mock()
+	offlineClient.api.TasksAdd.side_effect = [
+		TaskResponse(stat='ok', transaction=Transaction(id='3', undoable=True), list=TaskPayload(id='home', taskseries=[makeTaskSeries('name', tags={'tag1'}, taskId='1')])),
+		TaskResponse(stat='ok', transaction=Transaction(id='4', undoable=True), list=TaskPayload(id='inbox', taskseries=[makeTaskSeries('name', taskId='2')])),
+	]
+	offlineClient.api.TasksDelete.return_value = TaskResponse(stat='ok', transaction=Transaction(id='5', undoable=True), list=TaskPayload(id='home', taskseries=[makeTaskSeries('name', taskId='1')]))
+	offlineClient.api.TasksSetTags.return_value = TaskResponse(stat='ok', transaction=Transaction(id='6', undoable=True),
+		list=TaskPayload(id='inbox', taskseries=[makeTaskSeries('name', tags={'home', 'tag1'}, taskId='2')]))
+	task = offlineClient.Add('name', tags={'home', 'tag1'})
+	assert [call.kwargs['name'] for call in offlineClient.api.TasksAdd.call_args_list] == ['name #home #tag1', 'name']
+	assert offlineClient.api.TasksDelete.call_args.kwargs['list_id'] == 'home'
+	assert task.ids[0] == 'inbox'
+	assert task.tags.value == {'home', 'tag1'}
+
+	# the date is still sent in Smart Add syntax when adding again, which isn't a tag becoming a list again
+	today = date.today()
+	offlineClient.api.reset_mock()
+	offlineClient.api.TasksAdd.side_effect = [
+		TaskResponse(stat='ok', transaction=Transaction(id='7', undoable=True), list=TaskPayload(id='shop', taskseries=[makeTaskSeries('name', dueDate=today, taskId='3')])),
+		TaskResponse(stat='ok', transaction=Transaction(id='8', undoable=True), list=TaskPayload(id='inbox', taskseries=[makeTaskSeries('name', dueDate=today, taskId='4')])),
+	]
+	offlineClient.api.TasksDelete.return_value = TaskResponse(stat='ok', transaction=Transaction(id='9', undoable=True), list=TaskPayload(id='shop', taskseries=[makeTaskSeries('name', taskId='3')]))
+	offlineClient.Add('name', tags={'shop'}, dueDate=today)
+	assert [call.kwargs['name'] for call in offlineClient.api.TasksAdd.call_args_list] == [f'name #shop ^{today.isoformat()}', f'name ^{today.isoformat()}']
+
+@mark.asyncio
+async def testConcurrentAddsReadListsOnce(offlineClient, makeTaskSeries):
+	async def _ListsGetList():
+		await sleep(0.01)
+		return _Lists('Inbox')
+
+	offlineClient.timeline = 'timeline'
+	offlineClient.apiAsync = MagicMock()
+	offlineClient.apiAsync.ListsGetList = AsyncMock(side_effect=_ListsGetList)
+	offlineClient.apiAsync.TasksAdd = AsyncMock(side_effect=lambda _timeline, name, **_: TaskResponse(stat='ok', transaction=Transaction(id=name, undoable=True),
+		list=TaskPayload(id='list-id', taskseries=[makeTaskSeries(name.split()[0], tags={'tag'})])))
+	await gather(*[offlineClient.AddAsync(f'name{i}', tags={'tag'}) for i in range(10)])
+	offlineClient.apiAsync.ListsGetList.assert_awaited_once()
+	assert offlineClient.apiAsync.TasksAdd.await_count == 10 # noqa: PLR2004
+
+	offlineClient._listNames = None # noqa: SLF001
+	offlineClient.api = MagicMock()
+	offlineClient.api.ListsGetList.side_effect = lambda: sleep_(0.01) or _Lists('Inbox')
+	offlineClient.api.TasksAdd.side_effect = lambda _timeline, name, **_: TaskResponse(stat='ok', transaction=Transaction(id=name, undoable=True),
+		list=TaskPayload(id='list-id', taskseries=[makeTaskSeries(name.split()[0], tags={'tag'})]))
+	with ThreadPoolExecutor(max_workers=10) as executor:
+		list(executor.map(lambda i: offlineClient.Add(f'name{i}', tags={'tag'}), range(10)))
+	offlineClient.api.ListsGetList.assert_called_once()
+
+@mark.asyncio
+async def testUndoBatch(offlineClient, makeTask):
+	offlineClient.timeline = 'timeline'
+	offlineClient.api = MagicMock()
+	offlineClient.api.TasksSetName.side_effect = [MagicMock(transaction=Transaction(id=str(i), undoable=True)) for i in range(4)]
+	offlineClient.api.TasksComplete.return_value = MagicMock(transaction=Transaction(id='not undoable', undoable=False))
+	task1, task2 = makeTask('task1'), makeTask('task2')
+	task1.name.Set('before')
+	with offlineClient.transactions.Batch() as batch:
+		task1.name.Set('a')
+		task2.name.Set('b')
+		task2.complete.Set(True)
+		task1.name.Set('c')
+	assert [record.transaction.id for record in batch] == ['1', '2', '3']
+	assert len(offlineClient.transactions) == 4 # noqa: PLR2004
+
+	offlineClient.api.TransactionsUndo.return_value = OkStat(stat='ok')
+	offlineClient.Undo(batch)
+	assert [call.kwargs['transaction_id'] for call in offlineClient.api.TransactionsUndo.call_args_list] == ['3', '2', '1']
+
+	offlineClient.apiAsync = MagicMock()
+	offlineClient.apiAsync.TransactionsUndo = AsyncMock(side_effect=lambda timeline, transaction_id: FailStat(stat='fail', err=ErrorData(code=1, msg='failed')) if transaction_id == '2' else OkStat(stat='ok')) # noqa: ARG005
+	with raises(UndoError) as e:
+		await offlineClient.UndoAsync(batch, concurrency=2)
+	assert [record.transaction.id for record, _ in e.value.errors] == ['2']
+	assert str(e.value) == '1 transaction(s) failed to undo'
+	undone = [call.kwargs['transaction_id'] for call in offlineClient.apiAsync.TransactionsUndo.call_args_list]
+	assert undone.index('3') < undone.index('1') # one task's transactions are undone in reverse order
+	with raises(ValueError, match='at least 1'):
+		await offlineClient.UndoAsync(batch, concurrency=0)
+
+def testWriteBehind(offlineClient, makeTask):
+	offlineClient.timeline = 'timeline'
+	offlineClient.api = MagicMock()
+	task = makeTask('task', tags={'tag1'})
+	with offlineClient.WriteBehind() as buffer:
+		task.tags.Set({'tag2'})
+		task.complete.Set(True)
+		task.name.Set('renamed')
+		task.notes.Add('title', 'note')
+		task.complete.Set(False) # back to the value it already had
+		task.tags.Set({'tag3'})
+		assert buffer.apiCalls == 3 # noqa: PLR2004
+		assert offlineClient.api.mock_calls == []
+	assert [name for name, _, _ in offlineClient.api.method_calls] == ['TasksSetName', 'TasksSetTags', 'TasksNotesAdd']
+	assert offlineClient.api.TasksSetTags.call_args.kwargs['tags'] == ['tag3']
+
+	def _FailAfterRenaming():
+		with offlineClient.WriteBehind():
+			task.name.Set('dropped')
+			raise RuntimeError
+
+	offlineClient.api.reset_mock()
+	with raises(RuntimeError):
+		_FailAfterRenaming()
+	assert offlineClient.api.mock_calls == []
+
+	# one task's failure doesn't stop the other task's writes
+	other = makeTask('other')
+	offlineClient.api.TasksSetName.return_value = FailStat(stat='fail', err=ErrorData(code=1, msg='failed'))
+
+	def _WriteBoth():
+		with offlineClient.WriteBehind():
+			task.name.Set('fails')
+			other.tags.Set({'tag1'})
+
+	with raises(CommitError) as e:
+		_WriteBoth()
+	assert [failed for failed, _ in e.value.errors] == [task]
+	offlineClient.api.TasksSetTags.assert_called_once()
+
+def testSetAppliesResponse(offlineClient, makeTask, makeTaskSeries):
+	offlineClient.api = MagicMock()
+	task = makeTask('task')
+	updated = makeTaskSeries('task', tags={'tag1'}, complete=True)
+	updated.modified = datetime(2030, 1, 1, tzinfo=timezone.utc)
+	offlineClient.api.TasksSetTags.return_value = TaskResponse(stat='ok', transaction=Transaction(id='1', undoable=True), list=TaskPayload(id='list-id', taskseries=[updated]))
+	task.tags.Set({'tag1'})
+	assert task.tags.value == {'tag1'}
+	assert task.complete.value is True # everything comes from the response, not just the property that was set
+	assert task.modifiedTime == updated.modified
+
+	offlineClient.api.TasksSetName.return_value = FailStat(stat='fail', err=ErrorData(code=4040, msg='failed'))
+	with raises(APIError):
+		task.name.Set('new name')
+	assert task.name.value == 'task'
+
+def testGetReturnsSameTaskObjects(offlineClient, makeTaskSeries):
+	def _Response(*taskSeries):
+		return TaskListResponse(stat='ok', tasks=TaskListPayload(rev='', list=[TasksInListPayload(id='list-id', taskseries=list(taskSeries))]))
+
+	offlineClient.api = MagicMock()
+	offlineClient.api.TasksGetList.return_value = _Response(makeTaskSeries('task1'), makeTaskSeries('task2'))
+	task1, task2 = offlineClient.Get('')
+	offlineClient.api.TasksGetList.return_value = _Response(makeTaskSeries('task1', tags={'tag1'}))
+	[task1Again] = offlineClient.Get('')
+	assert task1Again is task1
+	assert task1.tags.value == {'tag1'} # refreshed in place
+	assert task2 is not task1
+
+	task1._Load('other-list', makeTaskSeries('task1')) # noqa: SLF001 - as when a write's response shows the task moved to another list
+	assert task1.ids[0] == 'other-list'
+	assert offlineClient._tasks[task1.ids] is task1 # noqa: SLF001
+	assert ('list-id', 'series-task1', 'task-task1') not in offlineClient._tasks # noqa: SLF001
+
+def testProfile(offlineClient, makeTaskSeries):
+	offlineClient.api = MagicMock()
+	offlineClient.api.TasksGetList.return_value = TaskListResponse(stat='ok', tasks=TaskListPayload(rev='', list=[TasksInListPayload(id='list-id', taskseries=[makeTaskSeries('task1')])]))
+	offlineClient.Get('') # not profiled
+	with Profile() as profile:
+		tasks = offlineClient.Get('')
+		PlanMirror(tasks, [TaskData('task2')])
+		with raises(BaseError), Profile():
+			pass
+	offlineClient.Get('')
+	assert {stage: stats.calls for stage, stats in profile.stages.items()} == {'tasks': 1, 'mirror diff': 1}
+	assert 'mirror diff' in profile.Report()
+
+@mark.asyncio
+async def testTimelineCreatedOnFirstWrite(monkeypatch, makeTaskSeries):
+	created = []
+	async def TimelinesCreate(_self):
+		created.append(1)
+		await sleep(0.01)
+		return TimelineResponse(stat='ok', timeline='timeline')
+	monkeypatch.setattr(APIAsync, 'TimelinesCreate', TimelinesCreate)
+	client = await CreateClientAsync('api-key', 'shared-secret', 'token')
+	assert client.timeline is None
+
+	client.apiAsync.TasksSetName = AsyncMock(return_value=TaskResponse(stat='ok', transaction=Transaction(id='1', undoable=True), list=TaskPayload(id='list-id', taskseries=[makeTaskSeries('renamed')])))
+	tasks = [Task(client, 'list-id', f'series-{i}', f'task-{i}') for i in range(3)]
+	await gather(*[task.name.SetAsync('renamed') for task in tasks])
+	assert created == [1] # the concurrent writes shared one creation
+	assert {call.kwargs['timeline'] for call in client.apiAsync.TasksSetName.call_args_list} == {'timeline'}
+
+@mark.asyncio
+async def testAsyncOnlyClient():
+	client = await CreateAsyncOnlyClient('api-key', 'shared-secret', 'token')
+	assert isinstance(client.apiAsync, APIAsync)
+	with raises(BaseError):
+		client.Get('')
@@ -1,13 +1,71 @@
 from datetime import date
 from uuid import uuid4
 
-from rtmilk import And, Due, NameIs, Or, Priority, PriorityEnum, Status
+from pytest import mark, raises
+
+from rtmilk import Always, And, CanonicalHash, CanonicalText, Due, DueBefore, Evaluate, FilterParseError, Keyword, ListIs, NameIs, Never, Normalize, Not, Or, ParseFilter, Priority, PriorityEnum, Status, TagIs
 
 def testFilterString():
 	assert And(NameIs('the-name'), Status(True)).Text() == '(name:"the-name") AND (status:completed)'
 
 	assert Or(Priority(PriorityEnum.Priority1), NameIs('the-name')).Text() == '(priority:1) OR (name:"the-name")'
 
+@mark.parametrize('condition', [
+	And(NameIs('the-name'), Status(True)),
+	Or(Priority(PriorityEnum.Priority1), Not(TagIs('tag1'))),
+	And(Or(ListIs('Inbox'), ListIs('Work list')), DueBefore('tomorrow')),
+])
+def testParseRoundTrip(condition):
+	assert ParseFilter(condition.Text()) == condition
+
+def testParsePrecedence():
+	assert ParseFilter('tag:a OR tag:b AND NOT tag:c') == Or(TagIs('a'), And(TagIs('b'), Not(TagIs('c'))))
+	assert ParseFilter('priority:1 dueBefore:tomorrow') == And(Priority(PriorityEnum.Priority1), DueBefore('tomorrow'))
+	assert ParseFilter('milk "buy eggs"') == And(Keyword('milk'), Keyword('buy eggs'))
+	assert ParseFilter('STATUS:Incomplete or list:Inbox') == Or(Status(False), ListIs('Inbox'))
+
+@mark.parametrize('text', ['(tag:a', 'tag:a)', 'unknown:x', 'AND tag:a', 'priority:4', 'isTagged:maybe'])
+def testParseErrors(text):
+	with raises(FilterParseError):
+		ParseFilter(text)
+
+def testNormalize():
+	a, b, c = TagIs('a'), TagIs('b'), TagIs('c')
+	assert Normalize(And(a, b)) == Normalize(And(b, a))
+	assert Normalize(And(a, And(b, c))) == Normalize(And(And(c, b), a))
+	assert Normalize(Not(Not(a))) == a
+	assert Normalize(Or(a, a)) == a
+	assert Normalize(And(a, Not(a))) == Never()
+	assert Normalize(Or(b, Not(b))) == Always()
+	assert Normalize(And(a, Always())) == a
+	assert Normalize(Or(a, Never())) == a
+	assert ParseFilter('') == Always()
+
+def testTextWithConstants():
+	a, b = TagIs('a'), TagIs('b')
+	assert And(Always(), a).Text() == 'tag:a'
+	assert And(And(Always(), Always()), Or(a, Never())).Text() == 'tag:a'
+	assert Or(a, Always()).Text() == ''
+	assert And(a, Not(Always())).Text() == Never().Text()
+	assert And(Not(Never()), Or(a, b)).Text() == '(tag:a) OR (tag:b)'
+	assert ParseFilter(And(Always(), Not(a)).Text()) == Not(a)
+
+def testCanonicalText():
+	a, b, c = TagIs('a'), TagIs('b'), TagIs('c')
+	assert CanonicalText(And(c, And(b, a))) == 'tag:a AND tag:b AND tag:c'
+	assert CanonicalText(Or(Not(c), And(b, a))) == 'NOT tag:c OR (tag:a AND tag:b)'
+	assert CanonicalHash(And(a, b)) == CanonicalHash(ParseFilter('tag:b tag:a'))
+	assert CanonicalHash(And(a, b)) != CanonicalHash(Or(a, b))
+	cache = {Normalize(And(a, b)): 'cached'}
+	assert cache[Normalize(And(b, a))] == 'cached'
+
+def testEvaluateDates(makeTask):
+	today = date.today()
+	# the loaded date is the UTC day, which needn't be the day in the account's timezone
+	assert Evaluate(Due(today), makeTask('due', dueDate=today)) is None
+	assert Evaluate(DueBefore(today), makeTask('undated')) is False
+	assert Evaluate(And(TagIs('tag1'), Due(today)), makeTask('due', dueDate=today)) is False
+
 def testFilterSearch(client, taskCreator):
 	name1 = f'task1 {uuid4()}'
 	_ = taskCreator.Add(name1)
@@ -1,10 +1,250 @@
-from datetime import datetime, timedelta
+from asyncio import sleep
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from json import dumps, loads
+from unittest.mock import AsyncMock, MagicMock
 
-from rtmilk import Mirror, TaskData
+from pytest import mark, raises
+
+from rtmilk import APIError, IterMirrorPlan, IterMirrorPlanAsync, KeysToLoad, MatchByExternalId, Mirror, MirrorAsync, MirrorError, MirrorJournal, MirrorStream, PlanMirror, TaskData
+from rtmilk import ListPayload, ListsResponse, Note, NotesResponse, RTMList, TaskPayload, TaskResponse, TimelineResponse, Transaction
+from rtmilk import mirror
 
 def testMirror(mockClient):
 	Mirror(mockClient, [], [TaskData('name')])
 
+def testPlanMirror(makeTask):
+	today = date.today()
+	unchanged = makeTask('unchanged', tags={'tag1'})
+	changed = makeTask('changed', dueDate=today)
+	deleted = makeTask('deleted')
+	plan = PlanMirror([unchanged, changed, deleted], [
+		TaskData('unchanged', tags={'tag1'}),
+		TaskData('changed', tags={'tag2'}, startDate=today, complete=None),
+		TaskData('added', tags={'tag3'}, dueDate=today, notes='note'),
+	])
+	assert plan.deletes == [deleted]
+	assert [taskData.name for taskData in plan.adds] == ['added']
+	assert len(plan.updates) == 1
+	assert plan.updates[0].task is changed
+	assert plan.updates[0].changes == {'tags': {'tag2'}, 'dueDate': None, 'startDate': today}
+	assert plan.apiCalls == 1 + 2 + 3 # tags and due date are sent with the add using Smart Add
+	assert plan.Duration(requestsPerSecond=2) == timedelta(seconds=3)
+
+def testPlanMirrorByExternalId(makeTask):
+	renamed = makeTask('old name', externalId='1')
+	duplicate1 = makeTask('duplicate', taskId='d1', externalId='2')
+	duplicate2 = makeTask('duplicate', taskId='d2', externalId='2')
+	noId = makeTask('no id')
+	plan = PlanMirror([renamed, duplicate1, duplicate2, noId], [
+		TaskData('new name', externalId='1'),
+		TaskData('duplicate', externalId='2'),
+		TaskData('no id'),
+	], MatchByExternalId)
+	assert [(update.task, update.changes) for update in plan.updates] == [(renamed, {'name': 'new name'})]
+	assert plan.deletes == [noId, duplicate2] # tasks without an id never match, duplicates are paired in order
+	assert [taskData.name for taskData in plan.adds] == ['no id']
+
+def testPlanMirrorSkipsUnchangedFingerprints(makeTask):
+	unchanged, changed, editedRemotely = TaskData('unchanged', tags={'tag1'}), TaskData('changed'), TaskData('edited remotely')
+	assert PlanMirror([], [unchanged]).fingerprints == {} # only tracked when asked for
+	lastSync = datetime.now(timezone.utc)
+	fingerprints = PlanMirror([], [unchanged, changed, editedRemotely], fingerprints={}).fingerprints
+	assert set(fingerprints) == {'unchanged', 'changed', 'edited remotely'}
+
+	remoteTask = makeTask('edited remotely', tags={'remote-tag'}) # modified now, after lastSync
+	changedTask = makeTask('changed', dueDate=date.today())
+	plan = PlanMirror([remoteTask, changedTask], [unchanged, TaskData('changed', tags={'tag2'}), editedRemotely], fingerprints=fingerprints, lastSync=lastSync)
+	assert plan.skipped == 1
+	assert plan.adds == [] # the unchanged task wasn't loaded but isn't added again
+	assert {update.task.name.value for update in plan.updates} == {'changed', 'edited remotely'}
+	assert plan.fingerprints['changed'] != fingerprints['changed']
+	assert plan.fingerprints['unchanged'] == fingerprints['unchanged']
+
+	# deleted remotely since lastSync, so it isn't in the existing tasks and has to be added again
+	plan = PlanMirror([], [unchanged], fingerprints=fingerprints, lastSync=lastSync, removed=['unchanged'])
+	assert plan.skipped == 0
+	assert plan.adds == [unchanged]
+
+def testKeysToLoad(makeTask):
+	a, b, gone = TaskData('a'), TaskData('b'), TaskData('gone')
+	lastSync = datetime.now(timezone.utc)
+	fingerprints = PlanMirror([], [a, b, gone], fingerprints={}).fingerprints
+	changedB = TaskData('b', tags={'tag1'})
+	assert KeysToLoad([a, changedB], fingerprints) == {'b', 'gone'}
+
+	# without the existing tasks for those keys, b would be added twice and gone would be forgotten without being deleted
+	plan = PlanMirror([], [a, changedB], fingerprints=fingerprints, lastSync=lastSync)
+	assert plan.deletes == []
+	assert set(plan.fingerprints) == {'a', 'b', 'gone'} # so a later run still deletes it
+
+	remoteB, remoteGone = makeTask('b'), makeTask('gone')
+	remoteB.modifiedTime = remoteGone.modifiedTime = lastSync - timedelta(days=1)
+	plan = PlanMirror([remoteB, remoteGone], [a, changedB], fingerprints=fingerprints, lastSync=lastSync)
+	assert plan.adds == []
+	assert [update.task for update in plan.updates] == [remoteB]
+	assert plan.deletes == [remoteGone]
+	assert set(plan.fingerprints) == {'a', 'b'}
+
+def testIterMirrorPlan(makeTask):
+	a, b, d = makeTask('a'), makeTask('b', tags={'tag1'}), makeTask('d')
+	operations = list(IterMirrorPlan(iter([a, b, d]), iter([TaskData('a'), TaskData('b'), TaskData('c'), TaskData('e')])))
+	assert [kind for kind, _ in operations] == ['update', 'add', 'delete', 'add']
+	assert operations[0][1].task is b
+	assert operations[1][1].name == 'c'
+	assert operations[2][1] is d
+
+	with raises(ValueError, match='not sorted'):
+		list(IterMirrorPlan([d, a], []))
+
+@mark.asyncio
+async def testIterMirrorPlanAsync(makeTask):
+	async def Iterate(items):
+		for item in items:
+			yield item
+
+	operations = [operation async for operation in IterMirrorPlanAsync(Iterate([makeTask('a'), makeTask('b')]), Iterate([TaskData('b'), TaskData('c')]))]
+	assert [kind for kind, _ in operations] == ['delete', 'add']
+
+def testMirrorDryRun(mockClient, makeTask):
+	plan = Mirror(mockClient, [makeTask('deleted')], [TaskData('added')], dryRun=True)
+	assert plan.apiCalls == 2 # noqa: PLR2004
+	assert len(mockClient.mock_calls) == 0
+
+class _CountingTransport:
+	"""Answers every call with a valid response, with Smart Add applied to the added task, and counts the calls by method"""
+
+	def __init__(self, makeTaskSeries, listNames):
+		self.calls = Counter()
+		self._makeTaskSeries = makeTaskSeries
+		self._listNames = listNames
+
+	def _Added(self, params):
+		words = params['name'].split() if params.get('parse') == '1' else [params['name']]
+		dates = {word[0]: date.fromisoformat(word[1:]) for word in words if word[0] in '~^'}
+		taskSeries = self._makeTaskSeries(' '.join(word for word in words if word[0] not in '#~^'), tags={word[1:] for word in words if word[0] == '#'}, startDate=dates.get('~'), dueDate=dates.get('^'))
+		return TaskResponse(stat='ok', transaction=Transaction(id='1', undoable=True), list=TaskPayload(id='list-id', taskseries=[taskSeries]))
+
+	def _Response(self, params):
+		method = params['method']
+		if method == 'rtm.timelines.create':
+			return TimelineResponse(stat='ok', timeline='timeline')
+		if method == 'rtm.lists.getList':
+			return ListsResponse(stat='ok', lists=ListPayload(list=[RTMList(id=name, name=name, deleted=False, locked=False, archived=False, position=0, smart=False) for name in self._listNames]))
+		if method == 'rtm.tasks.add':
+			return self._Added(params)
+		if method == 'rtm.tasks.notes.add':
+			now = datetime.now(timezone.utc)
+			return NotesResponse(stat='ok', transaction=Transaction(id='1', undoable=True), note=Note(id='1', created=now, modified=now, title=params['note_title'], body=params['note_text']))
+		taskSeries = self._makeTaskSeries('any', taskId=params['taskseries_id'].removeprefix('series-'))
+		return TaskResponse(stat='ok', transaction=Transaction(id='1', undoable=True), list=TaskPayload(id=params['list_id'], taskseries=[taskSeries]))
+
+	def Get(self, params, _send):
+		self.calls[params['method']] += 1
+		return _JsonResponse({'rsp': self._Response(params).model_dump(mode='json', by_alias=True)})
+
+class _JsonResponse:
+	def __init__(self, json):
+		self._json = json
+		self.content = dumps(json).encode()
+
+	def json(self):
+		return self._json
+
+def testPlanApiCallsMatchExecution(offlineClient, makeTask, makeTaskSeries):
+	today = date.today()
+	transport = _CountingTransport(makeTaskSeries, ['Inbox', 'Work'])
+	offlineClient.api.transport = transport
+	existing = [makeTask('deleted'), makeTask('changed', tags={'tag1'})]
+	required = [
+		TaskData('changed', tags={'tag2'}, dueDate=today),
+		TaskData('smart added', tags={'tag1'}, dueDate=today, notes='note'),
+		TaskData('tag is a list', tags={'work'}, complete=True),
+	]
+	plan = Mirror(offlineClient, existing, required, dryRun=True)
+	expected = plan.ApiCallsWith(offlineClient)
+	assert expected == plan.apiCalls + 2 # the timeline and the list names
+	Mirror(offlineClient, existing, required)
+	# the separate tags for the task whose tag is a list are only known about once the list names have been read
+	assert transport.calls.total() == expected + 1
+	assert transport.calls['rtm.lists.getList'] == 1
+	assert transport.calls['rtm.timelines.create'] == 1
+
+	# now that the client has read the list names and has a timeline, the count is exact
+	transport.calls.clear()
+	existing, required = [makeTask('old')], [TaskData('another', tags={'work', 'tag1'}, startDate=today)]
+	plan = Mirror(offlineClient, existing, required, dryRun=True)
+	expected = plan.ApiCallsWith(offlineClient)
+	assert expected == plan.apiCalls + 1 # the tags are set separately
+	Mirror(offlineClient, existing, required)
+	assert transport.calls.total() == expected
+
+def testMirrorResumesFromJournal(mockClient, tmp_path):
+	path = tmp_path / 'mirror.jsonl'
+	deleted = MagicMock(ids=('list-id', 'series-1', 'task-1'))
+	deleted.name.value = 'deleted'
+	added = mockClient._Add.return_value # noqa: SLF001
+	added.ids = ('list-id', 'series-2', 'task-2')
+	added.name.value, added.startDate.value, added.dueDate.value = 'added', None, None
+	added.notes.Add.side_effect = APIError(1, 'failed')
+	required = [TaskData('added', notes='note')]
+	with raises(APIError):
+		Mirror(mockClient, [deleted], required, journal=MirrorJournal(path))
+	records = [loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+	assert [record['op'] for record in records] == ['done', 'add']
+	assert records[1]['ids'] == ['list-id', 'series-2', 'task-2']
+
+	mockClient.reset_mock()
+	progress = []
+	Mirror(mockClient, [deleted], required, journal=MirrorJournal(path), progress=progress.append)
+	deleted.Delete.assert_called_once() # by the first run
+	mockClient._Add.assert_not_called() # noqa: SLF001
+	assert mockClient.api.TasksNotesAdd.call_args.kwargs['taskseries_id'] == 'series-2'
+	assert [(update.kind, update.done, update.total, update.resumed) for update in progress] == [('delete', 1, 2, True), ('add', 2, 2, False)]
+	assert not path.exists()
+
+def testMirrorStreamKeepsNoJournal(mockClient, monkeypatch):
+	journals = []
+	class _Journal(mirror._NullJournal): # noqa: SLF001
+		def __init__(self):
+			super().__init__()
+			journals.append(self)
+	monkeypatch.setattr(mirror, '_NullJournal', _Journal)
+	counts = MirrorStream(mockClient, [], [TaskData(f'name {i:03}', notes='note') for i in range(100)])
+	assert counts['add'] == 100 # noqa: PLR2004
+	assert (journals[0]._added, journals[0]._set, journals[0]._done) == ({}, set(), set()) # noqa: SLF001
+
+class _SlowAsyncClient:
+	"""Records how many adds are in flight at once and fails the adds for some names"""
+	def __init__(self, failingNames):
+		self.failingNames = failingNames
+		self.inFlight = 0
+		self.maxInFlight = 0
+		self.added = []
+
+	async def _AddAsync(self, name, *_properties):
+		self.inFlight += 1
+		self.maxInFlight = max(self.maxInFlight, self.inFlight)
+		await sleep(0.01)
+		self.inFlight -= 1
+		if name in self.failingNames:
+			raise APIError(1, 'failed')
+		self.added.append(name)
+		task = AsyncMock()
+		task.tags.value = {'tag'}
+		return task
+
+@mark.asyncio
+async def testMirrorAsyncConcurrency():
+	client = _SlowAsyncClient(failingNames={'name 3', 'name 7'})
+	with raises(MirrorError) as e:
+		await MirrorAsync(client, [], [TaskData(f'name {i}', tags={'tag'}) for i in range(10)], concurrency=4)
+	assert client.maxInFlight == 4 # noqa: PLR2004
+	assert sorted(client.added) == sorted(f'name {i}' for i in range(10) if i not in {3, 7})
+	assert sorted(taskData.name for taskData, _ in e.value.errors) == ['name 3', 'name 7']
+	with raises(ValueError, match='at least 1'):
+		await MirrorAsync(client, [], [TaskData('name')], concurrency=0)
+
 def test_ChangeTagsOnTaskBeforeStart(client, taskCreator):
 	name = 'rtmilk test ChangeTagsOnTaskBeforeStart'
 	task = taskCreator.Add(name)
@@ -0,0 +1,135 @@
+from asyncio import Event, open_connection, sleep, wait_for
+from datetime import datetime, timedelta, timezone
+from json import dumps
+from unittest.mock import AsyncMock, MagicMock
+
+from pytest import mark, raises
+
+from rtmilk import LeaseScheduler, OkStat, PushReceiver, RateLimiter, SubscriptionList, SubscriptionListResponse, SubscriptionPayload, SubscriptionResponse, TaskStore, Topic, Transaction
+
+async def _Post(receiver, path, body):
+	host, port = receiver.sockets[0].getsockname()[:2]
+	reader, writer = await open_connection(host, port)
+	writer.write(f'POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n'.encode() + body)
+	await writer.drain()
+	statusLine = await reader.readline()
+	writer.close()
+	return int(statusLine.split()[1])
+
+@mark.asyncio
+async def testPushReceiver():
+	events = []
+	refreshed = Event()
+	client = MagicMock()
+	client.GetAsync = AsyncMock(side_effect=lambda *_: refreshed.set() or [])
+	store = TaskStore(client, 'list:Inbox')
+	store.tasks = {('list-id', 'series-id', 'task-id'): MagicMock()}
+	async with PushReceiver('secret', onEvent=events.append, store=store) as receiver:
+		await receiver.Start('127.0.0.1', 0)
+		notification = {'events': [{'type': 'task_deleted', 'list_id': 'list-id', 'taskseries_id': 'series-id', 'task_id': 'task-id'}]}
+		assert await _Post(receiver, '/wrong-secret', dumps(notification).encode()) == 404 # noqa: PLR2004
+		assert await _Post(receiver, '/secret', b'{"not": "a notification"}') == 400 # noqa: PLR2004
+		assert await _Post(receiver, '/secret', dumps(notification).encode()) == 200 # noqa: PLR2004
+		await wait_for(refreshed.wait(), 1)
+	assert [event.type for event in events] == ['task_deleted']
+	assert store.tasks == {}
+	client.GetAsync.assert_called_once_with('list:Inbox', None)
+	assert store.lastSync is not None
+
+@mark.asyncio
+async def testPushReceiverKeepsWorking():
+	refreshes = []
+
+	def _GetAsync(*_):
+		refreshes.append(1)
+		if len(refreshes) == 1:
+			raise RuntimeError('bug')
+		return []
+
+	client = MagicMock()
+	client.GetAsync = AsyncMock(side_effect=_GetAsync)
+	receiver = PushReceiver('secret', store=TaskStore(client))
+	await receiver.Start('127.0.0.1', 0)
+	worker = receiver._worker # noqa: SLF001
+	notification = dumps({'events': [{'type': 'task_created'}]}).encode()
+	for _ in range(2):
+		assert await _Post(receiver, '/secret', notification) == 200 # noqa: PLR2004
+		await sleep(0.05)
+	assert len(refreshes) == 2 # noqa: PLR2004 - the first refresh's error didn't stop the worker
+	await receiver.Close()
+	assert worker.done()
+
+@mark.asyncio
+async def testTaskStoreFullRefresh():
+	kept, gone, stale = MagicMock(ids=('list', 'series', 'kept')), MagicMock(ids=('list', 'series', 'gone')), MagicMock(ids=('list', 'series', 'stale'))
+	client = MagicMock()
+	client.GetAsync = AsyncMock(return_value=[kept, gone, stale])
+	store = TaskStore(client, 'status:incomplete', fullRefreshInterval=timedelta(hours=1))
+	await store.RefreshAsync()
+	lastSync = store.lastSync
+
+	client.GetAsync.return_value = []
+	await store.RefreshAsync()
+	client.GetAsync.assert_called_with('status:incomplete', lastSync) # only what changed, which doesn't show the ones that stopped matching
+	assert len(store.tasks) == 3 # noqa: PLR2004
+
+	client.GetAsync.return_value = [kept]
+	await store.RefreshAsync(full=True)
+	client.GetAsync.assert_called_with('status:incomplete', None)
+	assert list(store.tasks.values()) == [kept]
+
+@mark.asyncio
+async def testPushReceiverTimesOut():
+	async with PushReceiver('secret', timeout=0.05) as receiver:
+		await receiver.Start('127.0.0.1', 0)
+		host, port = receiver.sockets[0].getsockname()[:2]
+		reader, writer = await open_connection(host, port)
+		writer.write(b'POST /secret HTTP/1.1\r\nContent-Length: 10\r\n\r\n{') # the rest of the body never arrives
+		await writer.drain()
+		assert int((await wait_for(reader.readline(), 1)).split()[1]) == 400 # noqa: PLR2004
+		writer.close()
+
+def _Subscription(id_, expires):
+	return SubscriptionPayload(id=id_, url='https://hook.example/secret', format='json', expires=expires, pending=False, topics=Topic(topic=['task_created', 'task_completed']))
+
+@mark.asyncio
+async def testLeaseScheduler():
+	now = datetime.now(timezone.utc)
+	api = MagicMock()
+	api.PushGetSubscriptions = AsyncMock(return_value=SubscriptionListResponse(stat='ok', subscriptions=SubscriptionList(subscription=[
+		_Subscription('later', now + timedelta(days=1)),
+		_Subscription('soon', now + timedelta(minutes=1)),
+		_Subscription('lapsed', now - timedelta(minutes=1)),
+	])))
+	api.PushSubscribe = AsyncMock(side_effect=lambda **_: SubscriptionResponse(stat='ok', transaction=Transaction(id='1', undoable=False), subscription=_Subscription(f'new{api.PushSubscribe.call_count}', now + timedelta(days=1))))
+	api.PushUnsubscribe = AsyncMock(return_value=OkStat(stat='ok'))
+	scheduler = LeaseScheduler(api, 'timeline', leaseSeconds=86400, rateLimiter=RateLimiter(1000, burst=10))
+	await scheduler.LoadAsync()
+	assert len(scheduler) == 3 # noqa: PLR2004
+
+	renewed = await scheduler.RenewDueAsync(now)
+	assert len(renewed) == 2 # noqa: PLR2004
+	assert api.PushSubscribe.call_args.kwargs['topics'] == 'task_created,task_completed'
+	api.PushUnsubscribe.assert_called_once_with(timeline='timeline', subscription_id='soon') # the lapsed one is already gone
+	assert len(scheduler) == 3 # noqa: PLR2004
+	assert scheduler.nextDue > now + timedelta(hours=23)
+	assert await scheduler.RenewDueAsync(now) == []
+
+@mark.asyncio
+async def testLeaseSchedulerKeepsLeasesOnUnexpectedError():
+	now = datetime.now(timezone.utc)
+	api = MagicMock()
+	api.PushSubscribe = AsyncMock(side_effect=[RuntimeError('bug'), SubscriptionResponse(stat='ok', transaction=Transaction(id='1', undoable=False), subscription=_Subscription('new', now + timedelta(days=1)))])
+	scheduler = LeaseScheduler(api, 'timeline', rateLimiter=RateLimiter(1000, burst=10))
+	scheduler.Track(_Subscription('first', now - timedelta(minutes=1)))
+	scheduler.Track(_Subscription('second', now - timedelta(minutes=2)))
+	with raises(RuntimeError):
+		await scheduler.RenewDueAsync(now)
+	assert len(scheduler) == 2 # noqa: PLR2004 - the failed lease is still due and the renewed one is tracked
+	assert scheduler.nextDue < now
+
+def testRateLimiterBurst():
+	limiter = RateLimiter(10, burst=2)
+	waits = [limiter._Reserve() for _ in range(4)] # noqa: SLF001
+	assert waits[:2] == [0, 0]
+	assert 0.05 < waits[2] < waits[3] <= 0.2 # noqa: PLR2004
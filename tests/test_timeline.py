@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest.mock import MagicMock
+
+from rtmilk import CreateClient, FileTimelineProvider, MemoryTimelineProvider, TimelineResponse
+
+def _CreateTimeline(client, timeline):
+	client.api = MagicMock()
+	client.api.TimelinesCreate.return_value = TimelineResponse(stat='ok', timeline=timeline)
+	client._Timeline() # noqa: SLF001
+	return client.api.TimelinesCreate.call_count
+
+def testFileTimelineProvider(tmp_path):
+	path = tmp_path / 'timelines.json'
+	assert _CreateTimeline(CreateClient('api-key', 'shared-secret', 'token', timelineProvider=FileTimelineProvider(path)), 'timeline1') == 1
+	assert 'token' not in path.read_text(encoding='utf-8')
+
+	# e.g. a new process
+	client = CreateClient('api-key', 'shared-secret', 'token', timelineProvider=FileTimelineProvider(path))
+	assert _CreateTimeline(client, 'timeline2') == 0
+	assert client.timeline == 'timeline1'
+
+	otherUser = CreateClient('api-key', 'shared-secret', 'other token', timelineProvider=FileTimelineProvider(path))
+	assert _CreateTimeline(otherUser, 'timeline3') == 1
+
+def testTimelineLifetime():
+	provider = MemoryTimelineProvider(lifetime=timedelta(0))
+	assert _CreateTimeline(CreateClient('api-key', 'shared-secret', 'token', timelineProvider=provider), 'timeline1') == 1
+	assert _CreateTimeline(CreateClient('api-key', 'shared-secret', 'token', timelineProvider=provider), 'timeline2') == 1
+
+def testFileTimelineProviderConcurrentSaves(tmp_path):
+	path = tmp_path / 'timelines.json'
+	# separate instances, like separate worker processes, so only the file lock keeps them apart
+	providers = [FileTimelineProvider(path), FileTimelineProvider(path)]
+	with ThreadPoolExecutor(max_workers=8) as executor:
+		list(executor.map(lambda i: providers[i % 2].Save(f'key{i}', f'timeline{i}'), range(100)))
+	assert all(FileTimelineProvider(path).Load(f'key{i}') == f'timeline{i}' for i in range(100))